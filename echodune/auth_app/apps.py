@@ -1,6 +1,20 @@
 from django.apps import AppConfig
+from django.core.signals import request_started
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_save
 
 
 class AuthAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'auth_app'
+
+    def ready(self):
+        from .models import RecentSearch, Song
+        from .search import repair_indexes
+        from .suggest import suggestions
+        post_migrate.connect(repair_indexes, sender=self)
+        # The suggestion index is built on the first request, when the database is known to be ready
+        request_started.connect(suggestions.start, dispatch_uid='suggest-start')
+        pre_save.connect(suggestions.song_pre_save, sender=Song)
+        post_save.connect(suggestions.song_saved, sender=Song)
+        post_delete.connect(suggestions.song_deleted, sender=Song)
+        post_save.connect(suggestions.search_saved, sender=RecentSearch)
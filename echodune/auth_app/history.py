@@ -0,0 +1,140 @@
+"""Write-behind logging of search history.
+
+SearchView records a search in memory and returns. A background thread
+writes the buffered searches in one transaction: one bulk_create for all of
+them, and for each user a delete of the older copies of the same queries
+and a trim to RECENT_SEARCHES_PER_USER rows. Buffers are per process. A
+user's pending searches are flushed before their history is read, so they
+always see their own latest searches. A batch whose transaction fails goes
+back into the buffer for the next attempt.
+"""
+import atexit
+from collections import OrderedDict
+import logging
+import threading
+
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+RECENT_SEARCHES_PER_USER = 20
+FLUSH_ROWS = 200  # flush as soon as this many searches are pending
+FLUSH_SECONDS = 2.0  # and at least this often otherwise
+
+
+def tidy(query):
+    return ' '.join(query.split())
+
+
+class SearchHistory:
+    def __init__(self, per_user=RECENT_SEARCHES_PER_USER, flush_rows=FLUSH_ROWS, flush_seconds=FLUSH_SECONDS):
+        self.per_user = per_user
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # one writer at a time, so a user's rows are trimmed in order
+        self._pending = OrderedDict()  # user id -> OrderedDict(query -> searched_at), oldest first
+        self._count = 0
+        self._wake = threading.Event()
+        self._thread = None
+
+    def record(self, user_id, query):
+        """Buffer one search; a repeat of a pending query only moves it to the front."""
+        query = tidy(query)
+        if not query:
+            return
+        with self._lock:
+            searches = self._pending.setdefault(user_id, OrderedDict())
+            if query in searches:
+                searches.move_to_end(query)
+            else:
+                self._count += 1
+            searches[query] = timezone.now()
+            full = self._count >= self.flush_rows
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='search-history', daemon=True)
+                self._thread.start()
+        if full:
+            self._wake.set()
+
+    def discard(self, user_id):
+        """Drop a user's pending searches (their history is being cleared)."""
+        with self._lock:
+            self._count -= len(self._pending.pop(user_id, ()))
+
+    def flush(self, user_id=None):
+        """Write pending searches (only `user_id`'s, if given); returns the number of rows written."""
+        with self._flush_lock:
+            with self._lock:
+                if user_id is None:
+                    batch, self._pending, self._count = self._pending, OrderedDict(), 0
+                elif user_id in self._pending:
+                    batch = {user_id: self._pending.pop(user_id)}
+                    self._count -= len(batch[user_id])
+                else:
+                    return 0
+            if batch:
+                try:
+                    self._write(batch)
+                except Exception:
+                    self._requeue(batch)
+                    raise
+            return sum(len(searches) for searches in batch.values())
+
+    def _requeue(self, batch):
+        """Put back a batch that was not written, behind searches recorded since; a newer copy of a query wins."""
+        with self._lock:
+            for user_id, searches in batch.items():
+                newer = self._pending.get(user_id, OrderedDict())
+                merged = OrderedDict((query, at) for query, at in searches.items() if query not in newer)
+                merged.update(newer)
+                while len(merged) > self.per_user:  # older ones would be trimmed on write anyway
+                    merged.popitem(last=False)
+                self._count += len(merged) - len(newer)
+                self._pending[user_id] = merged
+
+    def _write(self, batch):
+        from .models import RecentSearch
+        from .suggest import suggestions
+        with transaction.atomic():
+            for user_id, searches in batch.items():
+                RecentSearch.objects.filter(user_id=user_id, query__in=list(searches)).delete()
+            RecentSearch.objects.bulk_create([
+                RecentSearch(user_id=user_id, query=query, searched_at=searched_at)
+                for user_id, searches in batch.items() for query, searched_at in searches.items()
+            ])
+            for user_id in batch:
+                stale = RecentSearch.objects.filter(user_id=user_id).order_by('-searched_at', '-id').values_list(
+                    'id', flat=True)[self.per_user:]
+                RecentSearch.objects.filter(id__in=list(stale)).delete()
+        for searches in batch.values():
+            for query in searches:
+                suggestions.add(query, 1, create=False)
+
+    def flush_at_exit(self):
+        """Write what is left at interpreter exit, unless the table is gone (e.g. a test database was dropped)."""
+        from .models import RecentSearch
+        with self._lock:
+            if not self._count:
+                return
+        try:
+            if RecentSearch._meta.db_table not in connection.introspection.table_names():
+                return
+            self.flush()
+        except DatabaseError as e:
+            logger.warning('Search history not written at exit: %s', e)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            try:
+                close_old_connections()
+                self.flush()
+            except Exception:
+                logger.exception('Writing search history failed')
+
+
+search_history = SearchHistory()
+atexit.register(search_history.flush_at_exit)
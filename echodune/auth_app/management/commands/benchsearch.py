@@ -0,0 +1,97 @@
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Q
+
+from auth_app.models import Song
+from auth_app.search import SONG_INDEX
+
+COMMON_WORDS = (
+    'love night heart baby time life dream fire world light girl rain summer blue dance home road star '
+    'forever gold wild sweet fall soul city river moon young crazy feel money people ocean angel paradise '
+    'lonely broken shadow midnight electric secret highway thunder sugar honey diamond silver freedom memory'
+).split()
+SYLLABLES = 'ka lo mi ra ven tor shi na bel dru zen qua fi mor lek sa tu ny vo gra hal ber ix ol'.split()
+QUERIES = ['love', 'midnight', 'love midnight', 'thunder road', 'zenkalo', 'xyzzy', 'the', 'ba']
+
+
+class Command(BaseCommand):
+    help = 'Compare icontains scans with the FTS5 trigram index on a generated catalog (in a scratch database).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--songs', type=int, default=500000)
+        parser.add_argument('--db', help='scratch SQLite file; kept and reused if given')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        scratch = options['db'] is None
+        path = options['db'] or os.path.join(tempfile.mkdtemp(prefix='benchsearch-'), 'bench.sqlite3')
+        connections.settings['bench'] = {**connections.settings['default'], 'NAME': path}
+        try:
+            call_command('migrate', database='bench', verbosity=0, interactive=False)
+            self.populate(options['songs'], random.Random(options['seed']))
+            self.compare(options['repeat'])
+        finally:
+            connections['bench'].close()
+            if scratch:
+                os.remove(path)
+                os.rmdir(os.path.dirname(path))
+
+    def populate(self, count, rng):
+        songs = Song.objects.using('bench')
+        existing = songs.count()
+        if existing >= count:
+            self.stdout.write(f"Catalog: {existing} songs (reused)")
+            return
+        word = lambda: ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3)))
+        artists = [f"{word().title()} {word().title()}" for _ in range(count // 25 + 1)]
+        albums = [' '.join(word() for _ in range(rng.randint(1, 3))).title() for _ in range(count // 10 + 1)]
+        start = time.perf_counter()
+        batch = []
+        for _ in range(count - existing):
+            title = ' '.join(rng.choice(COMMON_WORDS) if rng.random() < 0.4 else word() for _ in range(rng.randint(1, 4)))
+            batch.append(Song(title=title.title(), artist=rng.choice(artists), album=rng.choice(albums),
+                              file='songs/bench.mp3'))
+            if len(batch) == 10000:
+                songs.bulk_create(batch)
+                batch = []
+        songs.bulk_create(batch)
+        self.stdout.write(f"Catalog: {count} songs, inserted (and indexed) in {time.perf_counter() - start:.1f}s")
+
+    def compare(self, repeat):
+        songs = Song.objects.using('bench')
+
+        def scan_all(q):  # SearchView before: every match, unpaginated
+            return len(list(songs.filter(Q(title__icontains=q) | Q(artist__icontains=q) | Q(album__icontains=q))))
+
+        def scan_page(q):  # SongListAPIView before: SearchFilter, count + first page
+            qs = SONG_INDEX.contains(songs.order_by('-uploaded_at'), q.split())
+            return qs.count(), len(list(qs[:12]))
+
+        def fts_page(q):  # now: ranked FTS5 match, count + first page
+            results = SONG_INDEX.search(songs.order_by('-uploaded_at'), q)
+            return results.count(), len(results[:12])
+
+        self.stdout.write(f"\n{'query':<16} {'matches':>8} {'scan all':>10} {'scan page':>10} {'fts page':>10} {'speedup':>8}")
+        for q in QUERIES:
+            timings = {}
+            for name, fn in (('scan_all', scan_all), ('scan_page', scan_page), ('fts_page', fts_page)):
+                samples = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    result = fn(q)
+                    samples.append(time.perf_counter() - start)
+                timings[name] = statistics.median(samples) * 1000
+                if name == 'fts_page':
+                    matches = result[0]
+            speedup = timings['scan_page'] / timings['fts_page'] if timings['fts_page'] else float('inf')
+            self.stdout.write(f"{q:<16} {matches:>8} {timings['scan_all']:>8.1f}ms {timings['scan_page']:>8.1f}ms "
+                              f"{timings['fts_page']:>8.1f}ms {speedup:>7.0f}x")
+        self.stdout.write("\n(median of %d runs; queries with no 3-character term fall back to a scan)" % repeat)
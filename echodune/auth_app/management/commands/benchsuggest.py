@@ -0,0 +1,63 @@
+import random
+import statistics
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from auth_app.suggest import PrefixIndex
+
+SYLLABLES = 'ka lo mi ra ven tor shi na bel dru zen qua fi mor lek sa tu ny vo gra hal ber ix ol the'.split()
+
+
+class Command(BaseCommand):
+    help = 'Build the suggestion prefix index over generated terms and time lookups and updates (no database).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--terms', type=int, default=1000000)
+        parser.add_argument('--lookups', type=int, default=100000)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        word = lambda: ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 4)))
+        terms = set()
+        while len(terms) < options['terms']:
+            terms.add(' '.join(word() for _ in range(rng.randint(1, 4))).title())
+        terms = list(terms)
+        scored = [(term, float(int(rng.paretovariate(1.1)))) for term in terms]  # a few very popular terms
+
+        index = PrefixIndex()
+        start = time.perf_counter()
+        index.build(scored)
+        build = time.perf_counter() - start
+        size = (sys.getsizeof(index._terms) + sum(map(sys.getsizeof, index._terms))
+                + index._scores.buffer_info()[1] * index._scores.itemsize
+                + sys.getsizeof(index._top) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in index._top.items()))
+        self.stdout.write(f"{len(index)} terms, {len(index._top)} precomputed prefixes: built in {build:.1f}s, "
+                          f"{size / 2 ** 20:.0f} MiB")
+
+        self.stdout.write(f"\n{'prefix length':<14} {'p50':>8} {'p99':>8} {'max':>8}")
+        for length in (1, 2, 3, 4, 6, 8):
+            prefixes = [term[:length] for term in rng.choices(terms, k=options['lookups'] // 6)]
+            samples = self.time_each(index.suggest, prefixes)
+            self.report(f"{length}", samples)
+
+        self.stdout.write(f"\n{'update':<14} {'p50':>8} {'p99':>8} {'max':>8}")
+        picks = rng.choices(terms, k=2000)
+        self.report('bump', self.time_each(lambda t: index.add(t, 1), picks))
+        self.report('new term', self.time_each(lambda t: index.add(t + ' live', 1), picks))
+        self.report('remove', self.time_each(lambda t: index.add(t + ' live', -1), picks))
+
+    def time_each(self, fn, args):
+        samples = []
+        for arg in args:
+            start = time.perf_counter_ns()
+            fn(arg)
+            samples.append(time.perf_counter_ns() - start)
+        return sorted(samples)
+
+    def report(self, label, samples):
+        p99 = samples[int(len(samples) * 0.99)]
+        self.stdout.write(f"{label:<14} {statistics.median(samples) / 1000:>6.1f}us {p99 / 1000:>6.1f}us "
+                          f"{samples[-1] / 1000:>6.0f}us")
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def install(apps, schema_editor):
+    from auth_app.search import install_indexes
+    install_indexes(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    from auth_app.search import uninstall_indexes
+    uninstall_indexes(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    """FTS5 trigram indexes over song title/artist/album and playlist name (SQLite only; see auth_app.search)."""
+
+    dependencies = [
+        ('auth_app', '0004_queue_playlist_is_shared_playlist_share_link_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
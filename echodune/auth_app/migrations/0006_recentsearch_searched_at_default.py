@@ -0,0 +1,19 @@
+# Generated by Django 4.2.16 on 2026-10-18 12:38
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0005_song_playlist_fts'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recentsearch',
+            name='searched_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
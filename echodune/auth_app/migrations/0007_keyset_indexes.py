@@ -0,0 +1,25 @@
+# Generated by Django 4.2.16 on 2026-10-18 12:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0006_recentsearch_searched_at_default'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='download',
+            index=models.Index(fields=['user', 'downloaded_at', 'id'], name='download_user_downloaded_id'),
+        ),
+        migrations.AddIndex(
+            model_name='likedsong',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='likedsong_user_created_at_id'),
+        ),
+        migrations.AddIndex(
+            model_name='song',
+            index=models.Index(fields=['uploaded_at', 'id'], name='song_uploaded_at_id'),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
+from django.utils import timezone
 
 class CustomUser(AbstractUser):
     email = models.EmailField(unique=True)
@@ -19,6 +20,9 @@ class Song(models.Model):
     duration = models.FloatField(blank=True, null=True, help_text='Duration in seconds')
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['uploaded_at', 'id'], name='song_uploaded_at_id')]  # keyset pages
+
     def __str__(self):
         return f"{self.title} - {self.artist}"
 
@@ -63,6 +67,7 @@ class LikedSong(models.Model):
 
     class Meta:
         unique_together = ('user', 'song')
+        indexes = [models.Index(fields=['user', 'created_at', 'id'], name='likedsong_user_created_at_id')]
 
     def __str__(self):
         return f"{self.user.username} likes {self.song.title}"
@@ -93,6 +98,7 @@ class Download(models.Model):
 
     class Meta:
         unique_together = ('user', 'song')
+        indexes = [models.Index(fields=['user', 'downloaded_at', 'id'], name='download_user_downloaded_id')]
 
     def __str__(self):
         return f"{self.user.username} downloaded {self.song.title}"
@@ -100,7 +106,7 @@ class Download(models.Model):
 class RecentSearch(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='recent_searches')
     query = models.CharField(max_length=255)
-    searched_at = models.DateTimeField(auto_now_add=True)
+    searched_at = models.DateTimeField(default=timezone.now)  # set when searched, not when the buffer is written
 
     class Meta:
         ordering = ['-searched_at']
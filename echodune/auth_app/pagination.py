@@ -0,0 +1,145 @@
+"""Keyset (cursor) pagination.
+
+A page is the rows just past the last row of the previous page. Its
+ordering keys, ending with a unique id, are looked up through an index
+rather than counted past with OFFSET. So a deep page costs what the first
+one does, and rows added in the meantime don't shift the pages. Cursors
+are opaque (base64 of the keys of the row to continue from), and there is
+no total count.
+"""
+import base64
+import binascii
+import datetime
+from functools import reduce
+import json
+import operator
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .search import RankedResults
+
+
+class KeysetPagination(BasePagination):
+    ordering = ('-created_at', '-id')  # needs an index on these fields; the last one must be unique
+    page_size = 12
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """The page of `queryset` at the request's cursor.
+
+        An FTS RankedResults pages by (rank, rowid) instead of `ordering`, so
+        search results stay in order of relevance.
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+        if isinstance(queryset, RankedResults):
+            rows = queryset.after(self.rank_position(position), size + 1, reverse)
+        else:
+            rows = self.after(queryset, position, size + 1, reverse)
+        more = len(rows) > size
+        rows = rows[:size]
+        if reverse:  # fetched nearest first, walking back from the cursor
+            rows.reverse()
+            self.has_next, self.has_previous = True, more
+        else:
+            self.has_next, self.has_previous = more, position is not None and bool(rows)
+        self.first_key = rows[0][0] if rows else None
+        self.last_key = rows[-1][0] if rows else None
+        return [row for _, row in rows]
+
+    def rank_position(self, position):
+        if position is None:
+            return None
+        try:
+            rank, rowid = position
+            return float(rank), int(rowid)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def after(self, queryset, position, limit, reverse=False):
+        """Up to `limit` (key, row) pairs of `queryset` that follow `position` in `ordering`.
+
+        With `reverse`, they are the rows before `position` instead, nearest first.
+        """
+        fields = [(name.lstrip('-'), name.startswith('-') != reverse) for name in self.ordering]
+        if position is not None:
+            if len(position) != len(fields):
+                raise NotFound(self.invalid_cursor_message)
+            try:
+                position = [queryset.model._meta.get_field(name).to_python(value)
+                            for (name, _), value in zip(fields, position)]
+            except ValidationError:
+                raise NotFound(self.invalid_cursor_message)
+            # Row-value comparison (a, b) < (x, y), spelled out: a < x OR (a = x AND b < y).
+            # The leading a <= x is redundant, but gives the planner a range to seek on the index.
+            past = [Q(**{name: value for (name, _), value in zip(fields[:i], position)},
+                      **{f"{name}__{'lt' if descending else 'gt'}": position[i]})
+                    for i, (name, descending) in enumerate(fields)]
+            leading, descending = fields[0]
+            queryset = queryset.filter(Q(**{f"{leading}__{'lte' if descending else 'gte'}": position[0]}),
+                                       reduce(operator.or_, past))
+        queryset = queryset.order_by(*[('-' if descending else '') + name for name, descending in fields])
+        return [(tuple(getattr(row, name) for name, _ in fields), row) for row in queryset[:limit]]
+
+    # ----- cursors -----
+    def encode_cursor(self, key, reverse=False):
+        values = [value.isoformat() if isinstance(value, datetime.datetime) else value for value in key]
+        data = json.dumps({'k': values, 'r': 1} if reverse else {'k': values}, separators=(',', ':'))
+        cursor = base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            return list(data['k']), bool(data.get('r'))
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if self.last_key is None:  # walked back past the start: continue from the first page
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.last_key)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(self.first_key, reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
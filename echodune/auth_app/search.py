@@ -0,0 +1,187 @@
+"""Full-text search over songs and playlists.
+
+On SQLite, each searchable table has an FTS5 index with the trigram tokenizer
+(`auth_app_song_fts`, `auth_app_playlist_fts`). The index holds no copy of
+the text: it reads the rows from the table itself and is kept in sync by
+triggers. So bulk_create, update() and raw SQL stay in sync too, which model
+signals would miss. Trigrams give the same substring semantics as icontains
+without scanning the table. Other database backends, and queries with no
+term of at least three characters, fall back to icontains.
+"""
+from functools import reduce
+import operator
+
+from django.db import connections
+from django.db.models import Q
+from rest_framework import filters
+
+
+class FullTextIndex:
+    def __init__(self, table, columns, weights):
+        self.table = table
+        self.columns = columns
+        self.weights = weights  # bm25 column weights: a hit in the title outranks one in the album
+        self.fts_table = f'{table}_fts'
+
+    def install_sql(self):
+        """Idempotent DDL for the index and its triggers."""
+        cols = ', '.join(self.columns)
+        new = ', '.join(f'new.{c}' for c in self.columns)
+        old = ', '.join(f'old.{c}' for c in self.columns)
+        fts = self.fts_table
+        return [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, content='{self.table}', "
+            f"content_rowid='id', tokenize='trigram')",
+            f"INSERT INTO {fts}({fts}, rank) VALUES ('rank', 'bm25({', '.join(map(str, self.weights))})')",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {self.table} BEGIN "
+            f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {self.table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); END",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {self.table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); "
+            f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END",
+        ]
+
+    def install(self, connection, repair_only=False):
+        """Create the index and triggers if missing, rebuilding the index from the table when anything was.
+
+        With `repair_only`, an index that was never installed is left alone.
+        """
+        if connection.vendor != 'sqlite':
+            return
+        triggers = {f'{self.fts_table}_{suffix}' for suffix in ('ai', 'ad', 'au')}
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE name IN (%s, %s, %s, %s)",
+                           [self.fts_table, *sorted(triggers)])
+            present = {row[0] for row in cursor.fetchall()}
+            if present == triggers | {self.fts_table} or (repair_only and self.fts_table not in present):
+                return
+            for statement in self.install_sql():
+                cursor.execute(statement)
+            # Rows written while a trigger was missing (e.g. after SQLite remade the table) are re-read here
+            cursor.execute(f"INSERT INTO {self.fts_table}({self.fts_table}) VALUES ('rebuild')")
+
+    def uninstall(self, connection):
+        if connection.vendor != 'sqlite':
+            return
+        with connection.cursor() as cursor:
+            for suffix in ('ai', 'ad', 'au'):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {self.fts_table}_{suffix}")
+            cursor.execute(f"DROP TABLE IF EXISTS {self.fts_table}")
+
+    def search(self, queryset, text):
+        """Rows of `queryset` containing every term of `text` in any indexed column, best match first.
+
+        The result is sliced (or paged by key) lazily, so a paginator fetches just one page.
+        """
+        terms = text.split()
+        long_terms = [t for t in terms if len(t) >= 3]  # shorter terms have no trigram to look up
+        if connections[queryset.db].vendor != 'sqlite' or not long_terms:
+            return self.contains(queryset, terms)
+        return RankedResults(self, queryset, long_terms, [t for t in terms if len(t) < 3])
+
+    def contains(self, queryset, terms):
+        for term in terms:
+            queryset = queryset.filter(reduce(operator.or_, (Q(**{f'{c}__icontains': term}) for c in self.columns)))
+        return queryset
+
+
+class RankedResults:
+    """An FTS5 match, ordered by bm25 rank; supports count() and slicing like a queryset, and keyset pages.
+
+    Pages are loaded through `queryset`, so its select_related and the like
+    apply; the count is taken from the index alone.
+    """
+
+    def __init__(self, index, queryset, terms, short_terms):
+        self.index = index
+        self.queryset = queryset
+        self.match = ' '.join('"%s"' % t.replace('"', '""') for t in terms)  # each term a literal phrase
+        self.short_terms = short_terms
+        self._count = None
+
+    def _from_where(self):
+        fts = self.index.fts_table
+        sql = f"FROM {fts}"
+        where, params = [f"{fts} MATCH %s"], [self.match]
+        if self.short_terms:  # checked against the row itself, like icontains
+            sql += f" JOIN {self.index.table} t ON t.id = {fts}.rowid"
+            for term in self.short_terms:
+                where.append('(' + ' OR '.join(f"t.{c} LIKE %s ESCAPE '\\'" for c in self.index.columns) + ')')
+                pattern = '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+                params += [pattern] * len(self.index.columns)
+        return f"{sql} WHERE {' AND '.join(where)}", params
+
+    def _execute(self, sql, params):
+        with connections[self.queryset.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def count(self):
+        if self._count is None:
+            from_where, params = self._from_where()
+            self._count = self._execute(f"SELECT count(*) {from_where}", params)[0][0]
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self[key:key + 1][0]
+        start, stop = key.start or 0, key.stop
+        if stop is not None and stop <= start:
+            return []
+        fts = self.index.fts_table
+        from_where, params = self._from_where()
+        rows = self._execute(f"SELECT {fts}.rowid {from_where} ORDER BY {fts}.rank, {fts}.rowid LIMIT %s OFFSET %s",
+                             params + [-1 if stop is None else stop - start, start])
+        ids = [row[0] for row in rows]
+        found = self.queryset.in_bulk(ids)
+        return [found[pk] for pk in ids if pk in found]
+
+    def after(self, position, limit, reverse=False):
+        """Up to `limit` ((rank, rowid), row) pairs past the `position` key, for keyset pagination.
+
+        With `reverse`, they are the rows before `position` instead, nearest first.
+        """
+        fts = self.index.fts_table
+        from_where, params = self._from_where()
+        op, direction = ('<', 'DESC') if reverse else ('>', 'ASC')
+        if position is not None:
+            from_where += f" AND ({fts}.rank {op} %s OR ({fts}.rank = %s AND {fts}.rowid {op} %s))"
+            params += [position[0], position[0], position[1]]
+        rows = self._execute(f"SELECT {fts}.rank, {fts}.rowid {from_where} "
+                             f"ORDER BY {fts}.rank {direction}, {fts}.rowid {direction} LIMIT %s", params + [limit])
+        found = self.queryset.in_bulk([rowid for _, rowid in rows])
+        return [((rank, rowid), found[rowid]) for rank, rowid in rows if rowid in found]
+
+
+SONG_INDEX = FullTextIndex('auth_app_song', ['title', 'artist', 'album'], weights=[10.0, 5.0, 2.0])
+PLAYLIST_INDEX = FullTextIndex('auth_app_playlist', ['name'], weights=[1.0])
+INDEXES = [SONG_INDEX, PLAYLIST_INDEX]
+
+
+def install_indexes(connection, repair_only=False):
+    for index in INDEXES:
+        index.install(connection, repair_only)
+
+
+def uninstall_indexes(connection):
+    for index in INDEXES:
+        index.uninstall(connection)
+
+
+def repair_indexes(using, **kwargs):
+    """post_migrate: SQLite drops triggers when a migration remakes their table, so put them back."""
+    install_indexes(connections[using], repair_only=True)
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """DRF `?search=` backed by a FullTextIndex instead of icontains; results come ranked."""
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, '')
+        if not text.strip():
+            return queryset
+        return view.search_index.search(queryset, text)
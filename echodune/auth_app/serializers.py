@@ -1,3 +1,5 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Prefetch, Subquery, Value, Window
+from django.db.models.functions import Coalesce, RowNumber
 from rest_framework import serializers
 from .models import Song, Playlist, LikedSong, PlaylistCollaborator, PlaylistLike, Queue, QueueSong, Download, RecentSearch
 
@@ -33,6 +35,92 @@ class PlaylistSerializer(serializers.ModelSerializer):
         model = Playlist
         fields = ['id', 'name', 'user', 'songs', 'cover_image', 'created_at', 'is_shared', 'share_link', 'collaborators', 'likes']
 
+PREVIEW_TRACKS = 4  # tracks shown with each playlist in a listing; the rest come from playlists/<id>/songs/
+
+def _count(queryset):
+    return Coalesce(Subquery(queryset.filter(playlist=OuterRef('pk')).order_by().values('playlist')
+                             .annotate(n=Count('pk')).values('n'), output_field=IntegerField()), Value(0))
+
+def playlist_summaries(queryset):
+    """Annotate a Playlist queryset with what PlaylistSummarySerializer needs, without joining the rows in."""
+    return queryset.select_related('user').annotate(
+        song_count=_count(Playlist.songs.through.objects),
+        collaborator_count=_count(PlaylistCollaborator.objects),
+        like_count=_count(PlaylistLike.objects),
+    )
+
+def playlist_details(queryset):
+    """Prefetch what PlaylistSerializer nests, so a playlist costs a fixed number of queries."""
+    return queryset.select_related('user').prefetch_related(
+        'songs',
+        Prefetch('collaborators', queryset=PlaylistCollaborator.objects.select_related('user')),
+        Prefetch('likes', queryset=PlaylistLike.objects.select_related('user')),
+    )
+
+def playlist_tracks(playlist_ids):
+    """Rows of the playlist-song table for `playlist_ids`, in the order the songs were added."""
+    return Playlist.songs.through.objects.filter(playlist_id__in=playlist_ids).select_related('song').order_by('id')
+
+class PlaylistSummaryListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        playlists = list(data.all() if hasattr(data, 'all') else data)
+        # First few tracks of every playlist in one query: number each playlist's rows and keep the first ones
+        previews = {playlist.id: [] for playlist in playlists}
+        tracks = playlist_tracks(previews).annotate(
+            position=Window(RowNumber(), partition_by=F('playlist_id'), order_by=F('id').asc()),
+        ).filter(position__lte=PREVIEW_TRACKS)
+        for track in tracks:
+            previews[track.playlist_id].append(track.song)
+        for playlist in playlists:
+            playlist.preview_songs = previews[playlist.id]
+        return super().to_representation(playlists)
+
+class PlaylistSummarySerializer(serializers.ModelSerializer):
+    """A playlist in a listing: counts and a preview instead of every song, collaborator and like."""
+    user = serializers.StringRelatedField()
+    cover_image = serializers.ImageField(use_url=True, required=False, allow_null=True)
+    cover = serializers.SerializerMethodField()
+    song_count = serializers.SerializerMethodField()
+    collaborator_count = serializers.SerializerMethodField()
+    like_count = serializers.SerializerMethodField()
+    preview = serializers.SerializerMethodField()
+    has_song = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Playlist
+        fields = ['id', 'name', 'user', 'cover_image', 'cover', 'created_at', 'is_shared', 'song_count',
+                  'collaborator_count', 'like_count', 'preview', 'has_song']
+        list_serializer_class = PlaylistSummaryListSerializer
+
+    def _preview_songs(self, playlist):
+        if not hasattr(playlist, 'preview_songs'):  # a single playlist, e.g. just created
+            playlist.preview_songs = [track.song for track in playlist_tracks([playlist.id])[:PREVIEW_TRACKS]]
+        return playlist.preview_songs
+
+    def get_cover(self, playlist):
+        # The playlist's own cover, else that of its first track that has one
+        image = playlist.cover_image or next((s.cover_image for s in self._preview_songs(playlist) if s.cover_image), None)
+        if not image:
+            return None
+        request = self.context.get('request')
+        return request.build_absolute_uri(image.url) if request else image.url
+
+    def get_song_count(self, playlist):
+        return playlist.song_count if hasattr(playlist, 'song_count') else playlist.songs.count()
+
+    def get_collaborator_count(self, playlist):
+        return playlist.collaborator_count if hasattr(playlist, 'collaborator_count') else playlist.collaborators.count()
+
+    def get_like_count(self, playlist):
+        return playlist.like_count if hasattr(playlist, 'like_count') else playlist.likes.count()
+
+    def get_preview(self, playlist):
+        return SongSerializer(self._preview_songs(playlist), many=True, context=self.context).data
+
+    def get_has_song(self, playlist):
+        # Only annotated when the listing was asked about a song (?song=<id>)
+        return getattr(playlist, 'has_song', None)
+
 class LikedSongSerializer(serializers.ModelSerializer):
     user = serializers.StringRelatedField()
     song = SongSerializer(read_only=True)
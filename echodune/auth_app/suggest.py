@@ -0,0 +1,283 @@
+"""Type-ahead suggestions from an in-process prefix index.
+
+Terms are song titles, artists and albums plus search queries that several
+users have made. Each term is scored by popularity: a song term counts the
+song and its likes, and a query counts its searches. Each process builds
+its index in a background thread on its first request. After that, signals
+keep it current with songs saved or deleted in that process. Changes made
+elsewhere (another worker, importsongs) show up after a restart.
+"""
+from array import array
+from bisect import bisect_left
+import heapq
+import logging
+import sys
+import threading
+
+from django.db.models import Count
+
+logger = logging.getLogger(__name__)
+
+MAX_TERMS = 1000000  # the least popular terms are dropped beyond this
+TOP_K = 10  # suggestions kept per prefix, and the most a lookup returns
+HEAVY_PREFIX = 64  # prefixes with more completions than this keep a precomputed top-k
+MIN_QUERY_USERS = 3  # a search query is suggested once this many users have made it
+POPULAR_QUERIES = 10000
+
+
+def tidy(text):
+    return ' '.join(text.split())
+
+
+def normalize(text):
+    return tidy(text).casefold()
+
+
+def _successor(prefix):
+    """Smallest string greater than every string starting with `prefix`, or None if no string is.
+
+    U+10FFFF has no next character, so trailing ones are dropped and the one before them is bumped.
+    """
+    stem = prefix.rstrip(chr(sys.maxunicode))
+    if not stem:
+        return None
+    return stem[:-1] + chr(ord(stem[-1]) + 1)
+
+
+class PrefixIndex:
+    """Most popular completions of a prefix, from a sorted array of terms.
+
+    Terms are kept in one list sorted by their normalized (casefolded) form,
+    with scores in a parallel array('d'): about one string and 16 bytes per
+    term. A prefix is a contiguous run of that list, found by bisection.
+    When full, the least popular 1% is dropped in one pass. Prefixes
+    with more than `heavy` completions (short ones, or "the ") keep their
+    top `k` precomputed. Any other prefix ranks at most about `heavy`
+    entries. Either way a lookup costs microseconds, whatever the size.
+    """
+
+    def __init__(self, max_terms=MAX_TERMS, k=TOP_K, heavy=HEAVY_PREFIX):
+        self.max_terms = max_terms
+        self.k = k
+        self.heavy = heavy
+        self._lock = threading.Lock()
+        self._terms = []  # display forms (whitespace tidied), sorted by casefold()
+        self._scores = array('d')
+        self._top = {}  # heavy prefix -> [(score, term)], best first
+
+    def __len__(self):
+        return len(self._terms)
+
+    def build(self, scored):
+        """Replace the contents with (text, score) pairs; texts that normalize alike are merged."""
+        merged = {}
+        for text, score in scored:
+            key = normalize(text)
+            if not key:
+                continue
+            entry = merged.get(key)
+            if entry is None:
+                merged[key] = [tidy(text), score]
+            else:
+                entry[1] += score
+        keys = merged.keys()
+        if len(merged) > self.max_terms:
+            keys = heapq.nlargest(self.max_terms, keys, key=lambda key: merged[key][1])
+        keys = sorted(keys)
+        terms = [merged[key][0] for key in keys]
+        scores = array('d', (merged[key][1] for key in keys))
+        top = self._heavy_prefixes(keys, terms, scores)
+        with self._lock:
+            self._terms, self._scores, self._top = terms, scores, top
+
+    def _heavy_prefixes(self, keys, terms, scores):
+        top = {}
+        stack = [('', 0, len(keys))]
+        while stack:
+            prefix, lo, hi = stack.pop()
+            if prefix:
+                top[prefix] = self._best(scores, terms, lo, hi)
+            depth = len(prefix)
+            i = lo
+            while i < hi:
+                if len(keys[i]) == depth:  # the prefix itself sorts first
+                    i += 1
+                    continue
+                child = keys[i][:depth + 1]
+                end = _successor(child)
+                j = bisect_left(keys, end, i, hi) if end is not None else hi
+                if j - i > self.heavy:
+                    stack.append((child, i, j))
+                i = j
+        return top
+
+    def _best(self, scores, terms, lo, hi, n=None):
+        n = n or self.k
+        if hi - lo <= 8 * self.heavy:  # sorting a short run in C beats heapq's Python loop
+            best = sorted(range(lo, hi), key=scores.__getitem__, reverse=True)[:n]
+        else:
+            best = heapq.nlargest(n, range(lo, hi), key=scores.__getitem__)
+        return [(scores[i], terms[i]) for i in best]
+
+    def _range(self, prefix):
+        terms, end = self._terms, _successor(prefix)
+        lo = bisect_left(terms, prefix, key=str.casefold)
+        if end is None:  # the prefix runs to the end of the list
+            return lo, len(terms)
+        step = 1  # most ranges are short: gallop from lo rather than bisect the whole list again
+        while lo + step < len(terms) and terms[lo + step].casefold() < end:
+            step *= 2
+        return lo, bisect_left(terms, end, lo + step // 2, min(lo + step, len(terms)), key=str.casefold)
+
+    def suggest(self, prefix, limit=TOP_K):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        with self._lock:
+            top = self._top.get(prefix)
+            if top is not None:
+                return [term for _, term in top[:limit]]
+            lo, hi = self._range(prefix)
+            return [term for _, term in self._best(self._scores, self._terms, lo, hi, limit)]
+
+    def add(self, text, delta=1.0, create=True):
+        """Change the score of `text` by `delta`, inserting it if new (and `create`) or dropping it at zero."""
+        key = normalize(text)
+        if not key:
+            return
+        with self._lock:
+            i, _ = self._range(key)
+            if i < len(self._terms) and self._terms[i].casefold() == key:
+                term, score = self._terms[i], self._scores[i] + delta
+                if score <= 0:
+                    del self._terms[i]
+                    del self._scores[i]
+                    self._refresh_tops(key, term, None)
+                    return
+                self._scores[i] = score
+            elif create and delta > 0:
+                if len(self._terms) >= self.max_terms:
+                    self._trim(max(1, self.max_terms // 100))
+                    i, _ = self._range(key)
+                term, score = tidy(text), delta
+                self._terms.insert(i, term)
+                self._scores.insert(i, score)
+            else:
+                return
+            self._refresh_tops(key, term, score if delta > 0 else None)
+
+    def _trim(self, count):
+        """Drop the `count` least popular terms."""
+        dropped = set(heapq.nsmallest(count, range(len(self._terms)), key=self._scores.__getitem__))
+        evicted = [self._terms[i] for i in sorted(dropped)]
+        keep = [i for i in range(len(self._terms)) if i not in dropped]
+        self._terms = [self._terms[i] for i in keep]
+        self._scores = array('d', (self._scores[i] for i in keep))
+        for term in evicted:
+            self._refresh_tops(term.casefold(), term, None)
+
+    def _refresh_tops(self, key, term, raised_to):
+        """Fix the precomputed lists of `key`'s heavy prefixes after its score rose to `raised_to`, or fell."""
+        for n in range(1, len(key) + 1):
+            prefix = key[:n]
+            top = self._top.get(prefix)
+            if top is None:
+                break  # a prefix is only heavy if all shorter ones are
+            listed = any(t is term for _, t in top)
+            if raised_to is not None:
+                top = [(s, t) for s, t in top if t is not term] + [(raised_to, term)]
+                top.sort(key=lambda entry: -entry[0])
+                self._top[prefix] = top[:self.k]
+            elif listed:  # fell, maybe below a term not listed: rank the prefix again
+                lo, hi = self._range(prefix)
+                self._top[prefix] = self._best(self._scores, self._terms, lo, hi)
+
+
+class Suggestions:
+    """The process-wide index over the catalog and popular searches."""
+
+    def __init__(self):
+        self.index = PrefixIndex()
+        self.ready = threading.Event()
+        self._lock = threading.Lock()
+        self._started = False
+        self._pending = None  # updates that arrive while building, replayed afterwards
+
+    def start(self, **kwargs):
+        """Build in the background, once; connected to request_started."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self.build, name='suggest-build', daemon=True).start()
+
+    def build(self):
+        from .models import LikedSong, RecentSearch, Song
+        with self._lock:
+            self._started = True
+            self._pending = []
+        try:
+            likes = dict(LikedSong.objects.values_list('song').annotate(n=Count('id')).values_list('song', 'n'))
+            songs = Song.objects.values_list('id', 'title', 'artist', 'album').iterator(chunk_size=5000)
+            queries = (RecentSearch.objects.values('query')
+                       .annotate(users=Count('user', distinct=True), searches=Count('id'))
+                       .filter(users__gte=MIN_QUERY_USERS).order_by('-searches')[:POPULAR_QUERIES])
+
+            def scored():
+                for song_id, *fields in songs:
+                    weight = 1 + likes.get(song_id, 0)
+                    for text in fields:
+                        if text:
+                            yield text, weight
+                for row in queries:
+                    yield row['query'], row['searches']
+
+            self.index.build(scored())
+        except Exception:
+            logger.exception('Building the suggestion index failed')
+        finally:
+            with self._lock:
+                pending, self._pending = self._pending, None
+            for args in pending:
+                self.index.add(*args)
+            self.ready.set()
+        logger.info('Suggestion index: %d terms', len(self.index))
+
+    def suggest(self, prefix, limit=TOP_K):
+        if not self.ready.is_set():
+            return []
+        return self.index.suggest(prefix, limit)
+
+    def add(self, text, delta=1.0, create=True):
+        if not text or not self._started:
+            return
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((text, delta, create))
+                return
+        self.index.add(text, delta, create)
+
+    # ----- signal receivers -----
+    def song_pre_save(self, sender, instance, **kwargs):
+        if self._started and instance.pk is not None:
+            instance._suggest_fields = sender.objects.filter(pk=instance.pk).values_list(
+                'title', 'artist', 'album').first()
+
+    def song_saved(self, sender, instance, created, **kwargs):
+        old = getattr(instance, '_suggest_fields', None)
+        new = (instance.title, instance.artist, instance.album)
+        for before, after in zip(old or (None,) * 3, new):
+            if before != after:
+                self.add(before, -1)
+                self.add(after, 1)
+
+    def song_deleted(self, sender, instance, **kwargs):
+        for text in (instance.title, instance.artist, instance.album):
+            self.add(text, -1)
+
+    def search_saved(self, sender, instance, created, **kwargs):
+        if created:
+            self.add(instance.query, 1, create=False)  # new queries join at the next build, once popular
+
+
+suggestions = Suggestions()
@@ -1,3 +1,391 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.core.signals import request_started
+from django.db import DatabaseError, connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from .models import CustomUser, Song, Playlist, PlaylistCollaborator, PlaylistLike, LikedSong, RecentSearch
+from .history import SearchHistory, search_history
+from .search import SONG_INDEX, repair_indexes
+from .serializers import PREVIEW_TRACKS
+from .suggest import PrefixIndex, Suggestions, suggestions
+
+
+class NoSuggestBuildMixin:
+    """Keeps the first request from building the suggestion index in a thread while the test database is in use."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        request_started.disconnect(dispatch_uid='suggest-start')
+
+    @classmethod
+    def tearDownClass(cls):
+        request_started.connect(suggestions.start, dispatch_uid='suggest-start')
+        super().tearDownClass()
+
+
+class PlaylistQueryCountTests(NoSuggestBuildMixin, TestCase):
+    """Listing and showing playlists costs a fixed number of queries, however many songs they hold."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomUser.objects.create_user(username='owner', email='owner@example.com', password='pw')
+        cls.others = [CustomUser.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='pw')
+                      for i in range(3)]
+        cls.songs = Song.objects.bulk_create([Song(title=f'Song {i}', artist='Artist', file=f'songs/{i}.mp3')
+                                              for i in range(30)])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def make_playlists(self, count, songs):
+        playlists = []
+        for i in range(count):
+            playlist = Playlist.objects.create(name=f'Mix {i}', user=self.owner)
+            playlist.songs.add(*self.songs[:songs])
+            for user in self.others:
+                PlaylistCollaborator.objects.create(playlist=playlist, user=user)
+                PlaylistLike.objects.create(playlist=playlist, user=user)
+            playlists.append(playlist)
+        return playlists
+
+    def test_list_is_constant(self):
+        self.make_playlists(2, 5)
+        with self.assertNumQueries(2):  # playlists with counts, then every preview
+            response = self.client.get(reverse('playlist-list-create'))
+        self.make_playlists(8, 30)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('playlist-list-create'))
+        self.assertEqual(len(response.data), 10)
+        first = response.data[0]
+        self.assertEqual(first['song_count'], 30)
+        self.assertEqual(first['collaborator_count'], 3)
+        self.assertEqual(first['like_count'], 3)
+        self.assertEqual([s['id'] for s in first['preview']], [s.id for s in self.songs[:PREVIEW_TRACKS]])
+        self.assertNotIn('songs', first)
+
+    def test_list_marks_playlists_with_song(self):
+        with_song, without_song = self.make_playlists(2, 1)
+        without_song.songs.clear()
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('playlist-list-create'), {'song': self.songs[0].id})
+        self.assertEqual({p['id']: p['has_song'] for p in response.data}, {with_song.id: True, without_song.id: False})
+
+    def test_detail_is_constant(self):
+        small, = self.make_playlists(1, 1)
+        large, = self.make_playlists(1, 30)
+        with self.assertNumQueries(4):  # playlist and owner, songs, collaborators, likes
+            self.client.get(reverse('playlist-detail', args=[small.id]))
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('playlist-detail', args=[large.id]))
+        self.assertEqual(len(response.data['songs']), 30)
+        self.assertEqual(sorted(c['user'] for c in response.data['collaborators']), ['user0', 'user1', 'user2'])
+
+    def test_songs_are_paged_in_order(self):
+        playlist, = self.make_playlists(1, 0)
+        for song in reversed(self.songs):
+            playlist.songs.add(song)
+        url = reverse('playlist-songs', args=[playlist.id])
+        with self.assertNumQueries(3):  # the playlist, the count, the page
+            response = self.client.get(url, {'page': 2, 'page_size': 10})
+        self.assertEqual(response.data['count'], 30)
+        self.assertEqual([s['id'] for s in response.data['results']], [s.id for s in self.songs[19:9:-1]])
+
+    def test_songs_of_someone_elses_playlist(self):
+        playlist = Playlist.objects.create(name='Private', user=self.others[0])
+        response = self.client.get(reverse('playlist-songs', args=[playlist.id]))
+        self.assertEqual(response.status_code, 404)
+
+
+class KeysetPaginationTests(NoSuggestBuildMixin, TestCase):
+    """Cursor pages walk a listing in order, forwards and back, at a fixed cost per page."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username='listener', email='listener@example.com', password='pw')
+        cls.songs = Song.objects.bulk_create([Song(title=f'Track {i}', artist='Band', file=f'songs/{i}.mp3')
+                                              for i in range(25)])
+        # Several songs share a timestamp, so pages must break ties by id
+        Song.objects.filter(id__in=[s.id for s in cls.songs[5:15]]).update(uploaded_at=cls.songs[5].uploaded_at)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url, direction='next'):
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            page = [s['id'] for s in response.data['results']]
+            ids = ids + page if direction == 'next' else page + ids
+            url, pages = response.data[direction], pages + 1
+        return ids, pages, response
+
+    def test_songs_forwards_and_back(self):
+        expected = list(Song.objects.order_by('-uploaded_at', '-id').values_list('id', flat=True))
+        ids, pages, last = self.walk(reverse('song-list') + '?page_size=4')
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 7)
+        ids, _, first = self.walk(last.data['previous'], 'previous')
+        self.assertEqual(ids, expected[:24])  # every page before the last one
+        self.assertIsNone(first.data['previous'])
+
+    def test_pages_do_not_shift_when_songs_are_added(self):
+        first = self.client.get(reverse('song-list'), {'page_size': 5}).data
+        Song.objects.create(title='New', artist='Band', file='songs/new.mp3')
+        second = self.client.get(first['next']).data
+        expected = list(Song.objects.order_by('-uploaded_at', '-id').values_list('id', flat=True))[1:]
+        self.assertEqual([s['id'] for s in first['results'] + second['results']], expected[:10])
+
+    def test_deep_page_costs_the_same(self):
+        for song in self.songs:
+            LikedSong.objects.create(user=self.user, song=song)
+        with self.assertNumQueries(1):  # no COUNT, no OFFSET, song and user joined in
+            first = self.client.get(reverse('liked-song-list-create'), {'page_size': 2})
+        url = first.data['next']
+        for _ in range(10):
+            url = self.client.get(url).data['next']
+        with self.assertNumQueries(1):
+            deep = self.client.get(url)
+        self.assertEqual(len(deep.data['results']), 2)
+
+    def test_search_pages_by_relevance(self):
+        Song.objects.create(title='Track', artist='Track', album='Track', file='songs/best.mp3')
+        with mock.patch.object(search_history, 'record'):  # history is written by a background thread
+            response = self.client.get(reverse('search'), {'q': 'track', 'page_size': 10})
+            self.assertEqual(response.data['songs'][0]['title'], 'Track')
+            ids = [s['id'] for s in response.data['songs']]
+            while response.data['songs_next']:
+                response = self.client.get(response.data['songs_next'])
+                ids += [s['id'] for s in response.data['songs']]
+        self.assertEqual(sorted(ids), sorted(Song.objects.values_list('id', flat=True)))
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('song-list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class FullTextSearchTests(TestCase):
+    """The FTS5 song index: ranked matches, short terms checked literally, kept in sync by triggers."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.title = Song.objects.create(title='Echo Chamber', artist='Band', album='Rooms', file='songs/a.mp3')
+        cls.album = Song.objects.create(title='Intro', artist='Band', album='Echo Chamber', file='songs/b.mp3')
+        cls.percent = Song.objects.create(title='Lovely 100%', artist='Band', file='songs/c.mp3')
+        cls.underscore = Song.objects.create(title='Lovely_Bug', artist='Band', file='songs/d.mp3')
+        cls.plain = Song.objects.create(title='Lovely Day', artist='Band', file='songs/e.mp3')
+
+    def search(self, text):
+        return [song.id for song in SONG_INDEX.search(Song.objects.all(), text)[:]]
+
+    def test_title_match_outranks_album_match(self):
+        results = SONG_INDEX.search(Song.objects.all(), 'chamber ech')
+        self.assertEqual(results.count(), 2)
+        self.assertEqual([song.id for song in results[:]], [self.title.id, self.album.id])
+
+    def test_short_terms_are_matched_literally(self):
+        self.assertEqual(self.search('lovely %'), [self.percent.id])
+        self.assertEqual(self.search('lovely _'), [self.underscore.id])
+        self.assertEqual(sorted(self.search('lovely')), sorted([self.percent.id, self.underscore.id, self.plain.id]))
+
+    def test_only_short_terms_fall_back_to_icontains(self):
+        self.assertEqual(list(SONG_INDEX.search(Song.objects.all(), '%').values_list('id', flat=True)),
+                         [self.percent.id])
+        self.assertEqual(list(SONG_INDEX.search(Song.objects.all(), '_').values_list('id', flat=True)),
+                         [self.underscore.id])
+
+    def test_update_and_delete_reach_the_index(self):
+        Song.objects.filter(id=self.plain.id).update(title='Sunny Afternoon')  # no signals, only triggers
+        self.assertEqual(self.search('afternoon'), [self.plain.id])
+        self.assertNotIn(self.plain.id, self.search('lovely'))
+        Song.objects.filter(id=self.plain.id).delete()
+        self.assertEqual(self.search('afternoon'), [])
+
+
+class FullTextRepairTests(TransactionTestCase):
+    """repair_indexes restores what a migration remaking the song table drops."""
+
+    def test_triggers_come_back_after_a_table_remake(self):
+        Song.objects.create(title='Before Remake', artist='Band', file='songs/a.mp3')
+        old_field = Song._meta.get_field('title')
+        new_field = old_field.clone()
+        new_field.set_attributes_from_name('title')
+        new_field.max_length += 1
+        with connection.schema_editor() as editor:  # SQLite copies the table and drops its triggers
+            editor.alter_field(Song, old_field, new_field)
+        try:
+            Song.objects.create(title='Written Without Triggers', artist='Band', file='songs/b.mp3')
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'auth_app_song'")
+                self.assertEqual(cursor.fetchone()[0], 0)
+
+            repair_indexes('default')
+            Song.objects.create(title='After Repair', artist='Band', file='songs/c.mp3')
+            for text, title in [('before remake', 'Before Remake'), ('without triggers', 'Written Without Triggers'),
+                                ('after repair', 'After Repair')]:
+                self.assertEqual([song.title for song in SONG_INDEX.search(Song.objects.all(), text)[:]], [title])
+        finally:
+            with connection.schema_editor() as editor:
+                editor.alter_field(Song, new_field, old_field)
+            repair_indexes('default')
+
+
+class PrefixIndexTests(SimpleTestCase):
+    """Completions ranked by score, kept right as terms are added, dropped and trimmed."""
+
+    def test_build_merges_and_ranks(self):
+        index = PrefixIndex()
+        index.build([('Hello', 1), ('  hello ', 2), ('Help', 2.5), ('World', 1), ('', 9)])
+        self.assertEqual(len(index), 3)
+        self.assertEqual(index.suggest('HEL'), ['Hello', 'Help'])
+        self.assertEqual(index.suggest('hel', limit=1), ['Hello'])
+        self.assertEqual(index.suggest('x'), [])
+
+    def test_add_and_delete(self):
+        index = PrefixIndex()
+        index.build([('Hello', 3), ('Help', 2)])
+        index.add('Helium', 5)
+        self.assertEqual(index.suggest('hel'), ['Helium', 'Hello', 'Help'])
+        index.add('helium', -5)
+        self.assertEqual(index.suggest('hel'), ['Hello', 'Help'])
+        index.add('Helix', 1, create=False)
+        self.assertEqual(len(index), 2)
+
+    def test_heavy_prefix_is_ranked_again_when_a_listed_term_falls(self):
+        index = PrefixIndex(k=2, heavy=2)
+        index.build([('aa', 5), ('ab', 4), ('ac', 3), ('ad', 1)])
+        self.assertEqual(index.suggest('a'), ['aa', 'ab'])  # precomputed: four completions
+        index.add('aa', -4.5)
+        self.assertEqual(index.suggest('a'), ['ab', 'ac'])
+        index.add('ad', 10)
+        self.assertEqual(index.suggest('a'), ['ad', 'ab'])
+
+    def test_trim_drops_the_least_popular(self):
+        index = PrefixIndex(max_terms=4, k=4, heavy=2)
+        index.build([(f'a{i}', i) for i in range(1, 5)])
+        index.add('b', 5)
+        self.assertEqual(len(index), 4)
+        self.assertEqual(index.suggest('a'), ['a4', 'a3', 'a2'])
+        self.assertEqual(index.suggest('b'), ['b'])
+
+    def test_prefix_ending_in_the_last_code_point(self):
+        last = chr(0x10FFFF)
+        index = PrefixIndex(heavy=1)
+        index.build([(last, 3), (last + 'x', 2), (last + 'y', 1), ('a' + last, 1), ('b', 1)])
+        self.assertEqual(index.suggest(last), [last, last + 'x', last + 'y'])
+        self.assertEqual(index.suggest('a' + last), ['a' + last])
+        index.add(last + last, 4)
+        self.assertEqual(index.suggest(last)[0], last + last)
+
+
+class SuggestViewTests(NoSuggestBuildMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username='typist', email='typist@example.com', password='pw')
+        Song.objects.create(title='Lovely Day', artist='Bill Withers', file='songs/a.mp3')
+        Song.objects.create(title='Love Will Tear Us Apart', artist='Joy Division', file='songs/b.mp3')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.suggestions = Suggestions()
+        patcher = mock.patch('auth_app.views.suggestions', self.suggestions)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_empty_until_built(self):
+        response = self.client.get(reverse('suggest'), {'q': 'lov'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['suggestions'], [])
+        self.suggestions.build()
+        response = self.client.get(reverse('suggest'), {'q': 'lov', 'limit': 1})
+        self.assertEqual(len(response.data['suggestions']), 1)
+        response = self.client.get(reverse('suggest'), {'q': 'lov'})
+        self.assertEqual(sorted(response.data['suggestions']), ['Love Will Tear Us Apart', 'Lovely Day'])
+
+    def test_last_code_point(self):
+        self.suggestions.build()
+        response = self.client.get(reverse('suggest') + '?q=%F4%8F%BF%BF')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['suggestions'], [])
+
+
+class SearchHistoryTests(NoSuggestBuildMixin, TestCase):
+    """Searches are buffered, deduplicated and capped per user, and written before anyone reads them."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username='seeker', email='seeker@example.com', password='pw')
+        cls.other = CustomUser.objects.create_user(username='other', email='other@example.com', password='pw')
+
+    def setUp(self):
+        self.history = SearchHistory(flush_seconds=3600)  # written only when a test flushes
+        patcher = mock.patch('auth_app.views.search_history', self.history)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def queries(self, user):
+        return list(RecentSearch.objects.filter(user=user).order_by('-searched_at', '-id').values_list('query', flat=True))
+
+    def test_repeats_are_written_once(self):
+        for query in ['daft punk', 'air', '  daft   punk ']:
+            self.history.record(self.user.id, query)
+        self.assertEqual(self.history.flush(), 2)
+        self.assertEqual(self.queries(self.user), ['daft punk', 'air'])
+        self.history.record(self.user.id, 'air')
+        self.history.flush()
+        self.assertEqual(self.queries(self.user), ['air', 'daft punk'])
+
+    def test_each_user_keeps_the_latest_twenty(self):
+        for i in range(25):
+            self.history.record(self.user.id, f'query {i}')
+        self.history.record(self.other.id, 'mine')
+        self.history.flush()
+        self.assertEqual(self.queries(self.user), [f'query {i}' for i in range(24, 4, -1)])
+        self.assertEqual(self.queries(self.other), ['mine'])
+
+    def test_reading_history_flushes_only_the_reader(self):
+        with mock.patch.object(SONG_INDEX, 'search', return_value=Song.objects.none()):
+            self.client.get(reverse('search'), {'q': 'boards of canada'})
+        self.history.record(self.other.id, 'pending elsewhere')
+        response = self.client.get(reverse('recent-search-list-create'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['query'] for row in response.data], ['boards of canada'])
+        self.assertEqual(self.queries(self.other), [])
+        self.assertEqual(self.history.flush(), 1)
+
+    def test_clearing_history_discards_pending_searches(self):
+        RecentSearch.objects.create(user=self.user, query='written')
+        self.history.record(self.user.id, 'pending')
+        self.history.record(self.other.id, 'kept')
+        self.assertEqual(self.client.delete(reverse('recent-search-list-create')).status_code, 204)
+        self.assertEqual(self.history.flush(), 1)
+        self.assertEqual(self.queries(self.user), [])
+        self.assertEqual(self.queries(self.other), ['kept'])
+
+    def test_failed_write_is_retried_with_newer_searches(self):
+        self.history.record(self.user.id, 'first')
+        self.history.record(self.user.id, 'second')
+        with mock.patch.object(RecentSearch.objects, 'bulk_create', side_effect=DatabaseError('disk I/O error')):
+            with self.assertRaises(DatabaseError):
+                self.history.flush()
+        self.history.record(self.user.id, 'third')
+        self.history.record(self.user.id, 'first')
+        self.assertEqual(self.history.flush(), 3)
+        self.assertEqual(self.queries(self.user), ['first', 'third', 'second'])
+
+    def test_exit_flush_skips_a_missing_table(self):
+        self.history.record(self.user.id, 'late')
+        with mock.patch.object(connection.introspection, 'table_names', return_value=[]):
+            self.history.flush_at_exit()
+        self.assertEqual(self.queries(self.user), [])
+        self.history.flush_at_exit()
+        self.assertEqual(self.queries(self.user), ['late'])
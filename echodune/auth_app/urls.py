@@ -1,10 +1,10 @@
 from django.urls import path
 from .views import (
     RegisterView, LoginView, LogoutView, UserProfileView, GoogleLoginView, SongListAPIView,
-    PlaylistListCreateView, PlaylistDetailView, LikedSongListCreateView, LikedSongDeleteView, LikedSongCreateView,
+    PlaylistListCreateView, PlaylistDetailView, PlaylistSongListView, LikedSongListCreateView, LikedSongDeleteView, LikedSongCreateView,
     QueueView, DownloadListCreateView, DownloadDeleteView,
     PlaylistCollaboratorAddView, PlaylistCollaboratorRemoveView, PlaylistLikeView,
-    PlaylistShareView, PlaylistJoinSharedView, RecentSearchListCreateView, RecommendationView, SearchView, PlaybackControlView,
+    PlaylistShareView, PlaylistJoinSharedView, RecentSearchListCreateView, RecommendationView, SearchView, SuggestView, PlaybackControlView,
     liked_song_ids
 )
 
@@ -17,6 +17,7 @@ urlpatterns = [
     path('songs/', SongListAPIView.as_view(), name='song-list'),
     path('playlists/', PlaylistListCreateView.as_view(), name='playlist-list-create'),
     path('playlists/<int:pk>/', PlaylistDetailView.as_view(), name='playlist-detail'),
+    path('playlists/<int:pk>/songs/', PlaylistSongListView.as_view(), name='playlist-songs'),
     path('liked-songs/', LikedSongListCreateView.as_view(), name='liked-song-list-create'),
     path('liked-songs/<int:song_id>/', LikedSongCreateView.as_view(), name='liked-song-create'),
     path('liked-songs/<int:song_id>/delete/', LikedSongDeleteView.as_view(), name='liked-song-delete'),
@@ -48,6 +49,7 @@ urlpatterns = [
 
     # Search
     path('search/', SearchView.as_view(), name='search'),
+    path('suggest/', SuggestView.as_view(), name='suggest'),
 
     # Playback Controls
     path('playback/', PlaybackControlView.as_view(), name='playback-control'),
@@ -6,14 +6,17 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
 from social_django.utils import psa
 from .models import CustomUser, Song, Playlist, LikedSong, PlaylistCollaborator, PlaylistLike, Queue, QueueSong, Download, RecentSearch
-from .serializers import SongSerializer, PlaylistSerializer, LikedSongSerializer, PlaylistCollaboratorSerializer, PlaylistLikeSerializer, QueueSerializer, QueueSongSerializer, DownloadSerializer, RecentSearchSerializer
-from rest_framework import generics, permissions, filters
+from .serializers import SongSerializer, PlaylistSerializer, PlaylistSummarySerializer, playlist_details, playlist_summaries, playlist_tracks, LikedSongSerializer, PlaylistCollaboratorSerializer, PlaylistLikeSerializer, QueueSerializer, QueueSongSerializer, DownloadSerializer, RecentSearchSerializer
+from .search import SONG_INDEX, PLAYLIST_INDEX, FullTextSearchFilter
+from .suggest import TOP_K, suggestions
+from .history import search_history
+from .pagination import KeysetPagination
+from rest_framework import generics, permissions
 from rest_framework.pagination import PageNumberPagination
 import json
 import requests
 from django.contrib.auth import get_user_model
 from rest_framework.response import Response
-from django.db.models import Q
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework import viewsets
 from django.db import models
@@ -106,7 +109,10 @@ class GoogleLoginView(APIView):
             'access': str(refresh.access_token),
         })
 
-class SongPagination(PageNumberPagination):
+class SongPagination(KeysetPagination):
+    ordering = ('-uploaded_at', '-id')  # ?search= results page by relevance instead
+
+class PlaylistSongPagination(PageNumberPagination):
     page_size = 12
     page_size_query_param = 'page_size'
     max_page_size = 50
@@ -116,19 +122,24 @@ class SongListAPIView(generics.ListAPIView):
     serializer_class = SongSerializer
     permission_classes = []
     pagination_class = SongPagination
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['title', 'artist', 'album']
+    filter_backends = [FullTextSearchFilter]  # ?search= matches are ranked by relevance
+    search_index = SONG_INDEX
 
 class PlaylistListCreateView(generics.ListCreateAPIView):
-    serializer_class = PlaylistSerializer
+    serializer_class = PlaylistSummarySerializer  # counts and a preview; full track lists are paged by PlaylistSongListView
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         # Show playlists owned by the user or where the user is a collaborator
-        return Playlist.objects.filter(
+        queryset = playlist_summaries(Playlist.objects.filter(
             models.Q(user=self.request.user) |
             models.Q(collaborators__user=self.request.user)
-        ).distinct().order_by('-created_at')
+        ).distinct().order_by('-created_at'))
+        song_id = self.request.query_params.get('song')
+        if song_id and song_id.isdigit():  # ?song=<id> marks the playlists that already hold that song
+            queryset = queryset.annotate(has_song=models.Exists(
+                Playlist.songs.through.objects.filter(playlist=models.OuterRef('pk'), song_id=song_id)))
+        return queryset
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -139,10 +150,10 @@ class PlaylistDetailView(generics.RetrieveUpdateDestroyAPIView):
 
     def get_queryset(self):
         # Allow owner or collaborator to access playlist
-        return Playlist.objects.filter(
+        return playlist_details(Playlist.objects.filter(
             models.Q(user=self.request.user) |
             models.Q(collaborators__user=self.request.user)
-        ).distinct()
+        ).distinct())
 
     def patch(self, request, *args, **kwargs):
         playlist = self.get_object()
@@ -168,14 +179,34 @@ class PlaylistDetailView(generics.RetrieveUpdateDestroyAPIView):
         serializer = self.get_serializer(playlist)
         return Response(serializer.data)
 
+class PlaylistSongListView(generics.ListAPIView):
+    """A playlist's songs, a page at a time, in the order they were added."""
+    serializer_class = SongSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = PlaylistSongPagination
+
+    def get_queryset(self):
+        playlist = generics.get_object_or_404(Playlist.objects.filter(
+            models.Q(user=self.request.user) |
+            models.Q(collaborators__user=self.request.user)
+        ).distinct(), pk=self.kwargs['pk'])
+        return playlist_tracks([playlist.id])
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        serializer = self.get_serializer([track.song for track in page], many=True)
+        return self.get_paginated_response(serializer.data)
+
+class LikedSongPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+
 class LikedSongListCreateView(generics.ListCreateAPIView):
     serializer_class = LikedSongSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = LikedSongPagination
 
     def get_queryset(self):
-        qs = LikedSong.objects.filter(user=self.request.user).order_by('-created_at')
-        print(f"[DEBUG] LikedSongListCreateView.get_queryset for user {self.request.user}: {[ls.song.id for ls in qs]}")
-        return qs
+        return LikedSong.objects.filter(user=self.request.user).select_related('user', 'song')
 
     def perform_create(self, serializer):
         song_id = self.request.data.get('song_id')
@@ -242,12 +273,16 @@ class QueueView(APIView):
         return Response({'message': 'Song removed from queue'})
 
 # --- Download Management ---
+class DownloadPagination(KeysetPagination):
+    ordering = ('-downloaded_at', '-id')
+
 class DownloadListCreateView(generics.ListCreateAPIView):
     serializer_class = DownloadSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = DownloadPagination
 
     def get_queryset(self):
-        return Download.objects.filter(user=self.request.user)
+        return Download.objects.filter(user=self.request.user).select_related('user', 'song')
 
     def perform_create(self, serializer):
         song_id = self.request.data.get('song_id')
@@ -340,10 +375,12 @@ class RecentSearchListCreateView(generics.ListCreateAPIView):
     serializer_class = RecentSearchSerializer
     permission_classes = [permissions.IsAuthenticated]
     def get_queryset(self):
+        search_history.flush(self.request.user.id)  # searches still buffered from SearchView
         return RecentSearch.objects.filter(user=self.request.user)
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
     def delete(self, request, *args, **kwargs):
+        search_history.discard(request.user.id)
         RecentSearch.objects.filter(user=request.user).delete()
         return Response({'message': 'Recent searches cleared.'}, status=204)
 
@@ -365,19 +402,47 @@ class RecommendationView(APIView):
         return Response(serializer.data)
 
 # --- Search ---
+class SearchPagination(SongPagination):
+    page_size = 50
+    max_page_size = 100
+    cursor_query_param = 'songs_cursor'
+
+class PlaylistSearchPagination(SearchPagination):
+    ordering = ('-created_at', '-id')
+    cursor_query_param = 'playlists_cursor'
+
 class SearchView(APIView):
     permission_classes = [IsAuthenticated]
     def get(self, request):
         query = request.query_params.get('q', '')
-        if not query:
+        if not query.strip():
             return Response({'results': []})
-        # Save to recent search
-        RecentSearch.objects.create(user=request.user, query=query)
-        songs = Song.objects.filter(Q(title__icontains=query) | Q(artist__icontains=query) | Q(album__icontains=query))
-        playlists = Playlist.objects.filter(Q(name__icontains=query))
-        song_results = SongSerializer(songs, many=True).data
-        playlist_results = PlaylistSerializer(playlists, many=True).data
-        return Response({'songs': song_results, 'playlists': playlist_results})
+        # Save to recent search (written behind, in batches)
+        search_history.record(request.user.id, query)
+        # Songs and playlists are ranked and paged side by side, each with its own cursor
+        songs_page, playlists_page = SearchPagination(), PlaylistSearchPagination()
+        songs = songs_page.paginate_queryset(SONG_INDEX.search(Song.objects.all(), query), request)
+        playlists = playlists_page.paginate_queryset(
+            PLAYLIST_INDEX.search(playlist_summaries(Playlist.objects.all()), query), request)
+        return Response({
+            'songs': SongSerializer(songs, many=True).data,
+            'songs_next': songs_page.get_next_link(),
+            'songs_previous': songs_page.get_previous_link(),
+            'playlists': PlaylistSummarySerializer(playlists, many=True).data,
+            'playlists_next': playlists_page.get_next_link(),
+            'playlists_previous': playlists_page.get_previous_link(),
+        })
+
+# --- Type-ahead ---
+class SuggestView(APIView):
+    permission_classes = [IsAuthenticated]
+    def get(self, request):
+        # Served from memory; empty until this process has built its index
+        try:
+            limit = min(max(int(request.query_params.get('limit', 8)), 1), TOP_K)
+        except ValueError:
+            limit = 8
+        return Response({'suggestions': suggestions.suggest(request.query_params.get('q', ''), limit)})
 
 # --- Playback Controls (dummy endpoints, logic handled on frontend) ---
 class PlaybackControlView(APIView):
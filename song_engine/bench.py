@@ -0,0 +1,621 @@
+"""Micro-benchmarks for the song engine.
+
+Run from the song_engine directory:
+
+    python bench.py hit-resolution
+    python bench.py expiry
+    python bench.py vectors [--sizes 10000 100000 1000000] [--backends numpy chroma]
+    python bench.py startup [--engine-dir DIR]
+    python bench.py stream --url http://localhost:8000 --song-id ID [--clients 64]
+    python bench.py stress [--threads 32] [--duration 10]
+    python bench.py multiproc [--workers 4] [--songs 50]
+    python bench.py crash [--rounds 20]
+"""
+import argparse
+import hashlib
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+
+from cache import SongCache
+from cache_store import CacheStore
+
+
+def _timeit(fn, keys, repeat=5):
+    """Median per-call latency of `fn` over `keys`, in microseconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for k in keys:
+            fn(k)
+        samples.append((time.perf_counter() - start) / len(keys) * 1e6)
+    return statistics.median(samples)
+
+
+def _entries(n):
+    for i in range(n):
+        query = f"artist {i} - title {i}"
+        song_id = hashlib.md5(query.encode()).hexdigest()
+        now = time.time()
+        yield query, {"path": f"song_cache/{song_id}.mp3", "timestamp": now, "id": song_id,
+                      "size": 0, "last_access": now, "hits": 0}
+
+
+# ---------------------- Hit resolution ----------------------
+def bench_hit_resolution(sizes, probes, scan_limit):
+    """Song id -> cached entry, as the engine resolves a vector hit (SongCache.resolve_id under its RWLock).
+
+    "sqlite" is the bare indexed lookup underneath; "linear scan" is the old
+    engine's pass over cache.json.
+    """
+    print(f"{'entries':>10} {'resolve_id (us)':>16} {'sqlite (us)':>12} {'linear scan (us)':>17}")
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = CacheStore(os.path.join(tmp, "cache.sqlite3"))
+            cache_index = dict(_entries(n))
+            store.put_many(cache_index.items())
+            cache = SongCache(store, max_bytes=1 << 40)
+
+            ids = [e["id"] for e in cache_index.values()]
+            step = max(1, n // probes)
+            keys = ids[::step][:probes]
+
+            resolve_us = _timeit(cache.resolve_id, keys)
+            sql_us = _timeit(store.get_by_id, keys)
+            if n <= scan_limit:
+                def scan(k):
+                    for q, v in cache_index.items():
+                        if v["id"] == k:
+                            return v["path"]
+                scan_us = f"{_timeit(scan, keys[::max(1, len(keys) // 20)], repeat=1):17.1f}"
+            else:
+                scan_us = f"{'skipped':>17}"
+            store.close()
+        print(f"{n:>10} {resolve_us:>16.2f} {sql_us:>12.2f} {scan_us}")
+
+
+# -------------------------- Expiry --------------------------
+def bench_expiry(sizes, limit):
+    """GET /cache/status's "next k to expire" and the prune thread's next-wake lookup.
+
+    The old engine sorted the whole expiry heap per call; the index answers
+    both from the timestamp B-tree.
+    """
+    print(f"{'entries':>10} {'sorted heap (us)':>17} {'oldest k (us)':>14} {'next expiry (us)':>17}")
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = CacheStore(os.path.join(tmp, "cache.sqlite3"))
+            rng = random.Random(n)
+            now = time.time()
+            entries = [(q, {**e, "timestamp": now - rng.random() * 86400}) for q, e in _entries(n)]
+            store.put_many(entries)
+            heap = [(e["timestamp"], q) for q, e in entries]
+
+            sorted_us = _timeit(lambda _: sorted(heap)[:limit], [None], repeat=3)
+            oldest_us = _timeit(lambda _: store.oldest(limit), [None] * 200)
+            next_us = _timeit(lambda _: store.oldest_timestamp(), [None] * 200)
+            store.close()
+        print(f"{n:>10} {sorted_us:>17.1f} {oldest_us:>14.1f} {next_us:>17.1f}")
+
+
+# ------------------------- Vectors --------------------------
+VECTOR_PROBE = """
+import json, resource, sys, time
+import numpy as np
+backend, path, dim, queries = sys.argv[1], sys.argv[2], int(sys.argv[3]), int(sys.argv[4])
+start = time.perf_counter()
+if backend == "numpy":
+    from vectors import NumpyVectorIndex
+    index = NumpyVectorIndex(path)
+else:
+    import chromadb
+    index = chromadb.PersistentClient(path=path).get_collection("songs")
+probes = np.random.default_rng(1).normal(size=(queries, dim)).astype(np.float32)
+probes /= np.linalg.norm(probes, axis=1, keepdims=True)
+index.query(query_embeddings=probes[:1].tolist(), n_results=5)
+loaded = time.perf_counter() - start
+latencies = []
+for q in probes:
+    t = time.perf_counter()
+    index.query(query_embeddings=[q.tolist()], n_results=5)
+    latencies.append(time.perf_counter() - t)
+latencies.sort()
+print(json.dumps({
+    "load_s": loaded,
+    "p50_ms": latencies[len(latencies) // 2] * 1000,
+    "p99_ms": latencies[min(len(latencies) - 1, len(latencies) * 99 // 100)] * 1000,
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+"""
+
+
+def _build_vector_index(backend, path, vectors, batch=5000):
+    ids = [f"song-{i}" for i in range(len(vectors))]
+    if backend == "numpy":
+        from vectors import NumpyVectorIndex
+        index = NumpyVectorIndex(path)
+    else:
+        import chromadb
+        index = chromadb.PersistentClient(path=path).get_or_create_collection("songs", embedding_function=None)
+    for i in range(0, len(vectors), batch):
+        index.add(ids=ids[i:i + batch], embeddings=vectors[i:i + batch].tolist(),
+                  documents=ids[i:i + batch])
+
+
+def _dir_bytes(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def bench_vectors(sizes, backends, dim, queries):
+    """Build each backend at each size, then cold-load it in a fresh process and time top-5 queries."""
+    engine_dir = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [engine_dir, env.get("PYTHONPATH")]))
+    print(f"{'backend':>8} {'songs':>9} {'build s':>8} {'disk MB':>8} {'load s':>7} "
+          f"{'p50 ms':>7} {'p99 ms':>7} {'rss MB':>7}")
+    for n in sizes:
+        vectors = np.random.default_rng(n).normal(size=(n, dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        for backend in backends:
+            with tempfile.TemporaryDirectory() as tmp:
+                began = time.perf_counter()
+                _build_vector_index(backend, tmp, vectors)
+                built = time.perf_counter() - began
+                out = subprocess.run(
+                    [sys.executable, "-c", VECTOR_PROBE, backend, tmp, str(dim), str(queries)],
+                    env=env, capture_output=True, text=True,
+                )
+                if out.returncode != 0:
+                    print(f"{backend:>8} {n:>9} failed: {out.stderr.strip().splitlines()[-1]}")
+                    continue
+                r = json.loads(out.stdout.strip().splitlines()[-1])
+                print(f"{backend:>8} {n:>9} {built:>8.1f} {_dir_bytes(tmp) / 2 ** 20:>8.1f} {r['load_s']:>7.2f} "
+                      f"{r['p50_ms']:>7.2f} {r['p99_ms']:>7.2f} {r['peak_rss_mb']:>7.0f}")
+
+
+# -------------------------- Startup -------------------------
+STARTUP_PROBE = """
+import json, resource, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+if hasattr(main, "get_model"):
+    main.get_model().encode(["warm up probe query"])
+    main.get_collection()
+else:  # older engines load everything at import; just exercise one embedding
+    main.embedding_fn(["warm up probe query"])
+ready = time.perf_counter()
+print(json.dumps({
+    "import_s": imported - start,
+    "ready_s": ready - start,
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+"""
+
+
+def bench_startup(engine_dir, runs):
+    """Time `import main` (when uvicorn can bind) and full readiness in fresh interpreters.
+
+    Point --engine-dir at a checkout of an older revision to compare.
+    """
+    results = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as tmp:
+            pythonpath = os.pathsep.join(filter(None, [os.path.abspath(engine_dir), os.environ.get("PYTHONPATH")]))
+            env = {**os.environ, "PYTHONPATH": pythonpath, "WARMUP": "0"}
+            out = subprocess.run(
+                [sys.executable, "-c", STARTUP_PROBE], cwd=tmp, env=env, capture_output=True, text=True, check=True
+            )
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    for key in ("import_s", "ready_s", "peak_rss_mb"):
+        values = [r[key] for r in results]
+        print(f"{key:>12}: median {statistics.median(values):8.2f}  min {min(values):8.2f}  max {max(values):8.2f}")
+
+
+# -------------------------- Streaming -------------------------
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def bench_stream(url, song_id, clients, duration, range_bytes):
+    """Many keep-alive clients issuing random Range requests (seeks) against one cached song."""
+    target = urlparse(url)
+    path = f"/stream/{song_id}"
+
+    conn = http.client.HTTPConnection(target.hostname, target.port or 80)
+    conn.request("HEAD", path)
+    resp = conn.getresponse()
+    resp.read()
+    if resp.status != 200:
+        raise SystemExit(f"HEAD {path} -> {resp.status}")
+    size = int(resp.getheader("content-length"))
+    conn.close()
+
+    latencies, transferred, errors = [], [0], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        conn = http.client.HTTPConnection(target.hostname, target.port or 80)
+        local_lat, local_bytes, local_err = [], 0, 0
+        while time.perf_counter() < deadline:
+            start = random.randrange(0, max(1, size - range_bytes))
+            t = time.perf_counter()
+            try:
+                conn.request("GET", path, headers={"Range": f"bytes={start}-{start + range_bytes - 1}"})
+                resp = conn.getresponse()
+                body = resp.read()
+                if resp.status != 206:
+                    local_err += 1
+                local_bytes += len(body)
+                local_lat.append(time.perf_counter() - t)
+            except (OSError, http.client.HTTPException):
+                local_err += 1
+                conn.close()
+                conn = http.client.HTTPConnection(target.hostname, target.port or 80)
+        conn.close()
+        with lock:
+            latencies.extend(local_lat)
+            transferred[0] += local_bytes
+            errors[0] += local_err
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    began = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - began
+
+    if not latencies:
+        raise SystemExit("no successful requests")
+    print(f"clients {clients}, file {size} bytes, {range_bytes}-byte ranges, {elapsed:.1f}s")
+    print(f"  requests/s  {len(latencies) / elapsed:10.1f}")
+    print(f"  MiB/s       {transferred[0] / elapsed / 2 ** 20:10.1f}")
+    print(f"  p50 ms      {_percentile(latencies, 50) * 1000:10.2f}")
+    print(f"  p99 ms      {_percentile(latencies, 99) * 1000:10.2f}")
+    print(f"  errors      {errors[0]:10d}")
+
+
+# --------------------------- Stress --------------------------
+def bench_stress(threads, duration, songs, ttl):
+    """Concurrent hits, streams (pin/read/unpin), downloads and deletes against an aggressive prune loop.
+
+    Fails if any operation raises, a pinned file disappears, or the indexes drift apart.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        store = CacheStore(os.path.join(tmp, "cache.sqlite3"), normalize=str.lower)
+        cache = SongCache(store, max_bytes=1 << 40)
+        queries = [f"Artist {i} - Title {i}" for i in range(songs)]
+        errors, counts = [], {"hit": 0, "stream": 0, "add": 0, "evict": 0, "prune": 0}
+        lock = threading.Lock()
+        stop = threading.Event()
+
+        def add(query):
+            song_id = hashlib.md5(query.encode()).hexdigest()
+            path = os.path.join(tmp, f"{song_id}.mp3")
+            staged = f"{path}.{threading.get_ident()}.part"
+            with open(staged, "wb") as f:
+                f.write(os.urandom(random.randint(1, 4096)))
+            now = time.time()
+            cache.add(query, {"path": path, "timestamp": now, "id": song_id,
+                              "size": os.path.getsize(staged), "last_access": now, "hits": 0}, staged_path=staged)
+
+        def worker():
+            local = dict.fromkeys(counts, 0)
+            while not stop.is_set():
+                query = random.choice(queries)
+                song_id = hashlib.md5(query.encode()).hexdigest()
+                op = random.random()
+                try:
+                    if op < 0.5:
+                        title = cache.resolve_exact(query)
+                        if title is not None:
+                            cache.hit(title)
+                        local["hit"] += 1
+                    elif op < 0.8:
+                        pinned = cache.pin(song_id)
+                        if pinned is not None:
+                            path = pinned[1]["path"]
+                            try:
+                                time.sleep(random.random() / 1000)
+                                with open(path, "rb") as f:
+                                    f.read()
+                            finally:
+                                cache.unpin(path)
+                        local["stream"] += 1
+                    elif op < 0.95:
+                        add(query)
+                        local["add"] += 1
+                    else:
+                        cache.evict(query)
+                        local["evict"] += 1
+                except Exception as e:
+                    with lock:
+                        errors.append(f"{type(e).__name__}: {e}")
+            with lock:
+                for k, v in local.items():
+                    counts[k] += v
+
+        def pruner():
+            while not stop.is_set():
+                try:
+                    cutoff = time.time() - ttl
+                    for query, _ in cache.expired(cutoff):
+                        if cache.evict(query, stored_before=cutoff) is not None:
+                            counts["prune"] += 1
+                except Exception as e:
+                    with lock:
+                        errors.append(f"prune {type(e).__name__}: {e}")
+
+        pool = [threading.Thread(target=worker) for _ in range(threads)] + [threading.Thread(target=pruner)]
+        for t in pool:
+            t.start()
+        time.sleep(duration)
+        stop.set()
+        for t in pool:
+            t.join()
+
+        entries = store.load_all()
+        if sum(e["size"] for e in entries.values()) != cache.bytes:
+            errors.append(f"byte count drifted: {cache.bytes} vs {sum(e['size'] for e in entries.values())}")
+        if len(entries) != len(cache):
+            errors.append(f"entry count drifted: {len(cache)} in memory vs {len(entries)} stored")
+        for query, entry in entries.items():
+            if not os.path.exists(entry["path"]):
+                errors.append(f"indexed file missing: {query}")
+        if cache.stats()["pinned"]:
+            errors.append("pins leaked")
+        store.close()
+
+    print(", ".join(f"{k} {v}" for k, v in counts.items()))
+    if errors:
+        print(f"FAILED: {len(errors)} errors, first: {errors[0]}")
+        raise SystemExit(1)
+    print("OK")
+
+
+# ------------------------- Multi-process ------------------------
+MULTIPROC_WORKER = """
+import json, os, random, sys, time
+import main
+
+queries, seed = json.loads(sys.argv[1]), int(sys.argv[2])
+# One axis per song: no vector hit between different songs, so every miss is a real miss
+axis = {q.lower(): i for i, q in enumerate(queries)}
+main.embed_query = lambda q: [float(i == axis[q.lower()]) for i in range(len(queries))]
+fetched = []
+download = main.downloader.download
+main.downloader.download = lambda query, *args: fetched.append(query) or download(query, *args)
+
+order = list(queries)
+random.Random(seed).shuffle(order)
+for q in order:
+    main.get_song(main.SongRequest(query=q if seed % 2 else q.upper()))
+while len(main.cache) < len(queries):  # wait for the other workers' songs
+    time.sleep(0.05)
+seen = sum(1 for q in queries if main.cache.resolve_exact(q.swapcase()) is not None)
+prunes = sum(float(line.rsplit(" ", 1)[1]) for line in main.metrics.render().splitlines()
+             if line.startswith('song_engine_prune_seconds_count{kind="ttl"}'))
+print(json.dumps({"pid": os.getpid(), "fetched": len(fetched), "seen": seen,
+                  "leader": main.prune_leader.held, "prunes": int(prunes)}), flush=True)
+sys.stdin.read()  # hold leadership until the parent has every report
+"""
+
+
+def run_multiproc(workers, songs):
+    """Start `workers` engine processes (`import main`, as under uvicorn --workers) on one cache directory.
+
+    Each sends every song through POST /song's handler, with the synthetic
+    downloader. Returns each worker's report (downloads it made, songs it
+    sees, whether it leads pruning, its prune passes), the rows stored and
+    the seconds taken.
+    """
+    queries = [f"Artist {i} - Title {i}" for i in range(songs)]
+    engine_dir = os.path.dirname(os.path.abspath(__file__))
+    pythonpath = os.pathsep.join(filter(None, [engine_dir, os.environ.get("PYTHONPATH")]))
+    env = {**os.environ, "PYTHONPATH": pythonpath, "WARMUP": "0", "DOWNLOAD_BACKEND": "synthetic",
+           "SYNTHETIC_LATENCY": "0.02", "VECTOR_BACKEND": "numpy", "TRANSCODE_LADDER": ""}
+    with tempfile.TemporaryDirectory() as tmp:
+        logs = [open(os.path.join(tmp, f"worker{seed}.log"), "w+") for seed in range(workers)]
+        began = time.perf_counter()
+        procs = [subprocess.Popen([sys.executable, "-c", MULTIPROC_WORKER, json.dumps(queries), str(seed)],
+                                  cwd=tmp, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                  stderr=log, text=True)
+                 for seed, log in enumerate(logs)]
+        lines = [p.stdout.readline() for p in procs]
+        elapsed = time.perf_counter() - began
+        for p in procs:
+            p.stdin.close()
+            p.wait()
+        for seed, line in enumerate(lines):
+            if not line:
+                logs[seed].seek(0)
+                raise RuntimeError(f"worker {seed} exited with {procs[seed].returncode} before reporting:\n"
+                                   f"{logs[seed].read()}")
+        for log in logs:
+            log.close()
+        reports = [json.loads(line) for line in lines]
+        store = CacheStore(os.path.join(tmp, "song_cache", "cache.sqlite3"))
+        stored = store.count()
+        store.close()
+    return reports, stored, elapsed
+
+
+def bench_multiproc(workers, songs):
+    """Several engine workers resolving the same songs against one cache directory.
+
+    Checks that each song is fetched exactly once across all processes, that
+    every process sees the full shared index, and that exactly one process
+    became prune leader at startup and is the only one that pruned: requests
+    themselves never prune.
+    """
+    reports, stored, elapsed = run_multiproc(workers, songs)
+    for r in sorted(reports, key=lambda r: r["pid"]):
+        print(f"  pid {r['pid']}: fetched {r['fetched']:4d}, sees {r['seen']}/{songs}, leader {r['leader']}, "
+              f"prune passes {r['prunes']}")
+    print(f"{workers} workers, {songs} songs, {elapsed:.1f}s")
+    problems = []
+    if sum(r["fetched"] for r in reports) != songs:
+        problems.append(f"{sum(r['fetched'] for r in reports)} fetches for {songs} songs")
+    if any(r["seen"] != songs for r in reports):
+        problems.append("a worker does not see the whole index")
+    if sum(r["leader"] for r in reports) != 1:
+        problems.append(f"{sum(r['leader'] for r in reports)} prune leaders")
+    if any(r["prunes"] for r in reports if not r["leader"]):
+        problems.append("a follower pruned")
+    if stored != songs:
+        problems.append(f"{stored} rows stored")
+    if problems:
+        print("FAILED: " + "; ".join(problems))
+        raise SystemExit(1)
+    print("OK")
+
+
+# --------------------------- Crash ---------------------------
+def _crash_worker(cache_dir, seed):
+    """Add, hit and evict entries forever; the parent SIGKILLs this process at a random moment."""
+    rng = random.Random(seed)
+    store = CacheStore(os.path.join(cache_dir, "cache.sqlite3"), normalize=str.lower, flush_batch=8)
+    cache = SongCache(store, max_bytes=1 << 40)
+    while True:
+        query = f"song {rng.randrange(200)}"
+        op = rng.random()
+        if op < 0.4:
+            song_id = hashlib.md5(query.encode()).hexdigest()
+            path = os.path.join(cache_dir, f"{song_id}.mp3")
+            staged = f"{path}.part"
+            with open(staged, "wb") as f:
+                f.write(os.urandom(rng.randrange(100, 5000)))
+            now = time.time()
+            cache.add(query, {"path": path, "timestamp": now, "id": song_id, "size": os.path.getsize(staged),
+                              "last_access": now, "hits": 0}, staged_path=staged)
+        elif op < 0.8:
+            cache.hit(query)
+        else:
+            cache.evict(query)
+
+
+def bench_crash(rounds):
+    """SIGKILL a busy writer `rounds` times and check the index survives every time.
+
+    After each kill the index must pass PRAGMA integrity_check and its
+    trigger-kept totals must match the rows. Buffered hit counts of the killed
+    process may be lost. Rows whose file is missing are reported but not
+    fatal: evict() unlinks the file just before its transaction commits, so a
+    kill inside that window leaves a row that reconciliation has to drop.
+    """
+    import sqlite3
+
+    ctx = multiprocessing.get_context("spawn")
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        db_path = os.path.join(cache_dir, "cache.sqlite3")
+        CacheStore(db_path).close()
+        problems = []
+        for n in range(rounds):
+            proc = ctx.Process(target=_crash_worker, args=(cache_dir, n))
+            proc.start()
+            time.sleep(0.5 + rng.random())
+            proc.kill()
+            proc.join()
+
+            conn = sqlite3.connect(db_path)
+            integrity = conn.execute("PRAGMA integrity_check").fetchone()[0]
+            rows = conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+            size = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache_files").fetchone()[0]
+            entries, total = conn.execute("SELECT entries, bytes FROM cache_meta WHERE id = 1").fetchone()
+            missing = sum(1 for (path,) in conn.execute("SELECT path FROM cache_entries") if not os.path.exists(path))
+            conn.close()
+            print(f"  round {n + 1:3d}: {rows:4d} rows, {size:8d} bytes, integrity {integrity}, "
+                  f"missing files {missing}")
+            if integrity != "ok":
+                problems.append(f"round {n + 1}: integrity {integrity}")
+            if (rows, size) != (entries, total):
+                problems.append(f"round {n + 1}: totals {entries}/{total} != rows {rows}/{size}")
+
+        store = CacheStore(db_path)
+        print(f"checkpoint after {rounds} kills: {store.checkpoint()}")
+        store.close()
+    if problems:
+        print("FAILED: " + "; ".join(problems))
+        raise SystemExit(1)
+    print("OK")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    hit = sub.add_parser("hit-resolution", help="vector-hit -> cache entry lookup latency")
+    hit.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    hit.add_argument("--probes", type=int, default=1000)
+    hit.add_argument("--scan-limit", type=int, default=100_000, help="largest size to time the old linear scan at")
+
+    expiry = sub.add_parser("expiry", help="next-k-to-expire and next-wake lookups vs sorting the heap")
+    expiry.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    expiry.add_argument("--limit", type=int, default=10)
+
+    vectors = sub.add_parser("vectors", help="vector backends: build, disk, cold load, query latency, RSS")
+    vectors.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    vectors.add_argument("--backends", nargs="+", choices=["numpy", "chroma"], default=["numpy", "chroma"])
+    vectors.add_argument("--dim", type=int, default=384, help="all-MiniLM-L6-v2 embeddings are 384-d")
+    vectors.add_argument("--queries", type=int, default=200)
+
+    startup = sub.add_parser("startup", help="cold import time, time to ready and peak RSS")
+    startup.add_argument("--engine-dir", default=os.path.dirname(os.path.abspath(__file__)))
+    startup.add_argument("--runs", type=int, default=3)
+
+    stream = sub.add_parser("stream", help="Range-request throughput against a running engine")
+    stream.add_argument("--url", default="http://localhost:8000")
+    stream.add_argument("--song-id", required=True)
+    stream.add_argument("--clients", type=int, default=64)
+    stream.add_argument("--duration", type=float, default=10)
+    stream.add_argument("--range-bytes", type=int, default=256 * 1024)
+
+    stress = sub.add_parser("stress", help="concurrent traffic against an aggressive prune loop")
+    stress.add_argument("--threads", type=int, default=32)
+    stress.add_argument("--duration", type=float, default=10)
+    stress.add_argument("--songs", type=int, default=200)
+    stress.add_argument("--ttl", type=float, default=0.05, help="seconds an entry lives before the pruner takes it")
+
+    multiproc = sub.add_parser("multiproc", help="several worker processes sharing one cache directory")
+    multiproc.add_argument("--workers", type=int, default=4)
+    multiproc.add_argument("--songs", type=int, default=50)
+
+    crash = sub.add_parser("crash", help="SIGKILL a writer repeatedly and verify the index")
+    crash.add_argument("--rounds", type=int, default=20)
+
+    args = parser.parse_args()
+    if args.bench == "hit-resolution":
+        bench_hit_resolution(args.sizes, args.probes, args.scan_limit)
+    elif args.bench == "expiry":
+        bench_expiry(args.sizes, args.limit)
+    elif args.bench == "vectors":
+        bench_vectors(args.sizes, args.backends, args.dim, args.queries)
+    elif args.bench == "startup":
+        bench_startup(args.engine_dir, args.runs)
+    elif args.bench == "stream":
+        bench_stream(args.url, args.song_id, args.clients, args.duration, args.range_bytes)
+    elif args.bench == "stress":
+        bench_stress(args.threads, args.duration, args.songs, args.ttl)
+    elif args.bench == "multiproc":
+        bench_multiproc(args.workers, args.songs)
+    elif args.bench == "crash":
+        bench_crash(args.rounds)
+
+
+if __name__ == "__main__":
+    main()
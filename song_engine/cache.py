@@ -0,0 +1,256 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+
+class RWLock:
+    """Many concurrent readers or one writer.
+
+    Waiting writers block new readers, so a steady stream of hits cannot
+    starve the prune thread.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+class SongCache:
+    """The song cache index, shared by request handlers, prune threads and worker processes.
+
+    The SQLite store is the single source of truth, so every uvicorn worker
+    sees the same entries, byte totals and hit counters. Within a process,
+    lookups take the read side of an RWLock and add/evict take the write side;
+    add and evict also run inside a store transaction, whose write lock
+    serializes them against other processes while files are renamed or
+    removed. Several queries can alias one content-addressed file, which is
+    deleted only with its last alias. Files being streamed can be pinned:
+    evicting a pinned file's last alias drops it from the index straight away
+    but leaves the file on disk until the last pin (in this process) is
+    released.
+    """
+
+    def __init__(self, store, max_bytes: int, on_evict=None, lease_seconds: float = 900):
+        self.store = store
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict  # called with each evicted entry, outside the lock
+        self.lease_seconds = lease_seconds  # a download lease older than this is presumed dead
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.over_quota = threading.Event()
+
+        self._lock = RWLock()
+        self._pin_lock = threading.Lock()
+        self._pins = {}  # path -> active pin count
+        self._doomed = set()  # evicted paths waiting for their last pin to go
+
+        if self.bytes > self.max_bytes:
+            self.over_quota.set()
+
+    # ------------------------ Reads -----------------------
+    def get(self, query: str):
+        with self._lock.read():
+            return self.store.get(query)
+
+    def resolve_id(self, song_id: str):
+        with self._lock.read():
+            found = self.store.get_by_id(song_id)
+        return found[0] if found else None
+
+    def resolve_exact(self, query: str):
+        with self._lock.read():
+            found = self.store.get_by_norm(self.store.normalize(query))
+        return found[0] if found else None
+
+    def __len__(self):
+        return self.store.count()
+
+    @property
+    def bytes(self) -> int:
+        return self.store.total_bytes()
+
+    def stats(self) -> dict:
+        meta = self.store.meta()
+        with self._pin_lock:
+            pinned = len(self._pins)
+        lookups = meta["hits"] + meta["misses"]
+        return {
+            "entries": meta["entries"],
+            "files": meta["files"],
+            "bytes": meta["bytes"],
+            "max_bytes": self.max_bytes,
+            "hits": meta["hits"],
+            "misses": meta["misses"],
+            "hit_ratio": meta["hits"] / lookups if lookups else 0.0,
+            "pinned": pinned,
+        }
+
+    # ------------------- Hits and misses ------------------
+    def hit(self, query: str):
+        """Record a hit on `query`; returns its entry, or None if it was evicted meanwhile."""
+        with self._lock.read():
+            entry = self.store.get(query)
+            if entry is None:
+                return None
+            self.store.touch(query, time.time())
+        return entry
+
+    def miss(self):
+        self.store.record_miss()
+
+    def played(self, query: str):
+        """Record playback of `query`: recent for LRU, but not a lookup, so neither a hit nor an LFU count."""
+        self.store.touch(query, time.time(), hit=False)
+
+    # ----------------------- Writes -----------------------
+    def add(self, query: str, entry: dict, staged_path: str = None):
+        """Insert or replace `query`.
+
+        Downloads should land in `staged_path` and be moved to entry['path']
+        here, inside the write transaction, so a concurrent eviction of an
+        older entry for the same path cannot delete the new file.
+        """
+        with self._lock.write(), self.store.transaction():
+            # Re-downloaded to the same path before the old file's last pin went: undoom it before the
+            # new file lands, or that unpin could delete the new file
+            with self._pin_lock:
+                self._doomed.discard(entry['path'])
+            if staged_path is not None:
+                os.replace(staged_path, entry['path'])
+            self.store.put(query, entry)
+        if self.bytes > self.max_bytes:
+            self.over_quota.set()
+
+    def alias(self, query: str, entry: dict):
+        """Add `query` as another name for the already stored file entry['path'].
+
+        Returns the stored entry (with the file's size), or None if no entry
+        references that file any more, in which case the caller downloads it.
+        """
+        with self._lock.write(), self.store.transaction():
+            info = self.store.file_info(entry['path'])
+            if info is None or not os.path.exists(entry['path']):
+                return None
+            entry = {**entry, 'size': info['size']}
+            self.store.put(query, entry)
+        return entry
+
+    def evict(self, query: str, stored_before: float = None):
+        """Remove `query` from the cache; its file goes with the last alias (deferred while pinned).
+
+        With `stored_before`, an entry re-added after that time is left alone;
+        the prune threads pass their cutoff so a fresh download is not evicted.
+        """
+        with self._lock.write(), self.store.transaction():
+            entry = self.store.get(query)
+            if entry is None:
+                return None
+            if stored_before is not None and entry['timestamp'] >= stored_before:
+                return None
+            self.store.delete(query)
+
+            # Still inside the transaction so a re-download to the same path cannot slip in between
+            if self.store.file_info(entry['path']) is None:  # that was the file's last alias
+                with self._pin_lock:
+                    if self._pins.get(entry['path']):
+                        self._doomed.add(entry['path'])
+                    else:
+                        _remove_file(entry['path'])
+        if self.on_evict is not None:
+            self.on_evict(entry)
+        return entry
+
+    def expired(self, cutoff: float) -> list:
+        return self.store.expired(cutoff)
+
+    def eviction_candidates(self, policy: str, limit: int) -> list:
+        return self.store.eviction_candidates(policy, limit)
+
+    def oldest(self, limit: int) -> list:
+        return self.store.oldest(limit)
+
+    def oldest_timestamp(self):
+        return self.store.oldest_timestamp()
+
+    # ------------------ Download leases -------------------
+    def run_exclusive(self, key: str, fn, poll_seconds: float = 0.25):
+        """Run `fn` while holding the cross-process download lease for `key`.
+
+        If another process or thread holds it, wait until it is released and
+        try again; `fn` is expected to check the cache first and find the
+        holder's result. Each call claims under its own token, so threads of
+        one process exclude each other too.
+        """
+        token = f"{self.owner}-{uuid.uuid4().hex[:8]}"
+        while True:
+            if self.store.claim_download(key, token, self.lease_seconds):
+                try:
+                    return fn()
+                finally:
+                    self.store.release_download(key, token)
+            while self.store.download_leased(key):
+                time.sleep(poll_seconds)
+
+    # ----------------------- Pinning ----------------------
+    def pin(self, song_id: str):
+        """Pin the file behind `song_id` so eviction cannot delete it; returns (query, entry) or None."""
+        with self._lock.read():
+            found = self.store.get_by_id(song_id)
+            if found is None:
+                return None
+            with self._pin_lock:
+                self._pins[found[1]['path']] = self._pins.get(found[1]['path'], 0) + 1
+            return found
+
+    def unpin(self, path: str):
+        with self._pin_lock:
+            count = self._pins.get(path, 0) - 1
+            if count > 0:
+                self._pins[path] = count
+                return
+            self._pins.pop(path, None)
+            if path in self._doomed:
+                self._doomed.discard(path)
+                _remove_file(path)
+
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logging.error(f"[Cache] Could not remove {path}: {e}")
@@ -0,0 +1,428 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    query       TEXT PRIMARY KEY,
+    id          TEXT NOT NULL,
+    path        TEXT NOT NULL,
+    timestamp   REAL NOT NULL,
+    size        INTEGER NOT NULL DEFAULT 0,
+    last_access REAL NOT NULL DEFAULT 0,
+    hits        INTEGER NOT NULL DEFAULT 0,
+    norm        TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_cache_entries_id ON cache_entries (id);
+CREATE INDEX IF NOT EXISTS idx_cache_entries_timestamp ON cache_entries (timestamp);
+"""
+
+# Applied after _upgrade_schema() so they also cover stores created by older versions
+DERIVED_SCHEMA = """
+CREATE INDEX IF NOT EXISTS idx_cache_entries_last_access ON cache_entries (last_access);
+CREATE INDEX IF NOT EXISTS idx_cache_entries_hits ON cache_entries (hits, last_access);
+CREATE INDEX IF NOT EXISTS idx_cache_entries_norm ON cache_entries (norm);
+
+-- Running totals shared by every worker process, kept exact by triggers (see MIGRATIONS)
+CREATE TABLE IF NOT EXISTS cache_meta (
+    id      INTEGER PRIMARY KEY CHECK (id = 1),
+    entries INTEGER NOT NULL,
+    bytes   INTEGER NOT NULL,
+    hits    INTEGER NOT NULL,
+    misses  INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_meta (id, entries, bytes, hits, misses)
+    SELECT 1, COUNT(*), COALESCE(SUM(size), 0), 0, 0 FROM cache_entries;
+
+-- Cross-process download leases: one row per song being fetched
+CREATE TABLE IF NOT EXISTS download_leases (
+    key     TEXT PRIMARY KEY,
+    owner   TEXT NOT NULL,
+    started REAL NOT NULL
+);
+"""
+
+WAL_SIZE_LIMIT = 64 * 1024 * 1024  # bytes the -wal file is truncated back to after a checkpoint
+
+# Versioned schema steps; PRAGMA user_version records how many have been applied
+MIGRATIONS = [
+    # 1: audio files are content-addressed and shared by every query (alias) resolving to the
+    #    same track. cache_files refcounts them, and bytes are counted once per file.
+    [
+        "DROP TRIGGER IF EXISTS cache_entries_ai",
+        "DROP TRIGGER IF EXISTS cache_entries_ad",
+        "DROP TRIGGER IF EXISTS cache_entries_au",
+        """CREATE TABLE IF NOT EXISTS cache_files (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            refs INTEGER NOT NULL
+        )""",
+        "INSERT OR IGNORE INTO cache_files (path, size, refs) "
+        "SELECT path, MAX(size), COUNT(*) FROM cache_entries GROUP BY path",
+        "ALTER TABLE cache_meta ADD COLUMN files INTEGER NOT NULL DEFAULT 0",
+        "UPDATE cache_meta SET entries = (SELECT COUNT(*) FROM cache_entries), "
+        "files = (SELECT COUNT(*) FROM cache_files), "
+        "bytes = (SELECT COALESCE(SUM(size), 0) FROM cache_files) WHERE id = 1",
+        """CREATE TRIGGER cache_entries_ai AFTER INSERT ON cache_entries BEGIN
+            UPDATE cache_meta SET entries = entries + 1 WHERE id = 1;
+            INSERT OR IGNORE INTO cache_files (path, size, refs) VALUES (NEW.path, NEW.size, 0);
+            UPDATE cache_files SET refs = refs + 1, size = NEW.size WHERE path = NEW.path;
+        END""",
+        """CREATE TRIGGER cache_entries_ad AFTER DELETE ON cache_entries BEGIN
+            UPDATE cache_meta SET entries = entries - 1 WHERE id = 1;
+            UPDATE cache_files SET refs = refs - 1 WHERE path = OLD.path;
+            DELETE FROM cache_files WHERE path = OLD.path AND refs <= 0;
+        END""",
+        """CREATE TRIGGER cache_entries_au AFTER UPDATE OF path, size ON cache_entries BEGIN
+            UPDATE cache_files SET refs = refs - 1 WHERE path = OLD.path;
+            DELETE FROM cache_files WHERE path = OLD.path AND refs <= 0;
+            INSERT OR IGNORE INTO cache_files (path, size, refs) VALUES (NEW.path, NEW.size, 0);
+            UPDATE cache_files SET refs = refs + 1, size = NEW.size WHERE path = NEW.path;
+        END""",
+        """CREATE TRIGGER cache_files_ai AFTER INSERT ON cache_files BEGIN
+            UPDATE cache_meta SET files = files + 1, bytes = bytes + NEW.size WHERE id = 1;
+        END""",
+        """CREATE TRIGGER cache_files_ad AFTER DELETE ON cache_files BEGIN
+            UPDATE cache_meta SET files = files - 1, bytes = bytes - OLD.size WHERE id = 1;
+        END""",
+        """CREATE TRIGGER cache_files_au AFTER UPDATE OF size ON cache_files BEGIN
+            UPDATE cache_meta SET bytes = bytes + NEW.size - OLD.size WHERE id = 1;
+        END""",
+    ],
+    # 2: an upsert's ON CONFLICT clause overrides the OR IGNORE of inserts in its triggers, so
+    #    re-putting a query, or moving it onto a stored file, failed on cache_files.path.
+    #    The triggers insert the file row only when it is missing instead.
+    [
+        "DROP TRIGGER IF EXISTS cache_entries_ai",
+        "DROP TRIGGER IF EXISTS cache_entries_au",
+        """CREATE TRIGGER cache_entries_ai AFTER INSERT ON cache_entries BEGIN
+            UPDATE cache_meta SET entries = entries + 1 WHERE id = 1;
+            INSERT INTO cache_files (path, size, refs) SELECT NEW.path, NEW.size, 0
+                WHERE NOT EXISTS (SELECT 1 FROM cache_files WHERE path = NEW.path);
+            UPDATE cache_files SET refs = refs + 1, size = NEW.size WHERE path = NEW.path;
+        END""",
+        """CREATE TRIGGER cache_entries_au AFTER UPDATE OF path, size ON cache_entries BEGIN
+            UPDATE cache_files SET refs = refs - 1 WHERE path = OLD.path;
+            DELETE FROM cache_files WHERE path = OLD.path AND refs <= 0;
+            INSERT INTO cache_files (path, size, refs) SELECT NEW.path, NEW.size, 0
+                WHERE NOT EXISTS (SELECT 1 FROM cache_files WHERE path = NEW.path);
+            UPDATE cache_files SET refs = refs + 1, size = NEW.size WHERE path = NEW.path;
+        END""",
+    ],
+]
+
+COLUMNS = "query, id, path, timestamp, size, last_access, hits"
+
+# Victim order for each eviction policy; both are served by an index
+EVICTION_ORDER = {
+    "lru": "last_access",
+    "lfu": "hits, last_access",
+}
+
+# Upserts rather than INSERT OR REPLACE so the update trigger keeps cache_meta exact
+UPSERT = f"""
+INSERT INTO cache_entries ({COLUMNS}, norm) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (query) DO UPDATE SET
+    id = excluded.id, path = excluded.path, timestamp = excluded.timestamp, size = excluded.size,
+    last_access = excluded.last_access, hits = excluded.hits, norm = excluded.norm
+"""
+
+
+class CacheStore:
+    """SQLite-backed cache index. Every mutation touches a single row.
+
+    The database runs in WAL mode with one connection per thread, so any
+    number of threads and worker processes can share it: readers never block,
+    and writers are serialized by SQLite's own lock. Each commit appends its
+    pages to the write-ahead log, and checkpoint() folds the log back into
+    the main file and truncates it. A killed process loses at most its
+    uncommitted transaction; it never leaves a half-written index.
+
+    Hit and miss accounting is the hottest write path, so touch() and
+    record_miss() are buffered in memory and written by flush() in a single
+    transaction once `flush_batch` are pending (or whenever the owner calls
+    flush()). `normalize` fills the indexed `norm` column used for
+    exact-match lookups.
+    """
+
+    def __init__(self, db_path: str, normalize=None, flush_batch: int = 256):
+        self.db_path = db_path
+        self.normalize = normalize or (lambda q: q)
+        self.flush_batch = flush_batch
+        self._local = threading.local()
+        self._pending_lock = threading.Lock()
+        self._pending_touches = {}  # query -> [hits, last access]
+        self._pending_misses = 0
+        conn = self._conn
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA journal_size_limit={WAL_SIZE_LIMIT}")
+        conn.executescript(SCHEMA)
+        self._upgrade_schema()
+        conn.executescript(DERIVED_SCHEMA)
+        self._migrate()
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Group several writes (and file operations) under SQLite's cross-process write lock."""
+        conn = self._conn
+        if conn.in_transaction:  # nested: the outer transaction commits
+            yield conn
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _upgrade_schema(self):
+        with self.transaction() as conn:
+            existing = {row["name"] for row in conn.execute("PRAGMA table_info(cache_entries)")}
+            if "size" not in existing:
+                conn.execute("ALTER TABLE cache_entries ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+                conn.execute("ALTER TABLE cache_entries ADD COLUMN last_access REAL NOT NULL DEFAULT 0")
+                conn.execute("ALTER TABLE cache_entries ADD COLUMN hits INTEGER NOT NULL DEFAULT 0")
+                rows = conn.execute("SELECT query, path, timestamp FROM cache_entries").fetchall()
+                conn.executemany(
+                    "UPDATE cache_entries SET size = ?, last_access = ? WHERE query = ?",
+                    ((_file_size(row["path"]), row["timestamp"], row["query"]) for row in rows),
+                )
+            if "norm" not in existing:
+                conn.execute("ALTER TABLE cache_entries ADD COLUMN norm TEXT")
+            rows = conn.execute("SELECT query FROM cache_entries WHERE norm IS NULL").fetchall()
+            conn.executemany(
+                "UPDATE cache_entries SET norm = ? WHERE query = ?",
+                ((self.normalize(row["query"]), row["query"]) for row in rows),
+            )
+
+    def _migrate(self):
+        with self.transaction() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for number, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {number}")
+
+    # ------------------------ Reads -----------------------
+    def load_all(self) -> dict:
+        rows = self._conn.execute(f"SELECT {COLUMNS} FROM cache_entries").fetchall()
+        return {row["query"]: _entry(row) for row in rows}
+
+    def get(self, query: str):
+        row = self._conn.execute(f"SELECT {COLUMNS} FROM cache_entries WHERE query = ?", (query,)).fetchone()
+        return _entry(row) if row else None
+
+    def get_by_id(self, song_id: str):
+        row = self._conn.execute(f"SELECT {COLUMNS} FROM cache_entries WHERE id = ?", (song_id,)).fetchone()
+        return (row["query"], _entry(row)) if row else None
+
+    def get_by_norm(self, norm: str):
+        row = self._conn.execute(
+            f"SELECT {COLUMNS} FROM cache_entries WHERE norm = ? ORDER BY timestamp DESC LIMIT 1", (norm,)
+        ).fetchone()
+        return (row["query"], _entry(row)) if row else None
+
+    def expired(self, cutoff: float) -> list:
+        """Entries stored before `cutoff`, oldest first."""
+        rows = self._conn.execute(
+            f"SELECT {COLUMNS} FROM cache_entries WHERE timestamp < ? ORDER BY timestamp", (cutoff,)
+        ).fetchall()
+        return [(row["query"], _entry(row)) for row in rows]
+
+    def oldest(self, limit: int) -> list:
+        rows = self._conn.execute(
+            f"SELECT {COLUMNS} FROM cache_entries ORDER BY timestamp LIMIT ?", (limit,)
+        ).fetchall()
+        return [(row["query"], _entry(row)) for row in rows]
+
+    def oldest_timestamp(self):
+        """Timestamp of the entry that expires next, or None when empty; one index probe."""
+        return self._conn.execute("SELECT MIN(timestamp) FROM cache_entries").fetchone()[0]
+
+    def eviction_candidates(self, policy: str, limit: int) -> list:
+        """The `limit` entries `policy` ("lru" or "lfu") would evict first."""
+        rows = self._conn.execute(
+            f"SELECT {COLUMNS} FROM cache_entries ORDER BY {EVICTION_ORDER[policy]} LIMIT ?", (limit,)
+        ).fetchall()
+        return [(row["query"], _entry(row)) for row in rows]
+
+    def page(self, after: str, limit: int) -> list:
+        """Up to `limit` entries with query > `after`, in query order; for walking the index in slices."""
+        rows = self._conn.execute(
+            f"SELECT {COLUMNS} FROM cache_entries WHERE query > ? ORDER BY query LIMIT ?", (after, limit)
+        ).fetchall()
+        return [(row["query"], _entry(row)) for row in rows]
+
+    def file_info(self, path: str):
+        """{"size", "refs"} for a stored audio file, or None once no entry references it."""
+        row = self._conn.execute("SELECT size, refs FROM cache_files WHERE path = ?", (path,)).fetchone()
+        return dict(row) if row else None
+
+    def meta(self) -> dict:
+        """Shared totals, plus this process's hits and misses not flushed yet."""
+        meta = dict(self._conn.execute(
+            "SELECT entries, files, bytes, hits, misses FROM cache_meta WHERE id = 1"
+        ).fetchone())
+        with self._pending_lock:
+            meta["hits"] += sum(hits for hits, _ in self._pending_touches.values())
+            meta["misses"] += self._pending_misses
+        return meta
+
+    def count(self) -> int:
+        return self.meta()["entries"]
+
+    def total_bytes(self) -> int:
+        return self.meta()["bytes"]
+
+    # ----------------------- Writes -----------------------
+    def put(self, query: str, entry: dict):
+        self.put_many([(query, entry)])
+
+    def put_many(self, items):
+        with self.transaction() as conn:
+            conn.executemany(UPSERT, (
+                (query, entry["id"], entry["path"], entry["timestamp"], entry["size"],
+                 entry["last_access"], entry["hits"], self.normalize(query))
+                for query, entry in items
+            ))
+
+    def touch(self, query: str, now: float, hit: bool = True):
+        """Record an access (buffered), counted as a cache hit unless `hit` is False.
+
+        The expiry timestamp is left alone so TTL stays an upper bound.
+        """
+        with self._pending_lock:
+            pending = self._pending_touches.setdefault(query, [0, now])
+            if hit:
+                pending[0] += 1
+            pending[1] = max(pending[1], now)
+            full = len(self._pending_touches) >= self.flush_batch
+        if full:
+            self.flush()
+
+    def record_miss(self):
+        with self._pending_lock:
+            self._pending_misses += 1
+            full = self._pending_misses >= self.flush_batch
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Write buffered hits and misses in one transaction."""
+        with self._pending_lock:
+            touches, self._pending_touches = self._pending_touches, {}
+            misses, self._pending_misses = self._pending_misses, 0
+        if not touches and not misses:
+            return
+        try:
+            with self.transaction() as conn:
+                conn.executemany(
+                    "UPDATE cache_entries SET hits = hits + ?, last_access = MAX(last_access, ?) WHERE query = ?",
+                    ((hits, last, query) for query, (hits, last) in touches.items()),
+                )
+                conn.execute(
+                    "UPDATE cache_meta SET hits = hits + ?, misses = misses + ? WHERE id = 1",
+                    (sum(hits for hits, _ in touches.values()), misses),
+                )
+        except sqlite3.Error:
+            with self._pending_lock:  # keep the counts for the next attempt
+                for query, (hits, last) in touches.items():
+                    pending = self._pending_touches.setdefault(query, [0, last])
+                    pending[0] += hits
+                    pending[1] = max(pending[1], last)
+                self._pending_misses += misses
+            raise
+
+    def checkpoint(self) -> dict:
+        """Copy the write-ahead log into the database file and truncate it."""
+        self.flush()
+        busy, log_pages, checkpointed = self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        return {"busy": bool(busy), "log_pages": log_pages, "checkpointed": checkpointed}
+
+    def set_size(self, query: str, size: int):
+        with self.transaction() as conn:
+            conn.execute("UPDATE cache_entries SET size = ? WHERE query = ?", (size, query))
+
+    def delete(self, query: str):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM cache_entries WHERE query = ?", (query,))
+
+    # ------------------- Download leases ------------------
+    def claim_download(self, key: str, owner: str, stale_after: float) -> bool:
+        """Take the download lease for `key`; a lease older than `stale_after` seconds is taken over."""
+        now = time.time()
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM download_leases WHERE key = ? AND started < ?", (key, now - stale_after))
+            conn.execute(
+                "INSERT OR IGNORE INTO download_leases (key, owner, started) VALUES (?, ?, ?)", (key, owner, now)
+            )
+            row = conn.execute("SELECT owner FROM download_leases WHERE key = ?", (key,)).fetchone()
+        return row["owner"] == owner
+
+    def download_leased(self, key: str) -> bool:
+        return self._conn.execute("SELECT 1 FROM download_leases WHERE key = ?", (key,)).fetchone() is not None
+
+    def release_download(self, key: str, owner: str):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM download_leases WHERE key = ? AND owner = ?", (key, owner))
+
+    # ---------------------- Migration ---------------------
+    def migrate_json(self, cache_json: str, heap_json: str):
+        """Import a legacy cache.json into an empty store, then retire the JSON files.
+
+        The expiry heap is derived from the entry timestamps, so expiry_heap.json
+        carries no extra information and is simply retired.
+        """
+        with self.transaction():
+            if not os.path.exists(cache_json) or self.count():
+                return
+            with open(cache_json, "r") as f:
+                legacy = json.load(f)
+            self.put_many(
+                (q, {**v, "size": _file_size(v["path"]), "last_access": v["timestamp"], "hits": 0})
+                for q, v in legacy.items()
+            )
+            for path in (cache_json, heap_json):
+                if os.path.exists(path):
+                    os.replace(path, path + ".migrated")
+        logging.info(f"[ Cache Store ] : Migrated {len(legacy)} entries from {cache_json}")
+
+    def close(self):
+        self.flush()
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def _entry(row) -> dict:
+    return {
+        "path": row["path"],
+        "timestamp": row["timestamp"],
+        "id": row["id"],
+        "size": row["size"],
+        "last_access": row["last_access"],
+        "hits": row["hits"],
+    }
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
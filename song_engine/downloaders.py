@@ -0,0 +1,120 @@
+import hashlib
+import random
+import re
+import time
+
+# MPEG-1 Layer III, 128 kbit/s, 44.1 kHz, no padding: 417-byte frames of 1152 samples
+MP3_FRAME_HEADER = b"\xff\xfb\x90\x64"
+MP3_FRAME_BYTES = 417
+MP3_FRAMES_PER_SECOND = 44100 / 1152
+
+
+class DownloadError(Exception):
+    """Raised when a backend could not fetch audio for a query."""
+
+
+class Downloader:
+    """Fetches the audio for a search query into a local file.
+
+    `resolve(query)` cheaply identifies the source track (e.g. a video id)
+    without fetching it, or returns None if the backend cannot; the engine
+    stores audio under that id so differently worded queries share one file.
+    `download(query, filename, source_id)` writes the MP3 to `filename` and
+    returns the path it wrote. Implementations must be safe to call from
+    several threads.
+    """
+
+    name = "base"
+
+    def resolve(self, query: str):
+        return None
+
+    def download(self, query: str, filename: str, source_id: str = None) -> str:
+        raise NotImplementedError
+
+
+class YtDlpDownloader(Downloader):
+    """Top YouTube search result, extracted to MP3 with ffmpeg."""
+
+    name = "yt-dlp"
+
+    def __init__(self, quality: str = "192"):
+        self.quality = quality
+
+    def resolve(self, query: str):
+        from yt_dlp import YoutubeDL
+        with YoutubeDL({'quiet': True, 'extract_flat': 'in_playlist'}) as ydl:
+            info = ydl.extract_info(f"ytsearch1:{query}", download=False)
+        entries = info.get('entries') or []
+        if not entries:
+            raise DownloadError(f"no search results for {query!r}")
+        return f"yt-{entries[0]['id']}"
+
+    def download(self, query: str, filename: str, source_id: str = None) -> str:
+        ydl_opts = {
+            'format': 'bestaudio/best',
+            'outtmpl': filename,
+            'quiet': True,
+            'postprocessors': [{
+                'key': 'FFmpegExtractAudio',
+                'preferredcodec': 'mp3',
+                'preferredquality': self.quality,
+            }],
+        }
+        from yt_dlp import YoutubeDL
+        with YoutubeDL(ydl_opts) as ydl:
+            if source_id is not None:
+                ydl.download([f"https://www.youtube.com/watch?v={source_id.removeprefix('yt-')}"])
+            else:
+                ydl.download([f"ytsearch1:{query}"])
+        return filename
+
+
+class SyntheticDownloader(Downloader):
+    """Offline stand-in: sleeps like a real fetch, then writes silent MP3 frames.
+
+    Latency is drawn uniformly from latency * (1 ± jitter) and a `failure_rate`
+    fraction of calls raise DownloadError, so benchmarks and load tests can
+    exercise the miss path without network access. resolve() stands in for a
+    search: queries with the same words in any order find the same track.
+    """
+
+    name = "synthetic"
+
+    def __init__(self, latency: float = 2.0, jitter: float = 0.5, failure_rate: float = 0.0,
+                 duration_seconds: float = 30.0, resolve_latency: float = 0.1, seed=None):
+        if not 0 <= failure_rate <= 1:
+            raise ValueError(f"failure_rate must be within [0, 1], got {failure_rate}")
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.duration_seconds = duration_seconds
+        self.resolve_latency = resolve_latency
+        self._random = random.Random(seed)
+
+    def resolve(self, query: str):
+        time.sleep(self.resolve_latency)
+        words = sorted(set(re.findall(r"\w+", query.lower())))
+        return "syn-" + hashlib.md5(" ".join(words).encode()).hexdigest()[:16]
+
+    def download(self, query: str, filename: str, source_id: str = None) -> str:
+        time.sleep(max(0.0, self.latency * self._random.uniform(1 - self.jitter, 1 + self.jitter)))
+        if self._random.random() < self.failure_rate:
+            raise DownloadError(f"synthetic failure for {query!r}")
+        frame = MP3_FRAME_HEADER + bytes(MP3_FRAME_BYTES - len(MP3_FRAME_HEADER))
+        with open(filename, "wb") as f:
+            f.write(frame * max(1, int(self.duration_seconds * MP3_FRAMES_PER_SECOND)))
+        return filename
+
+
+BACKENDS = {
+    YtDlpDownloader.name: YtDlpDownloader,
+    SyntheticDownloader.name: SyntheticDownloader,
+}
+
+
+def make_downloader(name: str, **options) -> Downloader:
+    """Build the backend called `name` ("yt-dlp" or "synthetic") with backend-specific options."""
+    if name not in BACKENDS:
+        raise ValueError(f"DOWNLOAD_BACKEND must be one of {sorted(BACKENDS)}, got {name!r}")
+    return BACKENDS[name](**options)
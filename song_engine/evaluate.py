@@ -0,0 +1,87 @@
+"""Offline precision/recall of cache matching on a labelled query set.
+
+    python evaluate.py eval_queries.jsonl [--catalog extra_titles.txt]
+
+Each line of the labelled set is {"query": ..., "expected": <catalog title or null>};
+null means the song is not cached and the right answer is a miss (download).
+The catalog is every non-null "expected" plus any --catalog titles (one per
+line), embedded with the engine's model and searched exactly, so the live
+vector DB is not touched.
+
+For every re-rank mode, k and threshold the script reports:
+  precision  correct hits / all hits (a wrong hit serves the wrong song)
+  recall     correct hits / queries whose song is cached (a missed hit costs a download)
+"""
+import argparse
+import json
+
+import numpy as np
+
+from matching import RERANK_MODES, normalize_query, rank_candidates
+
+
+def load_labels(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate(labels, catalog, embeddings, query_embeddings, mode, k, threshold):
+    by_norm = {normalize_query(title): title for title in catalog}
+    tp = fp = 0
+    for label, vector in zip(labels, query_embeddings):
+        query, expected = label["query"], label.get("expected")
+        found = by_norm.get(normalize_query(query))  # exact tier, as in lookup_song
+        if found is None:
+            distances = np.sum((embeddings - vector) ** 2, axis=1)
+            nearest = np.argsort(distances)[:k]
+            ranked = rank_candidates(query, [(catalog[i], float(distances[i])) for i in nearest], threshold, mode)
+            if ranked:
+                found = ranked[0][0]
+        if found is None:
+            continue
+        if found == expected:
+            tp += 1
+        else:
+            fp += 1
+    positives = sum(1 for label in labels if label.get("expected") is not None)
+    precision = tp / (tp + fp) if tp + fp else 1.0
+    recall = tp / positives if positives else 1.0
+    return precision, recall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("labels")
+    parser.add_argument("--catalog", help="extra cached titles (distractors), one per line")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 5, 10])
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.5, 0.6, 0.7, 0.8, 0.9, 1.0])
+    args = parser.parse_args()
+
+    labels = load_labels(args.labels)
+    catalog = list(dict.fromkeys(label["expected"] for label in labels if label.get("expected") is not None))
+    if args.catalog:
+        with open(args.catalog) as f:
+            catalog += [line.strip() for line in f if line.strip() and line.strip() not in catalog]
+
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(args.model)
+    embeddings = np.asarray(model.encode(catalog), dtype=np.float32)
+    query_embeddings = np.asarray(model.encode([label["query"] for label in labels]), dtype=np.float32)
+
+    print(f"{len(labels)} labelled queries, {len(catalog)} cached titles\n")
+    print(f"{'rerank':>8} {'k':>3} {'threshold':>9} {'precision':>9} {'recall':>7} {'f1':>6}")
+    best = None
+    for mode in RERANK_MODES:
+        for k in args.k:
+            for threshold in args.thresholds:
+                precision, recall = evaluate(labels, catalog, embeddings, query_embeddings, mode, k, threshold)
+                f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+                print(f"{mode:>8} {k:>3} {threshold:>9.2f} {precision:>9.3f} {recall:>7.3f} {f1:>6.3f}")
+                if best is None or f1 > best[0]:
+                    best = (f1, mode, k, threshold)
+    print(f"\nbest f1 {best[0]:.3f}: rerank={best[1]} k={best[2]} threshold={best[3]:.2f}")
+
+
+if __name__ == "__main__":
+    main()
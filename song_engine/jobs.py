@@ -0,0 +1,146 @@
+import asyncio
+import collections
+import logging
+import queue
+import threading
+import time
+import uuid
+
+
+class PoolFull(Exception):
+    """Raised when the download queue is at capacity."""
+
+
+class Job:
+    def __init__(self, key: str, fn):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.fn = fn
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._futures = []
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def finish(self, result=None, error=None):
+        with self._lock:
+            self.result = result
+            self.error = error
+            self.status = "failed" if error is not None else "done"
+            self.finished_at = time.time()
+            self._done.set()
+            futures, self._futures = self._futures, []
+        for loop, fut in futures:
+            loop.call_soon_threadsafe(_resolve, fut)
+
+    def wait(self, timeout=None) -> bool:
+        return self._done.wait(timeout)
+
+    async def wait_async(self, timeout: float) -> bool:
+        """Wait without tying up a threadpool worker; used by long-poll handlers."""
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        with self._lock:
+            if self.done:
+                return True
+            self._futures.append((loop, fut))
+        try:
+            await asyncio.wait_for(fut, timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.done
+
+    def to_dict(self) -> dict:
+        data = {"job_id": self.id, "status": self.status}
+        if self.status == "done":
+            data["result"] = self.result
+        elif self.status == "failed":
+            data["error"] = self.error
+        return data
+
+
+def _resolve(fut):
+    if not fut.done():
+        fut.set_result(None)
+
+
+class DownloadPool:
+    """Bounded worker pool for cache misses.
+
+    At most `workers` jobs run at once and at most `queue_depth` wait behind
+    them; submissions beyond that raise PoolFull so callers can shed load.
+    Jobs for a key that is already queued or running are folded into the
+    existing job.
+    """
+
+    def __init__(self, workers: int, queue_depth: int, retention_seconds: int = 3600):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.retention_seconds = retention_seconds
+        self._queue = queue.Queue(maxsize=queue_depth)
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._active = {}  # key -> job still queued or running
+        self._finished = collections.deque()
+        self._running = 0
+        for i in range(workers):
+            threading.Thread(target=self._worker, name=f"download-worker-{i}", daemon=True).start()
+
+    def submit(self, key: str, fn) -> Job:
+        with self._lock:
+            self._expire_jobs()
+            job = self._active.get(key)
+            if job is not None:
+                return job
+            job = Job(key, fn)
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                raise PoolFull(f"download queue is full ({self.queue_depth} waiting)")
+            self._jobs[job.id] = job
+            self._active[key] = job
+        return job
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "running": self._running,
+                "queued": self._queue.qsize(),
+                "queue_depth": self.queue_depth,
+                "saturated": self._queue.full(),
+            }
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                self._running += 1
+            job.status = "running"
+            try:
+                job.finish(result=job.fn())
+            except Exception as e:
+                logging.error(f"[Download Job] {job.key}: {e}")
+                job.finish(error=str(e))
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    if self._active.get(job.key) is job:
+                        del self._active[job.key]
+                    self._finished.append(job)
+
+    def _expire_jobs(self):
+        cutoff = time.time() - self.retention_seconds
+        while self._finished and self._finished[0].finished_at < cutoff:
+            self._jobs.pop(self._finished.popleft().id, None)
@@ -0,0 +1,43 @@
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # not POSIX: no multi-worker deployments, every process leads
+    fcntl = None
+
+
+class LeaderLock:
+    """Elects one process (among workers sharing a cache directory) to run background maintenance.
+
+    Leadership is an exclusive flock on `path`. The kernel drops it when the
+    leader exits, so a follower calling acquire() later takes over.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+        self._lock = threading.Lock()
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def acquire(self) -> bool:
+        """Try (without blocking) to become leader; True if this process leads."""
+        with self._lock:
+            if self._fd is not None:
+                return True
+            if fcntl is None:
+                self._fd = -1
+                return True
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                return False
+            os.ftruncate(fd, 0)
+            os.write(fd, str(os.getpid()).encode())
+            self._fd = fd
+            return True
@@ -0,0 +1,229 @@
+"""End-to-end load test for POST /song.
+
+Against a running engine:
+
+    python loadtest.py --url http://localhost:8000 --rps 50 --duration 30 --hit-ratio 0.8
+
+Or let the script start its own engine in a throwaway working directory,
+fully offline (synthetic downloader, hashed embeddings, numpy vector index):
+
+    python loadtest.py --spawn --synthetic-latency 1.5 --synthetic-failure-rate 0.02
+
+Requests are sent open-loop at a fixed rate and latency is measured from
+each request's scheduled send time, so a stalled server shows up in the
+percentiles instead of silently lowering the offered load. --max-p99-ms,
+--min-hit-ratio and --max-error-rate turn the report into a pass/fail gate.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import string
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+ENGINE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _random_title(rng):
+    # Unrelated pseudo-words, so misses do not land within the vector threshold of each other
+    return " ".join("".join(rng.choices(string.ascii_lowercase, k=rng.randint(5, 9))) for _ in range(3))
+
+
+class Client:
+    """One keep-alive HTTP connection per thread."""
+
+    def __init__(self, url: str, timeout: float):
+        self.target = urlparse(url)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self.target.hostname, self.target.port or 80, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def request(self, method: str, path: str, body=None):
+        """(status, parsed JSON body or None); status 0 means the connection failed."""
+        payload = json.dumps(body) if body is not None else None
+        for attempt in range(2):  # the server may have closed an idle keep-alive connection
+            conn = self._conn()
+            try:
+                conn.request(method, path, body=payload, headers={"Content-Type": "application/json"})
+                resp = conn.getresponse()
+                data = resp.read()
+                break
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                self._local.conn = None
+        else:
+            return 0, None
+        try:
+            return resp.status, json.loads(data)
+        except ValueError:
+            return resp.status, None
+
+
+def wait_ready(client: Client, timeout: float):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status, _ = client.request("GET", "/readyz")
+        if status == 200:
+            return
+        time.sleep(0.5)
+    raise SystemExit(f"engine not ready after {timeout:.0f}s")
+
+
+def spawn_engine(port: int, workers: int, latency: float, failure_rate: float, workdir: str):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [ENGINE_DIR, env.get("PYTHONPATH")]))
+    # Fully offline: no yt-dlp, no model download, no Chroma
+    env["DOWNLOAD_BACKEND"] = "synthetic"
+    env["EMBEDDING_BACKEND"] = "hashed"
+    env["VECTOR_BACKEND"] = "numpy"
+    env["SYNTHETIC_LATENCY"] = str(latency)
+    env["SYNTHETIC_FAILURE_RATE"] = str(failure_rate)
+    cmd = [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+           "--workers", str(workers), "--log-level", "warning"]
+    return subprocess.Popen(cmd, cwd=workdir, env=env)
+
+
+def run(client: Client, rps: float, duration: float, hit_ratio: float, warm: int, concurrency: int, seed: int):
+    rng = random.Random(seed)
+    run_tag = "".join(rng.choices(string.ascii_lowercase, k=6))
+    warm_queries = [f"{run_tag} {_random_title(rng)}" for _ in range(warm)]
+
+    print(f"warming {warm} songs ...")
+    with ThreadPoolExecutor(max_workers=min(concurrency, 16)) as pool:
+        warmed = list(pool.map(lambda q: client.request("POST", "/song", {"query": q})[0], warm_queries))
+    warm_queries = [q for q, status in zip(warm_queries, warmed) if status == 200]
+    if not warm_queries and hit_ratio > 0:
+        raise SystemExit("warm-up failed: no song could be cached")
+
+    _, before = client.request("GET", "/cache/status")
+    total = int(rps * duration)
+    plan = [rng.choice(warm_queries) if warm_queries and rng.random() < hit_ratio
+            else f"{run_tag} {_random_title(rng)}" for _ in range(total)]
+
+    results = []  # (latency seconds, status, source)
+    lock = threading.Lock()
+
+    def send(query, scheduled):
+        status, body = client.request("POST", "/song", {"query": query})
+        latency = time.perf_counter() - scheduled
+        source = body.get("source") if status == 200 and isinstance(body, dict) else None
+        with lock:
+            results.append((latency, status, source))
+
+    print(f"sending {total} requests at {rps:g}/s (target hit ratio {hit_ratio:.0%}) ...")
+    began = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for i, query in enumerate(plan):
+            scheduled = began + i / rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, query, scheduled)
+    elapsed = time.perf_counter() - began
+    _, after = client.request("GET", "/cache/status")
+    return results, elapsed, before, after
+
+
+def report(results, elapsed, before, after) -> dict:
+    ok = [r for r in results if r[1] == 200]
+    errors = {}
+    for _, status, _ in results:
+        if status != 200:
+            errors[status] = errors.get(status, 0) + 1
+    hits = sum(1 for r in ok if r[2] == "cache")
+
+    summary = {
+        "requests": len(results),
+        "throughput": len(ok) / elapsed if elapsed else 0.0,
+        "error_rate": (len(results) - len(ok)) / len(results) if results else 0.0,
+        "hit_ratio": hits / len(ok) if ok else 0.0,
+    }
+    print(f"\n{len(results)} requests in {elapsed:.1f}s")
+    print(f"  throughput   {summary['throughput']:10.1f} req/s")
+    print(f"  errors       {len(results) - len(ok):10d}  {errors or ''}")
+    print(f"  hit ratio    {summary['hit_ratio']:10.1%}  (from responses)")
+    if before and after and "hits" in before and "hits" in after:
+        lookups = (after["hits"] - before["hits"]) + (after["misses"] - before["misses"])
+        if lookups:
+            print(f"               {(after['hits'] - before['hits']) / lookups:10.1%}  (server counters)")
+
+    print(f"\n  {'latency ms':12} {'n':>7} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for label, rows in (("all", ok),
+                        ("hits", [r for r in ok if r[2] == "cache"]),
+                        ("misses", [r for r in ok if r[2] != "cache"])):
+        if not rows:
+            continue
+        lat = [r[0] * 1000 for r in rows]
+        print(f"  {label:12} {len(rows):7d} {_percentile(lat, 50):9.1f} {_percentile(lat, 95):9.1f} {_percentile(lat, 99):9.1f}")
+        if label == "all":
+            summary["p99_ms"] = _percentile(lat, 99)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--rps", type=float, default=20)
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load after warm-up")
+    parser.add_argument("--hit-ratio", type=float, default=0.8, help="fraction of requests for already cached songs")
+    parser.add_argument("--warm", type=int, default=50, help="songs cached before the run, drawn on for hits")
+    parser.add_argument("--concurrency", type=int, default=256, help="maximum requests in flight")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--spawn", action="store_true", help="start an offline engine on the synthetic downloader")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers with --spawn")
+    parser.add_argument("--synthetic-latency", type=float, default=1.0)
+    parser.add_argument("--synthetic-failure-rate", type=float, default=0.0)
+    parser.add_argument("--max-p99-ms", type=float, help="fail if overall p99 latency exceeds this")
+    parser.add_argument("--min-hit-ratio", type=float, help="fail if the observed hit ratio is below this")
+    parser.add_argument("--max-error-rate", type=float, help="fail if the error rate exceeds this")
+    args = parser.parse_args()
+
+    client = Client(args.url, args.timeout)
+    engine = None
+    with tempfile.TemporaryDirectory() as workdir:
+        try:
+            if args.spawn:
+                engine = spawn_engine(urlparse(args.url).port or 80, args.workers, args.synthetic_latency,
+                                      args.synthetic_failure_rate, workdir)
+            wait_ready(client, timeout=300)
+            results, elapsed, before, after = run(client, args.rps, args.duration, args.hit_ratio,
+                                                  args.warm, args.concurrency, args.seed)
+        finally:
+            if engine is not None:
+                engine.terminate()
+                engine.wait()
+    summary = report(results, elapsed, before, after)
+
+    failures = []
+    if args.max_p99_ms is not None and summary.get("p99_ms", float("inf")) > args.max_p99_ms:
+        failures.append(f"p99 {summary.get('p99_ms', float('nan')):.1f} ms > {args.max_p99_ms:g} ms")
+    if args.min_hit_ratio is not None and summary["hit_ratio"] < args.min_hit_ratio:
+        failures.append(f"hit ratio {summary['hit_ratio']:.1%} < {args.min_hit_ratio:.1%}")
+    if args.max_error_rate is not None and summary["error_rate"] > args.max_error_rate:
+        failures.append(f"error rate {summary['error_rate']:.1%} > {args.max_error_rate:.1%}")
+    if failures:
+        print("\nFAILED: " + "; ".join(failures))
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,181 @@
+import atexit
 import logging
 import os
-import json
 import time
 import hashlib
-from typing import Optional
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-import heapq
+import uuid
+import json
+from collections import OrderedDict
+from typing import List, Literal, Optional
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
 import threading
 
-
-import chromadb
-from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
-from sentence_transformers import SentenceTransformer
-from yt_dlp import YoutubeDL
+from cache import SongCache
+from cache_store import EVICTION_ORDER, CacheStore
+from downloaders import SyntheticDownloader, make_downloader
+from jobs import DownloadPool, PoolFull
+from leader import LeaderLock
+from matching import normalize_query, rank_candidates
+from metrics import CONTENT_TYPE, Registry, RequestMetrics, timed
+from reconcile import Reconciler
+from singleflight import SingleFlight
+from streaming import RangeFileResponse
+from transcode import SEGMENT_PATTERN, Transcoder, parse_ladder
 
 # ----------------------- Config -----------------------
 CACHE_DIR = "song_cache"
-CACHE_DB = os.path.join(CACHE_DIR, "cache.json")
+CACHE_INDEX_DB = os.path.join(CACHE_DIR, "cache.sqlite3")
+PRUNE_LOCK_FILE = os.path.join(CACHE_DIR, "prune.lock")
+CACHE_DB = os.path.join(CACHE_DIR, "cache.json")  # legacy, migrated on first start
+HEAP_FILE = os.path.join(CACHE_DIR, "expiry_heap.json")  # legacy, migrated on first start
+RENDITIONS_DIR = os.path.join(CACHE_DIR, "renditions")
 CHROMA_DIR = "chroma"
+VECTOR_DIR = "vectors"  # used by the "numpy" vector backend
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")  # "chroma" or "numpy" (in-process, memory-mapped)
 TTL_SECONDS = 7 * 24 * 60 * 60  # 7 days
+DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "4"))
+DOWNLOAD_QUEUE_DEPTH = int(os.getenv("DOWNLOAD_QUEUE_DEPTH", "64"))
+JOB_WAIT_MAX_SECONDS = 60
+MAX_BATCH_SIZE = 200
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(10 * 1024 ** 3)))  # 10 GiB
+CACHE_LOW_WATER = 0.9  # quota eviction stops once usage is back under this fraction
+PRUNE_MAX_SLEEP_SECONDS = 300  # upper bound on the TTL prune sleep, so other workers' first entries are seen
+QUOTA_CHECK_SECONDS = 30  # the leader also re-checks the quota on this period for other workers' downloads
+STATS_FLUSH_SECONDS = 1  # buffered hit/miss counters are written at least this often
+WAL_CHECKPOINT_SECONDS = 5 * 60  # the prune leader folds the index's write-ahead log back this often
+DOWNLOAD_LEASE_SECONDS = 15 * 60  # a cross-worker download lease older than this is presumed dead
+EVICTION_POLICY = os.getenv("EVICTION_POLICY", "lru")  # "lru" or "lfu"
+DOWNLOAD_BACKEND = os.getenv("DOWNLOAD_BACKEND", "yt-dlp")  # "yt-dlp" or "synthetic" (offline, for tests and load tests)
+SYNTHETIC_LATENCY = float(os.getenv("SYNTHETIC_LATENCY", "2.0"))  # seconds per synthetic download
+SYNTHETIC_FAILURE_RATE = float(os.getenv("SYNTHETIC_FAILURE_RATE", "0"))  # fraction of synthetic downloads that fail
+MATCH_THRESHOLD = 0.7  # default max embedding distance (squared L2) for a vector hit
+TOP_K = 5  # default nearest neighbours fetched for re-ranking
+MAX_TOP_K = 50
+TRANSCODE_LADDER = parse_ladder(os.getenv("TRANSCODE_LADDER", "mp3-64,mp3-128,mp3-192"))  # "" to disable
+TRANSCODE_WORKERS = int(os.getenv("TRANSCODE_WORKERS", "2"))  # ffmpeg processes per engine worker
+HLS_SEGMENT_SECONDS = 6
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "4096"))  # memoized query embeddings
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "model")  # "model" or "hashed" (offline trigram stand-in, for load tests)
+WARMUP = os.getenv("WARMUP", "1") == "1"  # load model + vector store in the background at startup
+WARMUP_PROBE = "warm up probe query"
+TIMING_HEADERS = os.getenv("TIMING_HEADERS", "0") == "1"  # add a Server-Timing header with per-stage durations
 os.makedirs(CACHE_DIR, exist_ok=True)
+if VECTOR_BACKEND not in ("chroma", "numpy"):
+    raise ValueError(f"VECTOR_BACKEND must be 'chroma' or 'numpy', got {VECTOR_BACKEND!r}")
+if EMBEDDING_BACKEND not in ("model", "hashed"):
+    raise ValueError(f"EMBEDDING_BACKEND must be 'model' or 'hashed', got {EMBEDDING_BACKEND!r}")
+if EVICTION_POLICY not in EVICTION_ORDER:
+    raise ValueError(f"EVICTION_POLICY must be one of {sorted(EVICTION_ORDER)}, got {EVICTION_POLICY!r}")
+
+# ---------------------- Metrics -----------------------
+# Served at /metrics. Stage timings and counters are this worker's own; the
+# cache gauges read the index shared by all workers.
+metrics = Registry()
+STAGE_SECONDS = metrics.histogram("song_engine_stage_seconds", "Time spent in each stage of serving a song", ["stage"])
+REQUEST_SECONDS = metrics.histogram("song_engine_request_seconds", "Time until the response headers are sent",
+                                    ["route", "method", "status"])
+PRUNE_SECONDS = metrics.histogram("song_engine_prune_seconds", "Duration of TTL prune and quota eviction passes", ["kind"])
+TRANSCODE_SECONDS = metrics.histogram("song_engine_transcode_seconds", "Rendition ladder jobs, queueing included",
+                                      ["result"])
+LOOKUPS = metrics.counter("song_engine_lookups_total", "Cache lookups: exact hit, vector hit or miss", ["result"])
+DOWNLOAD_RESULTS = metrics.counter("song_engine_downloads_total", "Misses filled by downloading, aliasing a stored track, or failing",
+                        ["result"])
+CACHE_BYTES = metrics.gauge("song_engine_cache_bytes", "Bytes of audio in the cache")
+CACHE_MAX_BYTES_GAUGE = metrics.gauge("song_engine_cache_max_bytes", "Cache quota in bytes")
+CACHE_ENTRIES = metrics.gauge("song_engine_cache_entries", "Cached queries")
+CACHE_FILES = metrics.gauge("song_engine_cache_files", "Distinct audio files in the cache")
+CACHE_HIT_RATIO = metrics.gauge("song_engine_cache_hit_ratio", "Hits over lookups, all workers")
+DOWNLOADS_IN_FLIGHT = metrics.gauge("song_engine_downloads_in_flight", "Distinct downloads running in this worker")
+DOWNLOAD_QUEUE = metrics.gauge("song_engine_download_pool_jobs", "Background download jobs", ["state"])
+TRANSCODES_IN_FLIGHT = metrics.gauge("song_engine_transcodes_in_flight", "Rendition ladder jobs queued or running")
 
 # -------------------- Embeddings ----------------------
-embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
-embedding_fn = SentenceTransformerEmbeddingFunction(model_name="all-MiniLM-L6-v2")
+# Heavy imports and model/DB handles are created on first use (or by warm_up)
+# so the app can bind and answer /healthz straight away.
+_model = None
+_model_lock = threading.Lock()
 
-# --------------------- Vector DB ----------------------
-chroma_client = chromadb.PersistentClient(path=CHROMA_DIR)
-collection = chroma_client.get_or_create_collection(name="songs", embedding_function=embedding_fn)
+def get_model():
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None and EMBEDDING_BACKEND == "hashed":
+                from vectors import HashedEmbedder
+                _model = HashedEmbedder()
+            elif _model is None:
+                from sentence_transformers import SentenceTransformer
+                _model = SentenceTransformer(EMBEDDING_MODEL)
+    return _model
+
+_embed_cache = OrderedDict()  # query -> embedding, least recently used first
+_embed_cache_lock = threading.Lock()
+
+def embed_queries(queries: list) -> list:
+    """Embeddings for `queries`; everything not memoized goes through one model call."""
+    found = {}
+    with _embed_cache_lock:
+        for q in queries:
+            if q in _embed_cache:
+                _embed_cache.move_to_end(q)
+                found[q] = _embed_cache[q]
+    missing = list(dict.fromkeys(q for q in queries if q not in found))
+    if missing:
+        vectors = get_model().encode(missing)
+        with _embed_cache_lock:
+            for q, vec in zip(missing, vectors):
+                found[q] = _embed_cache[q] = [float(x) for x in vec]
+            while len(_embed_cache) > EMBED_CACHE_SIZE:
+                _embed_cache.popitem(last=False)
+    return [found[q] for q in queries]
+
+def embed_query(query: str) -> list:
+    return embed_queries([query])[0]
 
 # --------------------- Vector DB ----------------------
+_collection = None
+_collection_lock = threading.Lock()
+
+def get_collection():
+    """The song vector index: a Chroma collection, or anything else implementing vectors.VectorIndex."""
+    global _collection
+    if _collection is None:
+        with _collection_lock:
+            if _collection is None:
+                _collection = open_vector_index()
+    return _collection
+
+def open_vector_index():
+    if VECTOR_BACKEND == "numpy":
+        from vectors import NumpyVectorIndex
+        return NumpyVectorIndex(VECTOR_DIR)
+
+    import chromadb
+    from chromadb.utils.embedding_functions import EmbeddingFunction
+
+    class SharedModelEmbeddingFunction(EmbeddingFunction):
+        """Chroma embedding function backed by the engine's single model instance."""
+        def __call__(self, input):
+            return get_model().encode(list(input)).tolist()
+
+    client = chromadb.PersistentClient(path=CHROMA_DIR)
+    return client.get_or_create_collection(name="songs", embedding_function=SharedModelEmbeddingFunction())
+
+def is_ready() -> bool:
+    return _model is not None and _collection is not None
+
+def warm_up():
+    start = time.perf_counter()
+    try:
+        get_model().encode([WARMUP_PROBE])
+        get_collection()
+        logging.info(f"[ Warm-up ] : Ready in {time.perf_counter() - start:.2f}s")
+    except Exception as e:
+        logging.error(f"[Warm-up] Error: {e}")
+
+# ----------------------- Logging ----------------------
 def init_logger():
     GREEN = "\033[92m"
     RED = "\033[91m"
@@ -54,144 +199,476 @@ def init_logger():
         ch.setFormatter(formatter)
         logger.addHandler(ch)
 
-# --------------------- Cache JSON ---------------------
-if os.path.exists(CACHE_DB):
-    with open(CACHE_DB, 'r') as f:
-        cache_index = json.load(f)
-else:
-    cache_index = {}
+# --------------------- Cache Index --------------------
+transcoder = Transcoder(RENDITIONS_DIR, TRANSCODE_LADDER, TRANSCODE_WORKERS, HLS_SEGMENT_SECONDS,
+                        on_done=lambda seconds, error: TRANSCODE_SECONDS.observe(
+                            seconds, result="failed" if error is not None else "ok"))
 
-def save_cache():
-    with open(CACHE_DB, 'w') as f:
-        json.dump(cache_index, f, indent=2)
+def source_key(path: str) -> str:
+    return os.path.splitext(os.path.basename(path))[0]
 
-def cleanup_expired():
-    now = time.time()
-    changed = False
-
-    while expiry_heap and expiry_heap[0][0] + TTL_SECONDS < now:
-        ts, query = heapq.heappop(expiry_heap)
-        if query in cache_index:
-            path = cache_index[query]['path']
-            if os.path.exists(path):
-                os.remove(path)
-            try:
-                collection.delete(ids=[cache_index[query]['id']])
-            except:
-                pass
-            del cache_index[query]
-            changed = True
+def forget_song(entry: dict):
+    try:
+        get_collection().delete(ids=[entry['id']])
+    except Exception as e:  # the next reconcile pass removes the leftover vector
+        logging.error(f"[Vector DB] Could not delete {entry['id']}: {e}")
+    if store.file_info(entry['path']) is None:  # the audio's last alias is gone
+        transcoder.remove(source_key(entry['path']))
 
-    if changed:
-        save_cache()
-        save_heap()
+store = CacheStore(CACHE_INDEX_DB, normalize=normalize_query)
+store.migrate_json(CACHE_DB, HEAP_FILE)
+cache = SongCache(store, CACHE_MAX_BYTES, on_evict=forget_song, lease_seconds=DOWNLOAD_LEASE_SECONDS)
+prune_leader = LeaderLock(PRUNE_LOCK_FILE)  # with --workers N, only one process prunes
+atexit.register(store.flush)
+reconciler = Reconciler(cache, CACHE_DIR, get_collection, embed_queries, partial_max_age=DOWNLOAD_LEASE_SECONDS,
+                        renditions_dir=RENDITIONS_DIR)
 
-# --------------------- Heap Congig --------------------
-HEAP_FILE = os.path.join(CACHE_DIR, "expiry_heap.json")
+def cleanup_expired():
+    start = time.perf_counter()
+    cutoff = time.time() - TTL_SECONDS
+    for query, entry in cache.expired(cutoff):
+        cache.evict(query, stored_before=cutoff)
+    PRUNE_SECONDS.observe(time.perf_counter() - start, kind="ttl")
 
-expiry_heap = []
+def evict_over_quota():
+    start = time.perf_counter()
+    target = CACHE_MAX_BYTES * CACHE_LOW_WATER
+    store.flush()  # pick victims from up-to-date access stats
+    while cache.bytes > target:
+        listed_at = time.time()
+        victims = cache.eviction_candidates(EVICTION_POLICY, 32)
+        if not victims:
+            break
+        for query, entry in victims:
+            if cache.bytes <= target:
+                break
+            cache.evict(query, stored_before=listed_at)
+            logging.info(f"[Quota Evict] {query} ({entry['size']} bytes, {EVICTION_POLICY})")
+    PRUNE_SECONDS.observe(time.perf_counter() - start, kind="quota")
 
-if os.path.exists(HEAP_FILE):
-    with open(HEAP_FILE, 'r') as f:
-        expiry_heap = json.load(f)
-    heapq.heapify(expiry_heap)
-else:
-    for query, data in cache_index.items():
-        expiry_heap.append([data['timestamp'], query])
-    heapq.heapify(expiry_heap)
+# ---------------------- Cleanup Thread ----------------------
+def wait_for_leadership():
+    if not prune_leader.acquire():
+        logging.info("[ Prune Leader ] : Another worker prunes this cache; standing by")
+        while not prune_leader.acquire():
+            time.sleep(30)
+    logging.info(f"[ Prune Leader ] : Worker {os.getpid()} prunes this cache")
 
-def save_heap():
-    with open(HEAP_FILE, 'w') as f:
-        json.dump(expiry_heap, f)
+def seconds_until_next_expiry() -> float:
+    oldest = cache.oldest_timestamp()
+    if oldest is None:
+        return PRUNE_MAX_SLEEP_SECONDS
+    # Entries are pruned once strictly older than the TTL, hence the extra millisecond
+    return min(PRUNE_MAX_SLEEP_SECONDS, max(0.0, oldest + TTL_SECONDS - time.time()) + 0.001)
 
-# ---------------------- Cleanup Thread ----------------------
-def periodic_cleanup(interval_seconds=300):  # every 5 minute
+def periodic_cleanup():
+    wait_for_leadership()
+    reconciler.run()  # repair drift left by crashes before pruning against the index
     logging.info("[ TTL Prune Thread ] : Active")
     while True:
         try:
             cleanup_expired()
+            delay = seconds_until_next_expiry()
         except Exception as e:
             logging.error(f"[TTL Prune] Error: {e}")
-        time.sleep(interval_seconds)
+            delay = PRUNE_MAX_SLEEP_SECONDS
+        time.sleep(delay)  # wake when the oldest entry expires; new entries always expire later
+
+def quota_eviction():
+    wait_for_leadership()
+    logging.info(f"[ Quota Evict Thread ] : Active ({EVICTION_POLICY}, {CACHE_MAX_BYTES} bytes)")
+    while True:
+        cache.over_quota.wait(QUOTA_CHECK_SECONDS)
+        cache.over_quota.clear()
+        try:
+            evict_over_quota()
+        except Exception as e:
+            logging.error(f"[Quota Evict] Error: {e}")
+
+def index_maintenance():
+    # Every worker flushes its own hit/miss buffer; only the leader checkpoints
+    last_checkpoint = time.time()
+    while True:
+        time.sleep(STATS_FLUSH_SECONDS)
+        try:
+            store.flush()
+            if prune_leader.held and time.time() - last_checkpoint >= WAL_CHECKPOINT_SECONDS:
+                result = store.checkpoint()
+                last_checkpoint = time.time()
+                logging.info(f"[ WAL Checkpoint ] : {result['checkpointed']}/{result['log_pages']} pages")
+        except Exception as e:
+            logging.error(f"[Index Maintenance] Error: {e}")
 
 # ---------------------- Download ----------------------
-def download_song(query: str, song_id: str):
+if DOWNLOAD_BACKEND == SyntheticDownloader.name:
+    downloader = make_downloader(DOWNLOAD_BACKEND, latency=SYNTHETIC_LATENCY, failure_rate=SYNTHETIC_FAILURE_RATE)
+else:
+    downloader = make_downloader(DOWNLOAD_BACKEND)
+
+def download_song(query: str, song_id: str, source_id: str = None):
     filename = os.path.join(CACHE_DIR, f"{song_id}.mp3")
-    ydl_opts = {
-        'format': 'bestaudio/best',
-        'outtmpl': filename,
-        'quiet': True,
-        'postprocessors': [{
-            'key': 'FFmpegExtractAudio',
-            'preferredcodec': 'mp3',
-            'preferredquality': '192',
-        }],
-    }
-    with YoutubeDL(ydl_opts) as ydl:
-        ydl.download([f"ytsearch1:{query}"])
-    return filename
+    return downloader.download(query, filename, source_id)
 
-# ---------------------- Serving -----------------------
-def serve_song(query: str, threshold: float = 0.7):
-    cleanup_expired()
-    
-    matches = collection.query(query_texts=[query], n_results=1)
-
-    if matches['ids'][0]:
-        match_id = matches['ids'][0][0]
-        distance = matches['distances'][0][0]
-        
-        if distance <= threshold:  # Lower distance = better match
-            for k, v in cache_index.items():
-                if v['id'] == match_id:
-                    return {"source": "cache", "title": k, "path": v['path']}
-    
-    # No valid match found, download it
+def audio_path(source_id: str) -> str:
+    return os.path.join(CACHE_DIR, f"{source_id}.mp3")
+
+def content_id(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return f"sha1-{digest.hexdigest()}"
+
+# ------------------- In-flight Downloads -------------------
+downloads = SingleFlight()
+download_pool = DownloadPool(DOWNLOAD_WORKERS, DOWNLOAD_QUEUE_DEPTH)
+
+def fetch_song(query: str):
+    # A coalesced download (here or in another worker) may have finished since our miss
+    title = cache.resolve_exact(query)
+    entry = cache.get(title) if title is not None else None
+    if entry is not None:
+        return {"source": "cache", "title": title, "path": entry['path']}
+
+    # Audio is stored once per source track, however differently it was asked for
+    with timed(STAGE_SECONDS, "resolve"):
+        source_id = downloader.resolve(query)
+    if source_id is None:
+        return store_song(query, None)
+    return cache.run_exclusive(f"source:{source_id}", lambda: store_song(query, source_id))
+
+def store_song(query: str, source_id: str = None):
     song_id = hashlib.md5(query.encode()).hexdigest()
-    path = download_song(query, song_id)
+    now = time.time()
+    entry = {'timestamp': now, 'id': song_id, 'last_access': now, 'hits': 0}
 
-    # Update vector DB
-    collection.add(documents=[query], ids=[song_id])
+    # Update cache index: alias the stored track if we have it, download it otherwise
+    with timed(STAGE_SECONDS, "index_write"):
+        stored = cache.alias(query, {**entry, 'path': audio_path(source_id)}) if source_id else None
+    if stored is None:
+        try:
+            with timed(STAGE_SECONDS, "download"):
+                staged = download_song(query, f"{song_id}.{uuid.uuid4().hex[:8]}.part", source_id)
+        except Exception:
+            DOWNLOAD_RESULTS.inc(result="failed")
+            raise
+        if source_id is None:  # no metadata: identify the track by its audio
+            with timed(STAGE_SECONDS, "fingerprint"):
+                source_id = content_id(staged)
+            stored = cache.alias(query, {**entry, 'path': audio_path(source_id)})
+        if stored is not None:
+            os.remove(staged)
+        else:
+            with timed(STAGE_SECONDS, "index_write"):
+                cache.add(query, {**entry, 'path': audio_path(source_id), 'size': os.path.getsize(staged)},
+                          staged_path=staged)
+            transcoder.submit(source_id, audio_path(source_id))  # rendition ladder, in the background
+    DOWNLOAD_RESULTS.inc(result="aliased" if stored is not None else "downloaded")
 
-    # Update cache index
-    cache_index[query] = {
-        'path': path,
-        'timestamp': time.time(),
-        'id': song_id
-    }
-    heapq.heappush(expiry_heap, [cache_index[query]['timestamp'], query])
-    save_heap()
-    save_cache()
-    return {"source": "download", "title": query, "path": path}
+    # Update vector DB (after the index, so a reconcile pass never mistakes the vector for an orphan)
+    with timed(STAGE_SECONDS, "embed"):
+        embedding = embed_query(query)
+    with timed(STAGE_SECONDS, "vector_upsert"):
+        get_collection().upsert(documents=[query], embeddings=[embedding], ids=[song_id])
+    return {"source": "cache" if stored is not None else "download", "title": query, "path": audio_path(source_id)}
+
+# ---------------------- Serving -----------------------
+def cache_hit(title: str):
+    entry = cache.hit(title)
+    if entry is None:  # evicted between the index lookup and now
+        return None
+    if not os.path.exists(entry['path']):  # deleted behind the index's back
+        cache.evict(title)
+        return None
+    return {"source": "cache", "title": title, "path": entry['path']}
+
+def lookup_song(query: str, threshold: float = MATCH_THRESHOLD, k: int = TOP_K, rerank: str = "lexical"):
+    """Return the cached song closest to `query`, or None on a miss.
+
+    Exact matches on the normalized query are answered from the index; only
+    the rest pay for an embedding (memoized) and a top-k vector search whose
+    candidates are re-ranked.
+    """
+    with timed(STAGE_SECONDS, "index"):
+        title = cache.resolve_exact(query)
+        hit = cache_hit(title) if title is not None else None
+    if hit is not None:
+        LOOKUPS.inc(result="exact")
+        return {**hit, "score": 1.0}
+
+    with timed(STAGE_SECONDS, "embed"):
+        embedding = embed_query(query)
+    with timed(STAGE_SECONDS, "vector_query"):
+        matches = get_collection().query(query_embeddings=[embedding], n_results=k)
+    with timed(STAGE_SECONDS, "rerank"):
+        hit = match_hit(query, matches['ids'][0], matches['distances'][0], threshold, rerank)
+    LOOKUPS.inc(result="vector" if hit is not None else "miss")
+    if hit is None:
+        cache.miss()
+    return hit
+
+def match_hit(query: str, ids: list, distances: list, threshold: float, rerank: str):
+    candidates = []
+    for song_id, distance in zip(ids, distances):
+        title = cache.resolve_id(song_id)
+        if title is not None:
+            candidates.append((title, distance))
+    for title, score in rank_candidates(query, candidates, threshold, rerank):
+        hit = cache_hit(title)
+        if hit is not None:
+            return {**hit, "score": round(score, 4)}
+    return None
+
+def lookup_songs(queries: list, threshold: float = MATCH_THRESHOLD, k: int = TOP_K, rerank: str = "lexical") -> list:
+    """Batch form of lookup_song: one embedding call and one vector query for all non-exact hits."""
+    results = [None] * len(queries)
+    pending = []
+    with timed(STAGE_SECONDS, "index"):
+        for i, query in enumerate(queries):
+            title = cache.resolve_exact(query)
+            if title is not None:
+                hit = cache_hit(title)
+                results[i] = {**hit, "score": 1.0} if hit is not None else None
+            if results[i] is None:
+                pending.append(i)
+    LOOKUPS.inc(len(queries) - len(pending), result="exact")
+
+    if pending:
+        with timed(STAGE_SECONDS, "embed"):
+            embeddings = embed_queries([queries[i] for i in pending])
+        with timed(STAGE_SECONDS, "vector_query"):
+            matches = get_collection().query(query_embeddings=embeddings, n_results=k)
+        with timed(STAGE_SECONDS, "rerank"):
+            for n, i in enumerate(pending):
+                results[i] = match_hit(queries[i], matches['ids'][n], matches['distances'][n], threshold, rerank)
+                LOOKUPS.inc(result="vector" if results[i] is not None else "miss")
+                if results[i] is None:
+                    cache.miss()
+    return results
+
+def download_once(query: str):
+    # Download once, however many callers ask concurrently, in this worker or any other
+    key = normalize_query(query)
+    result, _ = downloads.do(key, lambda: cache.run_exclusive(key, lambda: fetch_song(query)))
+    return result
+
+def serve_song(query: str, threshold: float = MATCH_THRESHOLD, k: int = TOP_K, rerank: str = "lexical"):
+    # Expired entries are pruned by the leader's periodic_cleanup, never on the request path
+    return lookup_song(query, threshold, k, rerank) or download_once(query)
 
 # -------------------- FastAPI Setup -------------------
 app = FastAPI()
+app.add_middleware(RequestMetrics, histogram=REQUEST_SECONDS, timing_headers=TIMING_HEADERS)
+
+class MatchOptions(BaseModel):
+    threshold: float = Field(MATCH_THRESHOLD, ge=0, le=2)  # max embedding distance for a vector hit
+    k: int = Field(TOP_K, ge=1, le=MAX_TOP_K)  # nearest neighbours considered
+    rerank: Literal["lexical", "none"] = "lexical"  # "none": plain nearest neighbour
 
-class SongRequest(BaseModel):
+class SongRequest(MatchOptions):
     query: str
+    mode: Literal["sync", "job"] = "sync"  # "job": misses return a job id instead of blocking
+
+@app.get("/healthz")
+def healthz():
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readyz():
+    body = {"model": _model is not None, "vector_store": _collection is not None}
+    if not is_ready():
+        return JSONResponse(status_code=503, content={"status": "starting", **body})
+    return {"status": "ready", **body}
 
 @app.post("/song")
 def get_song(data: SongRequest):
     try:
-        result = serve_song(data.query)
-        return result
+        if data.mode == "sync":
+            return serve_song(data.query, data.threshold, data.k, data.rerank)
+
+        hit = lookup_song(data.query, data.threshold, data.k, data.rerank)
+        if hit is not None:
+            return hit
+        job = download_pool.submit(normalize_query(data.query), lambda: download_once(data.query))
+        return JSONResponse(status_code=202, content=job.to_dict())
+    except PoolFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+class BatchRequest(MatchOptions):
+    queries: List[str]
+
+@app.post("/songs/batch")
+def get_songs(data: BatchRequest):
+    """Resolve many queries at once, streaming one NDJSON line per query in request order."""
+    if len(data.queries) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_SIZE} queries per batch")
+    try:
+        hits = lookup_songs(data.queries, data.threshold, data.k, data.rerank)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+    # Misses download in parallel on the shared pool while earlier lines stream out
+    pending = {}
+    for i, (query, hit) in enumerate(zip(data.queries, hits)):
+        if hit is None:
+            try:
+                pending[i] = download_pool.submit(normalize_query(query), lambda q=query: download_once(q))
+            except PoolFull as e:
+                hits[i] = {"error": str(e)}
+
+    def stream():
+        for i, query in enumerate(data.queries):
+            if i in pending:
+                job = pending[i]
+                job.wait()
+                line = job.result if job.status == "done" else {"error": job.error}
+            else:
+                line = hits[i]
+            yield json.dumps({"index": i, "query": query, **line}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@app.get("/jobs/queue")
+def job_queue():
+    return download_pool.stats()
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    job = download_pool.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}/wait")
+async def job_wait(job_id: str, timeout: float = 30):
+    job = download_pool.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    await job.wait_async(min(max(timeout, 0), JOB_WAIT_MAX_SECONDS))
+    return job.to_dict()
     
 @app.get("/cache/status")
 def cache_status(limit: int = 10):
     now = time.time()
     upcoming = []
 
-    for ts, query in sorted(expiry_heap)[:limit]:
-        time_left = max(0, (ts + TTL_SECONDS) - now)
+    for query, entry in cache.oldest(limit):
+        time_left = max(0, (entry['timestamp'] + TTL_SECONDS) - now)
         upcoming.append({
             "title": query,
             "expires_in_seconds": int(time_left),
-            "path": cache_index.get(query, {}).get("path", "unknown")
+            "path": entry['path']
         })
 
-    return {"upcoming_expirations": upcoming}
+    return {
+        "upcoming_expirations": upcoming,
+        "next_expiry_in_seconds": int(upcoming[0]["expires_in_seconds"]) if upcoming else None,
+        **cache.stats(),
+        "eviction_policy": EVICTION_POLICY,
+        "transcodes_in_flight": transcoder.in_flight(),
+    }
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Prometheus text format: per-stage latency histograms, lookup and download counters, cache gauges."""
+    stats = cache.stats()
+    CACHE_BYTES.set(stats['bytes'])
+    CACHE_MAX_BYTES_GAUGE.set(stats['max_bytes'])
+    CACHE_ENTRIES.set(stats['entries'])
+    CACHE_FILES.set(stats['files'])
+    CACHE_HIT_RATIO.set(stats['hit_ratio'])
+    pool = download_pool.stats()
+    DOWNLOAD_QUEUE.set(pool['running'], state="running")
+    DOWNLOAD_QUEUE.set(pool['queued'], state="queued")
+    DOWNLOADS_IN_FLIGHT.set(downloads.in_flight())
+    TRANSCODES_IN_FLIGHT.set(transcoder.in_flight())
+    return Response(metrics.render(), media_type=CONTENT_TYPE)
+
+def choose_rendition(request: Request, requested: Optional[str]):
+    if requested == "original":
+        return None
+    if requested and transcoder.rendition(requested) is None:
+        available = ["original"] + [r.name for r in transcoder.ladder]
+        raise HTTPException(status_code=400, detail=f"Unknown rendition {requested!r}; one of {available}")
+    downlink = request.headers.get("downlink")  # client hint, in Mbit/s
+    try:
+        downlink = float(downlink) if downlink else None
+    except ValueError:
+        downlink = None
+    return transcoder.choose(requested, request.headers.get("save-data") == "on", downlink)
+
+@app.api_route("/stream/{song_id}", methods=["GET", "HEAD"])
+def stream_song(song_id: str, request: Request, rendition: Optional[str] = None):
+    """Stream a cached song: a named `rendition`, one picked from Save-Data/Downlink hints, or the original."""
+    chosen = choose_rendition(request, rendition)
+    pinned = cache.pin(song_id)  # held until the response finishes, so eviction cannot delete the file
+    if pinned is None:
+        raise HTTPException(status_code=404, detail="Song not cached")
+    title, entry = pinned
+    path = entry['path']
+    if not os.path.exists(path):
+        cache.unpin(path)
+        raise HTTPException(status_code=404, detail="Song not cached")
+    cache.played(title)  # hit ratio and LFU counts come from lookups only
+
+    serve_path, media_type, served = path, "audio/mpeg", "original"
+    if chosen is not None:
+        candidate = transcoder.path(source_key(path), chosen)
+        if os.path.exists(candidate):
+            serve_path, media_type, served = candidate, chosen.media_type, chosen.name
+        else:  # not transcoded (yet, or lost): serve the original meanwhile
+            transcoder.submit(source_key(path), path)
+    return RangeFileResponse(serve_path, request.headers, media_type=media_type, on_close=lambda: cache.unpin(path),
+                             headers={"x-rendition": served, "vary": "Save-Data, Downlink"})
+
+def hls_source(song_id: str) -> str:
+    found = store.get_by_id(song_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Song not cached")
+    if not transcoder.enabled:
+        raise HTTPException(status_code=404, detail="HLS renditions are not enabled")
+    key = source_key(found[1]['path'])
+    if not transcoder.ready(key):
+        transcoder.submit(key, found[1]['path'])
+        raise HTTPException(status_code=503, detail="Transcoding", headers={"Retry-After": "5"})
+    return key
+
+@app.get("/hls/{song_id}/master.m3u8")
+def hls_master(song_id: str):
+    hls_source(song_id)
+    return Response(transcoder.master_playlist(f"/hls/{song_id}"), media_type="application/vnd.apple.mpegurl")
+
+HLS_MEDIA_TYPES = {".m3u8": "application/vnd.apple.mpegurl", ".ts": "video/mp2t", ".m4s": "audio/mp4", ".mp4": "audio/mp4"}
+
+@app.api_route("/hls/{song_id}/{rendition}/{name}", methods=["GET", "HEAD"])
+def hls_file(song_id: str, rendition: str, name: str, request: Request):
+    if transcoder.rendition(rendition) is None or not SEGMENT_PATTERN.match(name):
+        raise HTTPException(status_code=404, detail="Not found")
+    path = os.path.join(transcoder.song_dir(hls_source(song_id)), rendition, name)
+    return RangeFileResponse(path, request.headers, media_type=HLS_MEDIA_TYPES[os.path.splitext(name)[1]])
+
+@app.delete("/cache/{song_id}")
+def delete_song(song_id: str):
+    title = cache.resolve_id(song_id)
+    if title is None or cache.evict(title) is None:
+        raise HTTPException(status_code=404, detail="Song not cached")
+    return {"deleted": song_id, "title": title}
+
+@app.post("/admin/reconcile", status_code=202)
+def start_reconcile():
+    """Start a background pass over index, vector DB and files; poll GET for the report."""
+    started = reconciler.start()
+    return {"started": started, **reconciler.status()}
+
+@app.get("/admin/reconcile")
+def reconcile_status():
+    return reconciler.status()
 
 init_logger() # Initialize logger
 threading.Thread(target=periodic_cleanup, daemon=True).start() # Start Pruning TTL Thread
+threading.Thread(target=quota_eviction, daemon=True).start() # Start Quota Eviction Thread
+threading.Thread(target=index_maintenance, daemon=True).start() # Flush hit counters, checkpoint the WAL
+if WARMUP:
+    threading.Thread(target=warm_up, daemon=True).start() # Load model + vector store off the request path
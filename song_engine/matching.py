@@ -0,0 +1,52 @@
+import re
+
+# Upload-title noise that does not change which song is meant
+NOISE_PATTERN = re.compile(
+    r"\b(official (music |lyric )?video|official audio|lyric video|with lyrics|lyrics|visuali[sz]er|hd|hq|4k)\b"
+)
+
+RERANK_MODES = ("lexical", "none")
+LEXICAL_WEIGHT = 0.5  # share of the blended score taken by token overlap in "lexical" mode
+
+
+def normalize_query(query: str) -> str:
+    """Case-, whitespace-, punctuation- and noise-insensitive form of a query."""
+    base = re.sub(r"\s+", " ", query).strip().lower()
+    text = NOISE_PATTERN.sub(" ", base)
+    text = re.sub(r"[^\w\s]|_", " ", text)
+    text = re.sub(r"\s+", " ", text).strip()
+    return text or base
+
+
+def vector_similarity(distance: float) -> float:
+    """Cosine similarity from a squared L2 distance between unit vectors (Chroma's default metric)."""
+    return min(1.0, max(0.0, 1 - distance / 2))
+
+
+def lexical_score(query_tokens: set, title_tokens: set) -> float:
+    """Dice overlap of artist/title tokens: 1.0 for the same words in any order."""
+    if not query_tokens or not title_tokens:
+        return 0.0
+    return 2 * len(query_tokens & title_tokens) / (len(query_tokens) + len(title_tokens))
+
+
+def rank_candidates(query: str, candidates: list, threshold: float, mode: str = "lexical") -> list:
+    """Score (title, distance) nearest-neighbour candidates; returns (title, score) pairs, best first.
+
+    Only candidates within `threshold` (squared L2 distance) can match, in
+    either mode. "none" keeps the vector order and scores by similarity
+    alone. "lexical" orders them by a blend with token overlap, so a noisy
+    nearest neighbour sharing no words with the query loses to a slightly
+    farther exact-words match. Token overlap only re-orders; it never
+    admits a candidate beyond the threshold.
+    """
+    candidates = [(title, distance) for title, distance in candidates if distance <= threshold]
+    if mode == "none":
+        return [(title, vector_similarity(distance)) for title, distance in candidates]
+    query_tokens = set(normalize_query(query).split())
+    scored = [
+        (title, (1 - LEXICAL_WEIGHT) * vector_similarity(distance)
+         + LEXICAL_WEIGHT * lexical_score(query_tokens, set(normalize_query(title).split())))
+        for title, distance in candidates
+    ]
+    return sorted(scored, key=lambda pair: pair[1], reverse=True)
@@ -0,0 +1,200 @@
+import logging
+import os
+import shutil
+import threading
+import time
+
+
+class Reconciler:
+    """Brings the cache index, the vector collection and the cache directory back in line.
+
+    Three passes, each walking its store in slices of `batch_size` with a
+    short pause in between so serving is never blocked for long:
+
+    - index: rows whose file is gone are evicted, wrong sizes are fixed, and
+      rows missing from the collection get their vector back;
+    - vectors: collection ids with no index row are deleted;
+    - files: finished files with no index row, and staged downloads older
+      than `partial_max_age`, are removed, as are rendition directories
+      (under `renditions_dir`) whose source file is gone.
+
+    The index is the source of truth; the other two are repaired towards it.
+    """
+
+    def __init__(self, cache, cache_dir: str, get_collection, embed_queries, batch_size: int = 500,
+                 pause_seconds: float = 0.05, partial_max_age: float = 900, renditions_dir: str = None):
+        self.cache = cache
+        self.store = cache.store
+        self.cache_dir = cache_dir
+        self.get_collection = get_collection
+        self.embed_queries = embed_queries
+        self.batch_size = batch_size
+        self.pause_seconds = pause_seconds
+        self.partial_max_age = partial_max_age
+        self.renditions_dir = renditions_dir
+        self._lock = threading.Lock()
+        self._running = False
+        self._report = None
+        self._last = None
+
+    def start(self) -> bool:
+        """Run a pass in the background; False if one is already running."""
+        with self._lock:
+            if self._running:
+                return False
+            self._running = True
+        threading.Thread(target=self._run_locked, name="reconcile", daemon=True).start()
+        return True
+
+    def run(self) -> dict:
+        """Run a pass in the calling thread (waiting for any running one) and return its report."""
+        while True:
+            with self._lock:
+                if not self._running:
+                    self._running = True
+                    break
+            time.sleep(self.pause_seconds)
+        return self._run_locked()
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "running": self._running,
+                "progress": dict(self._report) if self._running and self._report else None,
+                "last": self._last,
+            }
+
+    def _run_locked(self) -> dict:
+        report = {
+            "started_at": time.time(),
+            "index_rows_checked": 0,
+            "missing_files_evicted": 0,
+            "sizes_fixed": 0,
+            "vectors_restored": 0,
+            "vectors_checked": 0,
+            "orphan_vectors_deleted": 0,
+            "files_checked": 0,
+            "orphan_files_deleted": 0,
+            "stale_partials_deleted": 0,
+            "orphan_renditions_deleted": 0,
+        }
+        self._report = report
+        try:
+            self._check_index(report)
+            self._check_vectors(report)
+            self._check_files(report)
+            report["status"] = "ok"
+        except Exception as e:
+            logging.error(f"[Reconcile] Error: {e}")
+            report["status"] = "failed"
+            report["error"] = str(e)
+        finally:
+            report["duration_seconds"] = round(time.time() - report["started_at"], 3)
+            with self._lock:
+                self._running = False
+                self._last = report
+        logging.info(f"[ Reconcile ] : {report}")
+        return report
+
+    # ------------------------ Index -----------------------
+    def _check_index(self, report):
+        collection = self.get_collection()
+        after = ""
+        while True:
+            page = self.store.page(after, self.batch_size)
+            if not page:
+                return
+            after = page[-1][0]
+            report["index_rows_checked"] += len(page)
+
+            live = []
+            for query, entry in page:
+                try:
+                    size = os.path.getsize(entry['path'])
+                except FileNotFoundError:
+                    if self.cache.evict(query) is not None:
+                        report["missing_files_evicted"] += 1
+                    continue
+                if size != entry['size']:
+                    self.store.set_size(query, size)
+                    report["sizes_fixed"] += 1
+                live.append((query, entry['id']))
+
+            if live:
+                present = set(collection.get(ids=[song_id for _, song_id in live], include=[])["ids"])
+                missing = [(query, song_id) for query, song_id in live if song_id not in present]
+                if missing:
+                    collection.upsert(
+                        ids=[song_id for _, song_id in missing],
+                        documents=[query for query, _ in missing],
+                        embeddings=self.embed_queries([query for query, _ in missing]),
+                    )
+                    report["vectors_restored"] += len(missing)
+            time.sleep(self.pause_seconds)
+
+    # ----------------------- Vectors ----------------------
+    def _check_vectors(self, report):
+        collection = self.get_collection()
+        offset = 0
+        while True:
+            ids = collection.get(limit=self.batch_size, offset=offset, include=[])["ids"]
+            if not ids:
+                return
+            report["vectors_checked"] += len(ids)
+            orphans = [song_id for song_id in ids if self.store.get_by_id(song_id) is None]
+            if orphans:
+                collection.delete(ids=orphans)
+                report["orphan_vectors_deleted"] += len(orphans)
+            offset += len(ids) - len(orphans)
+            time.sleep(self.pause_seconds)
+
+    # ------------------------ Files -----------------------
+    def _check_files(self, report):
+        batch = []
+        with os.scandir(self.cache_dir) as it:
+            for dirent in it:
+                if dirent.is_file() and dirent.name.endswith((".mp3", ".part")):
+                    batch.append(dirent)
+                    if len(batch) >= self.batch_size:
+                        self._check_file_batch(batch, report)
+                        batch = []
+                        time.sleep(self.pause_seconds)
+        if batch:
+            self._check_file_batch(batch, report)
+        if self.renditions_dir and os.path.isdir(self.renditions_dir):
+            self._check_renditions(report)
+
+    def _check_renditions(self, report):
+        now = time.time()
+        with os.scandir(self.renditions_dir) as it:
+            for dirent in it:
+                if not dirent.is_dir():
+                    continue
+                if dirent.name.endswith(".tmp"):  # a transcode in flight, or killed mid-way
+                    stale = now - dirent.stat().st_mtime > self.partial_max_age
+                else:
+                    stale = self.store.file_info(os.path.join(self.cache_dir, f"{dirent.name}.mp3")) is None
+                if stale:
+                    shutil.rmtree(dirent.path, ignore_errors=True)
+                    report["orphan_renditions_deleted"] += 1
+
+    def _check_file_batch(self, batch, report):
+        report["files_checked"] += len(batch)
+        now = time.time()
+        # Inside a store transaction so no download can be renamed into place while we decide
+        with self.store.transaction():
+            for dirent in batch:
+                if ".part" in dirent.name:  # staged download, in flight or abandoned
+                    try:
+                        if now - dirent.stat().st_mtime > self.partial_max_age:
+                            os.remove(dirent.path)
+                            report["stale_partials_deleted"] += 1
+                    except FileNotFoundError:
+                        pass
+                    continue
+                if self.store.file_info(dirent.path) is None:  # no query references this file
+                    try:
+                        os.remove(dirent.path)
+                        report["orphan_files_deleted"] += 1
+                    except FileNotFoundError:
+                        pass
@@ -0,0 +1,73 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import pytest
+
+ENGINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ENGINE_DIR)
+
+# main keeps its cache, vector store and locks under the working directory and
+# starts its background threads on import, so the session gets a scratch
+# directory and the offline backends before anything imports it.
+os.chdir(tempfile.mkdtemp(prefix="song-engine-tests-"))
+os.environ.update(DOWNLOAD_BACKEND="synthetic", VECTOR_BACKEND="numpy", WARMUP="0", TRANSCODE_LADDER="")
+
+
+class FakeDownloader:
+    """Counts fetches; each one sleeps, then writes `audio` (or raises `error`)."""
+
+    def __init__(self, latency=0.2, audio=b"\xff\xfb\x90\x64" * 64, error=None, resolve=None):
+        self.latency = latency
+        self.audio = audio
+        self.error = error
+        self.resolve_to = resolve
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def resolve(self, query):
+        return self.resolve_to(query) if self.resolve_to else None
+
+    def download(self, query, filename, source_id=None):
+        with self._lock:
+            self.calls.append(query)
+        time.sleep(self.latency)
+        if self.error is not None:
+            raise self.error
+        with open(filename, "wb") as f:
+            f.write(self.audio + query.encode())
+        return filename
+
+
+class FakeCollection:
+    """Just enough of vectors.VectorIndex for the miss path: remembers what was upserted."""
+
+    def __init__(self):
+        self.ids = []
+
+    def upsert(self, ids, embeddings, documents=None):
+        self.ids.extend(ids)
+
+    def delete(self, ids):
+        self.ids = [i for i in self.ids if i not in ids]
+
+
+@pytest.fixture(scope="session")
+def main():
+    import main
+    deadline = time.time() + 10
+    while main.reconciler.status()["last"] is None and time.time() < deadline:
+        time.sleep(0.05)  # let the startup reconcile pass finish before tests touch the cache
+    return main
+
+
+@pytest.fixture
+def downloader(main, monkeypatch):
+    """A counting downloader in place of main's, with no model or vector store behind the miss path."""
+    fake, collection = FakeDownloader(), FakeCollection()
+    monkeypatch.setattr(main, "downloader", fake)
+    monkeypatch.setattr(main, "get_collection", lambda: collection)
+    monkeypatch.setattr(main, "embed_query", lambda query: [0.0])
+    return fake
@@ -0,0 +1,24 @@
+import time
+
+from cache_store import CacheStore
+
+
+def entry(path, size):
+    now = time.time()
+    return {"path": path, "timestamp": now, "id": path, "size": size, "last_access": now, "hits": 0}
+
+
+def test_files_are_refcounted_across_re_puts_and_moves(tmp_path):
+    store = CacheStore(str(tmp_path / "cache.sqlite3"))
+    store.put("a", entry("one.mp3", 5))
+    store.put("b", entry("one.mp3", 5))
+    store.put("a", entry("one.mp3", 7))  # the same query downloaded again
+    store.put("c", entry("two.mp3", 3))
+    store.put("c", entry("one.mp3", 7))  # found to be the same track after all
+    assert store.file_info("one.mp3") == {"size": 7, "refs": 3}
+    assert store.file_info("two.mp3") is None
+    assert store.meta()["files"] == 1 and store.meta()["bytes"] == 7
+    for query in ("a", "b", "c"):
+        store.delete(query)
+    assert store.meta() == {"entries": 0, "files": 0, "bytes": 0, "hits": 0, "misses": 0}
+    store.close()
@@ -0,0 +1,62 @@
+import threading
+import uuid
+
+from downloaders import DownloadError
+
+CALLERS = 100
+
+
+def concurrently(fn, args):
+    """Run fn(arg) for every arg at once; returns (results, errors) in argument order."""
+    barrier = threading.Barrier(len(args))
+    results, errors = [None] * len(args), [None] * len(args)
+
+    def call(i):
+        barrier.wait()
+        try:
+            results[i] = fn(args[i])
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(args))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
+
+
+def test_identical_misses_download_once(main, downloader):
+    query = f"coalesced {uuid.uuid4().hex}"
+    results, errors = concurrently(main.download_once, [query] * CALLERS)
+    assert errors == [None] * CALLERS
+    assert downloader.calls == [query]
+    assert all(r == results[0] for r in results)
+    assert results[0]["title"] == query
+    assert main.downloads.in_flight() == 0
+
+
+def test_failed_download_reaches_every_caller(main, downloader):
+    downloader.error = DownloadError("no search results")
+    query = f"failing {uuid.uuid4().hex}"
+    results, errors = concurrently(main.download_once, [query] * CALLERS)
+    assert len(downloader.calls) == 1
+    assert results == [None] * CALLERS
+    assert isinstance(errors[0], DownloadError)
+    assert all(e is errors[0] for e in errors)
+    assert main.cache.resolve_exact(query) is None
+
+    downloader.error = None  # the failure is not remembered: the next miss tries again
+    assert main.download_once(query)["source"] == "download"
+    assert len(downloader.calls) == 2
+
+
+def test_differently_worded_queries_for_one_track_download_once(main, downloader):
+    track = uuid.uuid4().hex
+    downloader.resolve_to = lambda query: f"syn-{track}"
+    queries = [f"{track} live", f"live {track} (official audio)"]  # not coalesced: different normalized keys
+    results, errors = concurrently(main.download_once, queries)
+    assert errors == [None, None]
+    assert len(downloader.calls) == 1
+    assert results[0]["path"] == results[1]["path"] == main.audio_path(f"syn-{track}")
+    assert sorted(r["source"] for r in results) == ["cache", "download"]
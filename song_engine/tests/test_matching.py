@@ -0,0 +1,37 @@
+import pytest
+
+from matching import rank_candidates
+
+THRESHOLD = 0.7
+
+
+@pytest.mark.parametrize("mode", ["lexical", "none"])
+def test_typo_within_threshold_matches_despite_no_shared_words(mode):
+    ranked = rank_candidates("rhapsdy bohemain", [("Queen - Bohemian Rhapsody", 0.5)], THRESHOLD, mode)
+    assert [title for title, _ in ranked] == ["Queen - Bohemian Rhapsody"]
+
+
+@pytest.mark.parametrize("mode", ["lexical", "none"])
+def test_same_words_beyond_threshold_do_not_match(mode):
+    ranked = rank_candidates("queen bohemian rhapsody", [("Queen - Bohemian Rhapsody (Live)", 0.9)], THRESHOLD, mode)
+    assert ranked == []
+
+
+def test_lexical_overlap_reorders_candidates_within_threshold():
+    candidates = [("Queen - Radio Ga Ga", 0.3), ("Queen - Bohemian Rhapsody", 0.4), ("Bohemian Rhapsody Live", 0.8)]
+    ranked = rank_candidates("bohemian rhapsody queen", candidates, THRESHOLD)
+    assert [title for title, _ in ranked] == ["Queen - Bohemian Rhapsody", "Queen - Radio Ga Ga"]
+    assert [title for title, _ in rank_candidates("bohemian rhapsody queen", candidates, THRESHOLD, "none")] == [
+        "Queen - Radio Ga Ga", "Queen - Bohemian Rhapsody"]
+
+
+def test_match_hit_gates_on_distance(main, downloader):
+    near, far = "Queen - Bohemian Rhapsody", "Queen - Bohemian Rhapsody (Live at Wembley)"
+    ids = {}
+    for title in (near, far):
+        main.download_once(title)
+        ids[title] = main.store.get(title)["id"]
+
+    hit = main.match_hit("rhapsdy bohemain", [ids[near]], [0.5], THRESHOLD, "lexical")
+    assert hit["title"] == near
+    assert main.match_hit("queen bohemian rhapsody live at wembley", [ids[far]], [0.9], THRESHOLD, "lexical") is None
@@ -0,0 +1,14 @@
+import bench
+
+WORKERS = 3
+SONGS = 12
+
+
+def test_workers_sharing_a_cache_download_each_song_once():
+    reports, stored, _ = bench.run_multiproc(WORKERS, SONGS)
+    assert len(reports) == WORKERS
+    assert sum(r["fetched"] for r in reports) == SONGS
+    assert all(r["seen"] == SONGS for r in reports)
+    assert stored == SONGS
+    assert [r["leader"] for r in reports].count(True) == 1
+    assert all(r["prunes"] == 0 for r in reports if not r["leader"])
@@ -0,0 +1,27 @@
+import time
+import uuid
+
+from fastapi.testclient import TestClient
+
+
+def test_playback_is_not_a_lookup(main, downloader):
+    query = f"played {uuid.uuid4().hex}"
+    main.download_once(query)
+    main.store.flush()
+    before, stats = main.store.get(query), main.cache.stats()
+    client = TestClient(main.app)
+    time.sleep(0.01)
+
+    for _ in range(3):
+        response = client.get(f"/stream/{before['id']}")
+        assert response.status_code == 200
+    main.store.flush()
+    after = main.store.get(query)
+    assert after['hits'] == before['hits']
+    assert after['last_access'] > before['last_access']  # still recent for LRU eviction
+    assert (main.cache.stats()['hits'], main.cache.stats()['misses']) == (stats['hits'], stats['misses'])
+
+    assert main.lookup_song(query)['title'] == query
+    main.store.flush()
+    assert main.store.get(query)['hits'] == before['hits'] + 1
+    assert main.cache.stats()['hits'] == stats['hits'] + 1
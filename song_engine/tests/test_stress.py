@@ -0,0 +1,113 @@
+import glob
+import hashlib
+import os
+import random
+import threading
+import time
+
+from cache import SongCache
+from cache_store import CacheStore
+
+DURATION = 2.0
+THREADS = 16
+SONGS = 40
+TRACKS = 15  # several queries alias each track's file
+TTL = 0.3
+PRUNE_SECONDS = 0.05
+
+
+def test_concurrent_traffic_against_aggressive_pruning(tmp_path):
+    """Hits, misses, streams, downloads and deletes while a pruner expires entries every 50 ms."""
+    store = CacheStore(str(tmp_path / "cache.sqlite3"), normalize=str.lower, flush_batch=16)
+    cache = SongCache(store, max_bytes=1 << 40)
+    queries = [f"Artist {i} - Title {i}" for i in range(SONGS)]
+    errors, streamed = [], [0]
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def track_path(query):
+        track = hashlib.md5(str(queries.index(query) % TRACKS).encode()).hexdigest()
+        return str(tmp_path / f"{track}.mp3")
+
+    def add(query):
+        now = time.time()
+        entry = {"path": track_path(query), "timestamp": now, "id": hashlib.md5(query.encode()).hexdigest(),
+                 "last_access": now, "hits": 0}
+        if cache.alias(query, entry) is not None:
+            return
+        staged = f"{entry['path']}.{threading.get_ident()}.part"
+        with open(staged, "wb") as f:
+            f.write(os.urandom(random.randint(1, 4096)))
+        cache.add(query, {**entry, "size": os.path.getsize(staged)}, staged_path=staged)
+
+    def stream(query):
+        pinned = cache.pin(hashlib.md5(query.encode()).hexdigest())
+        if pinned is None:
+            return
+        path = pinned[1]["path"]
+        try:
+            time.sleep(random.random() / 1000)  # let eviction race the open
+            try:
+                with open(path, "rb") as f:
+                    f.read()
+            except FileNotFoundError:
+                raise AssertionError(f"pinned file deleted mid-read: {path}")
+        finally:
+            cache.unpin(path)
+        with lock:
+            streamed[0] += 1
+
+    def worker(seed):
+        rng = random.Random(seed)
+        while not stop.is_set():
+            query = rng.choice(queries)
+            op = rng.random()
+            try:
+                if op < 0.3:
+                    title = cache.resolve_exact(query.upper())
+                    if title is None or cache.hit(title) is None:
+                        cache.miss()
+                elif op < 0.6:
+                    stream(query)
+                elif op < 0.9:
+                    add(query)
+                else:
+                    cache.evict(query)
+            except Exception as e:
+                with lock:
+                    errors.append(f"{type(e).__name__}: {e}")
+
+    def pruner():
+        while not stop.is_set():
+            try:
+                cutoff = time.time() - TTL
+                for query, _ in cache.expired(cutoff):
+                    cache.evict(query, stored_before=cutoff)
+            except Exception as e:
+                with lock:
+                    errors.append(f"prune {type(e).__name__}: {e}")
+            time.sleep(PRUNE_SECONDS)
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(THREADS)]
+    threads.append(threading.Thread(target=pruner))
+    for t in threads:
+        t.start()
+    time.sleep(DURATION)
+    stop.set()
+    for t in threads:
+        t.join()
+    store.flush()
+
+    assert errors == []
+    assert streamed[0] > 0
+    assert cache.stats()["pinned"] == 0
+    entries = store.load_all()
+    paths = {entry["path"] for entry in entries.values()}
+    for path in paths:
+        info = store.file_info(path)
+        assert info["refs"] == sum(1 for entry in entries.values() if entry["path"] == path)
+        assert info["size"] == os.path.getsize(path)
+    assert cache.bytes == sum(store.file_info(path)["size"] for path in paths)
+    assert len(cache) == len(entries)
+    assert set(glob.glob(str(tmp_path / "*.mp3"))) == paths  # evicted files went with their last pin
+    store.close()
@@ -0,0 +1,173 @@
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# codec -> (ffmpeg encoder, file extension, media type, HLS segment type, RFC 6381 codec string)
+CODECS = {
+    "mp3": ("libmp3lame", "mp3", "audio/mpeg", "mpegts", "mp4a.40.34"),
+    "opus": ("libopus", "opus", "audio/ogg", "fmp4", "opus"),
+}
+RENDITION_PATTERN = re.compile(r"^(mp3|opus)-(\d+)$")
+SEGMENT_PATTERN = re.compile(r"^(index\.m3u8|init\.mp4|seg_\d{4}\.(ts|m4s))$")
+
+
+class Rendition:
+    """One rung of the ladder, named "<codec>-<kbps>" (e.g. "mp3-64", "opus-96")."""
+
+    def __init__(self, name: str):
+        m = RENDITION_PATTERN.match(name)
+        if not m:
+            raise ValueError(f"rendition must look like 'mp3-128' or 'opus-96', got {name!r}")
+        self.name = name
+        self.codec = m.group(1)
+        self.kbps = int(m.group(2))
+        self.encoder, self.ext, self.media_type, self.segment_type, self.codec_string = CODECS[self.codec]
+
+    @property
+    def filename(self) -> str:
+        return f"{self.name}.{self.ext}"
+
+    def __repr__(self):
+        return f"Rendition({self.name!r})"
+
+
+def parse_ladder(spec: str) -> list:
+    """"mp3-64,mp3-128,opus-96" -> renditions, lowest bitrate first."""
+    return sorted((Rendition(name.strip()) for name in spec.split(",") if name.strip()), key=lambda r: r.kbps)
+
+
+def transcode_song(source: str, out_dir: str, ladder: list, segment_seconds: int):
+    """Encode `source` into every rendition plus an HLS playlist each; runs in a pool process.
+
+    Everything is written to a temporary sibling directory that replaces
+    `out_dir` in one rename, so readers see either no renditions or all.
+    """
+    work_dir = f"{out_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(work_dir, ignore_errors=True)
+    os.makedirs(work_dir)
+    try:
+        for name in ladder:
+            rendition = Rendition(name)
+            encoded = os.path.join(work_dir, rendition.filename)
+            _ffmpeg("-i", source, "-vn", "-map_metadata", "-1", "-c:a", rendition.encoder,
+                    "-b:a", f"{rendition.kbps}k", encoded)
+            hls_dir = os.path.join(work_dir, rendition.name)
+            os.makedirs(hls_dir)
+            segment_ext = "ts" if rendition.segment_type == "mpegts" else "m4s"
+            _ffmpeg("-i", encoded, "-c", "copy", "-f", "hls", "-hls_time", str(segment_seconds),
+                    "-hls_playlist_type", "vod", "-hls_segment_type", rendition.segment_type,
+                    "-hls_segment_filename", os.path.join(hls_dir, f"seg_%04d.{segment_ext}"),
+                    os.path.join(hls_dir, "index.m3u8"))
+        if os.path.isdir(out_dir):
+            shutil.rmtree(out_dir)
+        os.replace(work_dir, out_dir)
+    except BaseException:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise
+    return out_dir
+
+
+def _ffmpeg(*args):
+    result = subprocess.run(["ffmpeg", "-y", "-v", "error", *args], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr.strip()[-500:]}")
+
+
+class Transcoder:
+    """Builds the rendition ladder for stored songs on a process pool, off the request path.
+
+    Renditions of `<source_key>.mp3` live in `<root>/<source_key>/`: one
+    progressive file per rendition and an HLS directory with its playlist
+    and segments. Submissions for a key already being transcoded are folded
+    into the running job. `on_done(seconds, error)` is called as each job
+    finishes, with the time from submission.
+    """
+
+    def __init__(self, root: str, ladder: list, workers: int = 2, segment_seconds: int = 6, on_done=None):
+        self.root = root
+        self.ladder = ladder
+        self.segment_seconds = segment_seconds
+        self.on_done = on_done
+        self.enabled = bool(ladder) and shutil.which("ffmpeg") is not None
+        self._pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")  # never fork a threaded server
+        ) if self.enabled else None
+        self._lock = threading.Lock()
+        self._pending = {}  # source key -> future
+        os.makedirs(root, exist_ok=True)
+        if ladder and not self.enabled:
+            logging.error("[Transcode] ffmpeg not found; serving original files only")
+
+    def rendition(self, name: str):
+        for rendition in self.ladder:
+            if rendition.name == name:
+                return rendition
+        return None
+
+    def song_dir(self, source_key: str) -> str:
+        return os.path.join(self.root, source_key)
+
+    def path(self, source_key: str, rendition: Rendition) -> str:
+        return os.path.join(self.song_dir(source_key), rendition.filename)
+
+    def ready(self, source_key: str) -> bool:
+        return os.path.isdir(self.song_dir(source_key))
+
+    def submit(self, source_key: str, source_path: str):
+        """Queue the ladder for one stored file; returns the job's future, or None when disabled."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            future = self._pending.get(source_key)
+            if future is not None:
+                return future
+            future = self._pool.submit(transcode_song, source_path, self.song_dir(source_key),
+                                       [r.name for r in self.ladder], self.segment_seconds)
+            self._pending[source_key] = future
+        submitted = time.perf_counter()
+        future.add_done_callback(lambda f: self._finished(source_key, f, time.perf_counter() - submitted))
+        return future
+
+    def _finished(self, source_key: str, future, seconds: float):
+        with self._lock:
+            self._pending.pop(source_key, None)
+        if self.on_done is not None:
+            self.on_done(seconds, future.exception())
+        if future.exception() is not None:
+            logging.error(f"[Transcode] {source_key}: {future.exception()}")
+        else:
+            logging.info(f"[ Transcode ] : {source_key} -> {', '.join(r.name for r in self.ladder)}")
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def remove(self, source_key: str):
+        shutil.rmtree(self.song_dir(source_key), ignore_errors=True)
+
+    def choose(self, requested: str = None, save_data: bool = False, downlink_mbps: float = None):
+        """Pick a rendition: an explicit name wins, then client hints; None means the original file."""
+        if requested:
+            return self.rendition(requested)
+        if not self.ladder:
+            return None
+        if save_data:
+            return self.ladder[0]
+        if downlink_mbps is not None:
+            budget_kbps = downlink_mbps * 1000 / 2  # leave headroom for the rest of the page
+            fitting = [r for r in self.ladder if r.kbps <= budget_kbps]
+            return fitting[-1] if fitting else self.ladder[0]
+        return None
+
+    def master_playlist(self, base_url: str) -> str:
+        lines = ["#EXTM3U", "#EXT-X-VERSION:7"]
+        for rendition in self.ladder:
+            lines.append(f'#EXT-X-STREAM-INF:BANDWIDTH={rendition.kbps * 1000},CODECS="{rendition.codec_string}"')
+            lines.append(f"{base_url}/{rendition.name}/index.m3u8")
+        return "\n".join(lines) + "\n"
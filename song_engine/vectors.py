@@ -0,0 +1,242 @@
+import os
+import sqlite3
+import threading
+import zlib
+
+import numpy as np
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS vectors (
+    slot     INTEGER PRIMARY KEY,
+    id       TEXT UNIQUE,          -- NULL once deleted; the slot is then reused
+    document TEXT,
+    seq      INTEGER NOT NULL      -- bumped on every change, so other processes can catch up
+);
+CREATE INDEX IF NOT EXISTS idx_vectors_seq ON vectors (seq);
+CREATE TABLE IF NOT EXISTS vector_meta (
+    id  INTEGER PRIMARY KEY CHECK (id = 1),
+    dim INTEGER NOT NULL
+);
+"""
+
+GROW_ROWS = 4096  # minimum number of rows the matrix file grows by
+
+
+class VectorIndex:
+    """The slice of the Chroma collection API the engine uses.
+
+    A chromadb collection satisfies it as-is; NumpyVectorIndex is the
+    in-process alternative. Distances are squared L2, as in Chroma's default
+    space, so thresholds carry over between backends.
+    """
+
+    def upsert(self, ids: list, embeddings: list, documents: list = None):
+        raise NotImplementedError
+
+    def add(self, ids: list, embeddings: list, documents: list = None):
+        self.upsert(ids=ids, embeddings=embeddings, documents=documents)
+
+    def delete(self, ids: list):
+        raise NotImplementedError
+
+    def query(self, query_embeddings: list, n_results: int = 1, include=None) -> dict:
+        raise NotImplementedError
+
+    def get(self, ids: list = None, limit: int = None, offset: int = None, include=None) -> dict:
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+
+class NumpyVectorIndex(VectorIndex):
+    """Exact nearest-neighbour search over a memory-mapped float32 matrix.
+
+    Embeddings are normalized and written in place into `vectors.f32`, one
+    row per slot. The id <-> slot map lives in a small SQLite table, so each
+    add or delete persists one row and one matrix row, with no full
+    rewrites. A query is a single matrix product, which at the engine's
+    scale (short strings, up to ~1M songs) beats an approximate index on
+    both memory and warm-up.
+
+    Several worker processes can share a directory. Writes go through
+    SQLite's write lock and the shared mapping, and every reader replays
+    rows with a newer `seq` before answering.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        self.matrix_path = os.path.join(path, "vectors.f32")
+        self._db = sqlite3.connect(os.path.join(path, "vectors.sqlite3"), timeout=30,
+                                   isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._lock = threading.RLock()
+        self.dim = None
+        self._matrix = None  # (capacity, dim) memmap
+        self._valid = np.zeros(0, dtype=bool)
+        self._ids = []  # slot -> id (None if free)
+        self._slot_of = {}
+        self._seq = 0
+        with self._lock:
+            self._refresh()
+
+    # ----------------------- Sync -------------------------
+    def _refresh(self):
+        """Apply changes committed since we last looked (by us or another process)."""
+        if self.dim is None:
+            row = self._db.execute("SELECT dim FROM vector_meta WHERE id = 1").fetchone()
+            if row is None:
+                return
+            self.dim = row[0]
+        rows = self._db.execute(
+            "SELECT slot, id, seq FROM vectors WHERE seq > ? ORDER BY seq", (self._seq,)
+        ).fetchall()
+        if not rows:
+            return
+        self._ensure_mapped(max(slot for slot, _, _ in rows) + 1)
+        for slot, song_id, seq in rows:
+            old = self._ids[slot]
+            if old is not None and self._slot_of.get(old) == slot:
+                del self._slot_of[old]
+            self._ids[slot] = song_id
+            self._valid[slot] = song_id is not None
+            if song_id is not None:
+                self._slot_of[song_id] = slot
+            self._seq = seq
+
+    def _ensure_mapped(self, rows: int):
+        capacity = len(self._ids)
+        if rows <= capacity:
+            return
+        row_bytes = self.dim * 4
+        file_rows = os.path.getsize(self.matrix_path) // row_bytes if os.path.exists(self.matrix_path) else 0
+        if file_rows < rows:
+            file_rows = max(rows, file_rows * 2, GROW_ROWS)
+            with open(self.matrix_path, "ab") as f:
+                f.truncate(file_rows * row_bytes)
+        self._matrix = np.memmap(self.matrix_path, dtype=np.float32, mode="r+", shape=(file_rows, self.dim))
+        self._ids.extend([None] * (file_rows - capacity))
+        self._valid = np.concatenate([self._valid, np.zeros(file_rows - capacity, dtype=bool)])
+
+    # ----------------------- Writes -----------------------
+    def upsert(self, ids: list, embeddings: list, documents: list = None):
+        vectors = _normalized(embeddings)
+        documents = documents if documents is not None else [None] * len(ids)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if self.dim is None:
+                    self._db.execute("INSERT OR IGNORE INTO vector_meta (id, dim) VALUES (1, ?)", (vectors.shape[1],))
+                    self.dim = self._db.execute("SELECT dim FROM vector_meta WHERE id = 1").fetchone()[0]
+                if vectors.shape[1] != self.dim:
+                    raise ValueError(f"embedding dimension {vectors.shape[1]} != index dimension {self.dim}")
+                self._refresh()
+                seq = self._db.execute("SELECT COALESCE(MAX(seq), 0) FROM vectors").fetchone()[0]
+                free = [row[0] for row in self._db.execute(
+                    "SELECT slot FROM vectors WHERE id IS NULL ORDER BY slot LIMIT ?", (len(ids),))]
+                next_slot = self._db.execute("SELECT COALESCE(MAX(slot), -1) + 1 FROM vectors").fetchone()[0]
+                placed, assigned = [], {}
+                for song_id, vector, document in zip(ids, vectors, documents):
+                    slot = assigned.get(song_id, self._slot_of.get(song_id))
+                    if slot is None:
+                        slot = free.pop(0) if free else next_slot
+                        next_slot = max(next_slot, slot + 1)
+                    assigned[song_id] = slot
+                    seq += 1
+                    self._db.execute(
+                        "INSERT INTO vectors (slot, id, document, seq) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT (slot) DO UPDATE SET id = excluded.id, document = excluded.document, "
+                        "seq = excluded.seq",
+                        (slot, song_id, document, seq),
+                    )
+                    placed.append((slot, vector))
+                self._ensure_mapped(next_slot)
+                for slot, vector in placed:
+                    self._matrix[slot] = vector
+                self._matrix.flush()  # vectors reach the file before the rows pointing at them commit
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._refresh()
+
+    def delete(self, ids: list):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                seq = self._db.execute("SELECT COALESCE(MAX(seq), 0) FROM vectors").fetchone()[0]
+                for song_id in ids:
+                    seq += 1
+                    self._db.execute("UPDATE vectors SET id = NULL, document = NULL, seq = ? WHERE id = ?",
+                                     (seq, song_id))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._refresh()
+
+    # ------------------------ Reads -----------------------
+    def query(self, query_embeddings: list, n_results: int = 1, include=None) -> dict:
+        with self._lock:
+            self._refresh()
+            matrix, valid, ids = self._matrix, self._valid, self._ids
+        n = int(valid.sum()) if matrix is not None else 0
+        if n == 0:
+            return {"ids": [[] for _ in query_embeddings], "distances": [[] for _ in query_embeddings]}
+
+        k = min(n_results, n)
+        used = len(valid) - int(np.argmax(valid[::-1]))  # rows up to the last live slot
+        sims = _normalized(query_embeddings) @ matrix[:used].T  # (queries, used)
+        sims[:, ~valid[:used]] = -np.inf
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        out = {"ids": [], "distances": []}
+        for row, candidates in zip(sims, top):
+            order = candidates[np.argsort(-row[candidates])]
+            out["ids"].append([ids[slot] for slot in order])
+            out["distances"].append([float(max(0.0, 2 - 2 * row[slot])) for slot in order])
+        return out
+
+    def get(self, ids: list = None, limit: int = None, offset: int = None, include=None) -> dict:
+        with self._lock:
+            self._refresh()
+            if ids is not None:
+                return {"ids": [song_id for song_id in ids if song_id in self._slot_of]}
+            live = [song_id for song_id in self._ids if song_id is not None]
+        start = offset or 0
+        return {"ids": live[start:start + limit] if limit is not None else live[start:]}
+
+    def count(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._slot_of)
+
+
+class HashedEmbedder:
+    """Offline stand-in for the sentence-transformers model: hashed character trigrams.
+
+    Same `encode(texts)` interface and output shape. Texts sharing most of
+    their trigrams land close together and unrelated ones near-orthogonal,
+    which is enough for load tests and tests to exercise vector hits and
+    misses without downloading a model.
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def encode(self, texts) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            padded = f"  {' '.join(str(text).lower().split())} "
+            for i in range(len(padded) - 2):
+                h = zlib.crc32(padded[i:i + 3].encode())
+                out[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        return _normalized(out)
+
+
+def _normalized(embeddings) -> np.ndarray:
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
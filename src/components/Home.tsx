@@ -8,7 +8,8 @@ interface Playlist {
   id: number;
   name: string;
   cover_image?: string;
-  songs: Song[];
+  song_count: number;
+  preview: Song[];
 }
 
 const Skeleton = () => (
@@ -34,7 +35,7 @@ const PlaylistCard = ({ playlist }: { playlist: Playlist }) => (
       />
     </div>
     <h3 className="font-semibold text-white mb-1 truncate">{playlist.name}</h3>
-    <p className="text-sm text-neutral-400 truncate">{playlist.songs.length} songs</p>
+    <p className="text-sm text-neutral-400 truncate">{playlist.song_count} songs</p>
   </motion.div>
 );
 
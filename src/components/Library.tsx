@@ -1,4 +1,4 @@
-import { useQuery } from '@tanstack/react-query';
+import { useQuery, useInfiniteQuery } from '@tanstack/react-query';
 import { API_BASE_URL } from '../config';
 import SongList, { Song } from './SongList';
 import { useState } from 'react';
@@ -8,7 +8,8 @@ interface Playlist {
   id: number;
   name: string;
   cover_image?: string;
-  songs: Song[];
+  song_count: number;
+  preview: Song[];
 }
 
 const Skeleton = () => (
@@ -34,7 +35,7 @@ const PlaylistCard = ({ playlist }: { playlist: Playlist }) => (
       />
     </div>
     <h3 className="font-semibold text-white mb-1 truncate">{playlist.name}</h3>
-    <p className="text-sm text-neutral-400 truncate">{playlist.songs.length} songs</p>
+    <p className="text-sm text-neutral-400 truncate">{playlist.song_count} songs</p>
   </motion.div>
 );
 
@@ -46,16 +47,17 @@ const getAuthHeaders = () => {
 const Library = () => {
   const [tab, setTab] = useState<'all' | 'playlists' | 'liked'>('all');
   const [allSongsPage, setAllSongsPage] = useState(1);
+  // Pages are cursor links from the API (next/previous); null is the first page
+  const [allSongsUrl, setAllSongsUrl] = useState<string | null>(null);
   const [allSongsSearch, setAllSongsSearch] = useState('');
 
   // All Songs
   const { data: allSongsData, isLoading: allSongsLoading, error: allSongsError, refetch: refetchAllSongs } = useQuery({
-    queryKey: ['all-songs', allSongsPage, allSongsSearch],
+    queryKey: ['all-songs', allSongsUrl, allSongsSearch],
     queryFn: async () => {
       const params = new URLSearchParams();
-      params.append('page', String(allSongsPage));
       if (allSongsSearch) params.append('search', allSongsSearch);
-      const res = await fetch(`${API_BASE_URL}/api/auth/songs/?${params.toString()}`, {
+      const res = await fetch(allSongsUrl ?? `${API_BASE_URL}/api/auth/songs/?${params.toString()}`, {
         headers: getAuthHeaders(),
       });
       if (!res.ok) throw new Error('Failed to fetch all songs');
@@ -76,16 +78,22 @@ const Library = () => {
   });
 
   // Liked Songs
-  const { data: likedData, isLoading: likedLoading, error: likedError, refetch: refetchLiked } = useQuery({
+  const {
+    data: likedPages, isLoading: likedLoading, error: likedError, refetch: refetchLiked,
+    fetchNextPage: fetchMoreLiked, hasNextPage: hasMoreLiked, isFetchingNextPage: fetchingMoreLiked,
+  } = useInfiniteQuery({
     queryKey: ['liked-songs-list'],
-    queryFn: async () => {
-      const res = await fetch(`${API_BASE_URL}/api/auth/liked-songs/`, {
+    queryFn: async ({ pageParam }) => {
+      const res = await fetch(pageParam ?? `${API_BASE_URL}/api/auth/liked-songs/`, {
         headers: getAuthHeaders(),
       });
       if (!res.ok) throw new Error('Failed to fetch liked songs');
       return res.json();
     },
+    initialPageParam: null as string | null,
+    getNextPageParam: (lastPage: { next: string | null }) => lastPage.next,
   });
+  const likedData = likedPages?.pages.flatMap(page => page.results);
 
   return (
     <motion.div
@@ -127,7 +135,7 @@ const Library = () => {
                 className="w-full max-w-xs px-3 py-2 rounded bg-neutral-800 text-white placeholder:text-neutral-400 focus:outline-none focus:ring-2 focus:ring-spotify-green"
                 placeholder="Search songs..."
                 value={allSongsSearch}
-                onChange={e => { setAllSongsSearch(e.target.value); setAllSongsPage(1); }}
+                onChange={e => { setAllSongsSearch(e.target.value); setAllSongsUrl(null); setAllSongsPage(1); }}
               />
             </div>
             {allSongsLoading && (
@@ -147,13 +155,13 @@ const Library = () => {
                   <div className="flex justify-center items-center gap-4 mt-6">
                     <button
                       className="px-4 py-2 rounded bg-neutral-800 text-white disabled:opacity-50"
-                      onClick={() => setAllSongsPage(p => Math.max(1, p - 1))}
+                      onClick={() => { setAllSongsUrl(allSongsData.previous); setAllSongsPage(p => Math.max(1, p - 1)); }}
                       disabled={!allSongsData.previous}
                     >Previous</button>
                     <span className="text-neutral-400">Page {allSongsPage}</span>
                     <button
                       className="px-4 py-2 rounded bg-neutral-800 text-white disabled:opacity-50"
-                      onClick={() => setAllSongsPage(p => p + 1)}
+                      onClick={() => { setAllSongsUrl(allSongsData.next); setAllSongsPage(p => p + 1); }}
                       disabled={!allSongsData.next}
                     >Next</button>
                   </div>
@@ -211,7 +219,18 @@ const Library = () => {
             )}
             {likedData && (
               likedData.filter((item: { song: Song }) => item.song).length > 0 ? (
-                <SongList songs={likedData.filter((item: { song: Song }) => item.song).map((item: { song: Song }) => item.song)} />
+                <>
+                  <SongList songs={likedData.filter((item: { song: Song }) => item.song).map((item: { song: Song }) => item.song)} />
+                  {hasMoreLiked && (
+                    <div className="flex justify-center mt-6">
+                      <button
+                        className="px-4 py-2 rounded bg-neutral-800 text-white disabled:opacity-50"
+                        onClick={() => fetchMoreLiked()}
+                        disabled={fetchingMoreLiked}
+                      >Load more</button>
+                    </div>
+                  )}
+                </>
               ) : (
                 <div className="text-neutral-400 text-center py-12">No liked songs yet. Like some songs to see them here!</div>
               )
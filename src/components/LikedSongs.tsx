@@ -1,11 +1,12 @@
-import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
+import { useInfiniteQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import { API_BASE_URL } from '../config';
 import SongList, { Song } from './SongList';
 import { motion, AnimatePresence } from 'framer-motion';
 
-const fetchLikedSongs = async () => {
+// One page of liked songs; `url` is the API's next link, or null for the first page
+const fetchLikedSongs = async ({ pageParam: url }: { pageParam: string | null }) => {
   const token = localStorage.getItem('access_token');
-  const res = await fetch(`${API_BASE_URL}/api/auth/liked-songs/`, {
+  const res = await fetch(url ?? `${API_BASE_URL}/api/auth/liked-songs/`, {
     headers: { 'Authorization': `Bearer ${token}` },
   });
   if (!res.ok) throw new Error('Failed to fetch liked songs');
@@ -32,11 +33,14 @@ const Skeleton = () => (
 
 const LikedSongs = () => {
   const queryClient = useQueryClient();
-  type LikedSongResponse = { song: Song }[];
-  const { data, isLoading, error } = useQuery<LikedSongResponse>({
+  type LikedSongPage = { next: string | null; results: { song: Song }[] };
+  const { data: pages, isLoading, error, fetchNextPage, hasNextPage, isFetchingNextPage } = useInfiniteQuery({
     queryKey: ['liked-songs-list'],
     queryFn: fetchLikedSongs,
+    initialPageParam: null as string | null,
+    getNextPageParam: (lastPage: LikedSongPage) => lastPage.next,
   });
+  const data = pages?.pages.flatMap(page => page.results);
   const mutation = useMutation({
     mutationFn: unlikeSong,
     onSuccess: () => queryClient.invalidateQueries({ queryKey: ['liked-songs-list'] }),
@@ -68,6 +72,15 @@ const LikedSongs = () => {
       </AnimatePresence>
       {error && <div className="text-red-500">Failed to load liked songs.</div>}
       <SongList songs={songs} />
+      {hasNextPage && (
+        <div className="flex justify-center mt-6">
+          <button
+            className="px-4 py-2 rounded bg-neutral-800 text-white disabled:opacity-50"
+            onClick={() => fetchNextPage()}
+            disabled={isFetchingNextPage}
+          >Load more</button>
+        </div>
+      )}
     </motion.div>
   );
 };
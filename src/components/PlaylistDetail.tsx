@@ -52,8 +52,9 @@ const addSongToPlaylist = async ({ playlistId, songId }: { playlistId: string, s
   return res.json();
 };
 
-const fetchSongs = async (page: number) => {
-  const res = await fetch(`${API_BASE_URL}/api/auth/songs/?page=${page}`, {
+// `url` is a next/previous link from the API, or null for the first page
+const fetchSongs = async (url: string | null) => {
+  const res = await fetch(url ?? `${API_BASE_URL}/api/auth/songs/`, {
     headers: getAuthHeaders(),
   });
   if (!res.ok) throw new Error('Failed to fetch songs');
@@ -105,9 +106,10 @@ const PlaylistDetail = () => {
   });
   const [showAddModal, setShowAddModal] = useState(false);
   const [songPage, setSongPage] = useState(1);
+  const [songPageUrl, setSongPageUrl] = useState<string | null>(null);
   const { data: songData, isLoading: isSongsLoading } = useQuery({
-    queryKey: ['all-songs', songPage],
-    queryFn: () => fetchSongs(songPage),
+    queryKey: ['all-songs', songPageUrl],
+    queryFn: () => fetchSongs(songPageUrl),
     enabled: showAddModal,
   });
   const [inviteEmail, setInviteEmail] = useState('');
@@ -339,13 +341,13 @@ const PlaylistDetail = () => {
                         <div className="space-x-2">
                           <button
                             className="px-3 py-1 rounded bg-neutral-700 text-white hover:bg-neutral-600"
-                            onClick={() => setSongPage((p) => Math.max(1, p - 1))}
-                            disabled={songPage === 1}
+                            onClick={() => { setSongPageUrl(songData.previous); setSongPage((p) => Math.max(1, p - 1)); }}
+                            disabled={!songData.previous}
                           >Prev</button>
                           <span className="text-white">Page {songPage}</span>
                           <button
                             className="px-3 py-1 rounded bg-neutral-700 text-white hover:bg-neutral-600"
-                            onClick={() => setSongPage((p) => p + 1)}
+                            onClick={() => { setSongPageUrl(songData.next); setSongPage((p) => p + 1); }}
                             disabled={!songData.next}
                           >Next</button>
                         </div>
@@ -20,6 +20,23 @@ const fetchPlaylists = async () => {
   return res.json();
 };
 
+// A playlist's full track list, page by page (listings only carry a preview)
+const fetchPlaylistSongs = async (playlistId: number) => {
+  const token = localStorage.getItem('access_token');
+  const songs: Song[] = [];
+  let url: string | null = `${API_BASE_URL}/api/auth/playlists/${playlistId}/songs/?page_size=50`;
+  while (url) {
+    const res = await fetch(url, {
+      headers: { 'Authorization': `Bearer ${token}` },
+    });
+    if (!res.ok) throw new Error('Failed to fetch playlist songs');
+    const page = await res.json();
+    songs.push(...page.results);
+    url = page.next;
+  }
+  return songs;
+};
+
 const createPlaylist = async ({ name }: { name: string }) => {
   const token = localStorage.getItem('access_token');
   const res = await fetch(`${API_BASE_URL}/api/auth/playlists/`, {
@@ -38,7 +55,8 @@ interface Playlist {
   id: number;
   name: string;
   cover_image?: string;
-  songs: Song[];
+  song_count: number;
+  preview: Song[];
 }
 
 const Playlists = () => {
@@ -74,16 +92,6 @@ const Playlists = () => {
       {error && <div className="text-red-500">Failed to load playlists.</div>}
       <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-3 xl:grid-cols-4 gap-6">
         {playlists && playlists.map((playlist: Playlist) => {
-          // Convert playlist.songs to Track[] for the player
-          const tracks = playlist.songs.map(song => ({
-            id: String(song.id),
-            title: song.title,
-            artist: song.artist,
-            album: song.album,
-            duration: String(song.duration),
-            cover: song.cover_image || '',
-            file: song.file,
-          }));
           return (
             <div
               key={playlist.id}
@@ -98,8 +106,19 @@ const Playlists = () => {
                 />
                 <button
                   className="absolute bottom-4 right-4 bg-spotify-green text-black rounded-full p-4 shadow-xl opacity-0 group-hover:opacity-100 scale-90 group-hover:scale-110 transition-all duration-200 z-10 hover:scale-125 hover:shadow-2xl"
-                  onClick={e => {
+                  onClick={async e => {
                     e.stopPropagation();
+                    if (playlist.song_count === 0) return;
+                    // Convert the playlist's songs to Track[] for the player
+                    const tracks = (await fetchPlaylistSongs(playlist.id)).map(song => ({
+                      id: String(song.id),
+                      title: song.title,
+                      artist: song.artist,
+                      album: song.album,
+                      duration: String(song.duration),
+                      cover: song.cover_image || '',
+                      file: song.file,
+                    }));
                     if (tracks.length > 0) {
                       setQueue(tracks, 0);
                       playTrack(tracks[0], tracks, 0);
@@ -114,7 +133,7 @@ const Playlists = () => {
               </div>
               <div className="w-full flex flex-col items-center px-2 py-4">
                 <h2 className="text-base font-bold text-white mb-1 truncate w-full text-center group-hover:text-spotify-green transition-colors">{playlist.name}</h2>
-                <p className="text-xs text-neutral-400 mb-0.5">{playlist.songs.length} song{playlist.songs.length === 1 ? '' : 's'}</p>
+                <p className="text-xs text-neutral-400 mb-0.5">{playlist.song_count} song{playlist.song_count === 1 ? '' : 's'}</p>
               </div>
             </div>
           );
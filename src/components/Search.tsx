@@ -2,16 +2,28 @@ import { useState, useEffect } from 'react';
 import { Search as SearchIcon, Play, Pause, Clock, ListMusic } from 'lucide-react';
 import { usePlayer } from '../contexts/PlayerContext';
 import { useLocation } from 'react-router-dom';
-import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
+import { useQuery, useInfiniteQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import { API_BASE_URL } from '../config';
 import { motion, AnimatePresence } from 'framer-motion';
 import SongList, { Song } from './SongList';
+import { useDebounce } from '../hooks/use-debounce';
 
 interface Playlist {
   id: number;
   name: string;
   cover_image?: string;
-  songs: Song[];
+  song_count: number;
+  preview: Song[];
+}
+
+// One page of /search/: songs and playlists are paged independently by their own cursors
+interface SearchPage {
+  songs?: Song[];
+  songs_next: string | null;
+  songs_previous: string | null;
+  playlists?: Playlist[];
+  playlists_next: string | null;
+  playlists_previous: string | null;
 }
 
 function getFullUrl(path?: string) {
@@ -29,29 +41,54 @@ const Skeleton = () => (
   />
 );
 
+const SUGGEST_DELAY_MS = 200;
+
 const getAuthHeaders = () => {
   const token = localStorage.getItem('access_token');
   return token ? { 'Authorization': `Bearer ${token}` } : {};
 };
 
 const Search = () => {
-  const [searchQuery, setSearchQuery] = useState('');
+  const [inputValue, setInputValue] = useState('');
+  const [searchQuery, setSearchQuery] = useState(''); // the submitted query: full search runs only on this
+  const [showSuggestions, setShowSuggestions] = useState(false);
+  const typed = useDebounce(inputValue.trim(), SUGGEST_DELAY_MS);
   const { setCurrentTrack, togglePlay, currentTrack, isPlaying } = usePlayer();
   const location = useLocation();
   const queryClient = useQueryClient();
-  const [songPage, setSongPage] = useState(1);
   const [artistFilter, setArtistFilter] = useState('');
   const [albumFilter, setAlbumFilter] = useState('');
-  const SONGS_PER_PAGE = 12;
 
   useEffect(() => {
     const params = new URLSearchParams(location.search);
     const query = params.get('q');
     if (query) {
+      setInputValue(query);
       setSearchQuery(query);
     }
   }, [location.search]);
 
+  const submitSearch = (query: string) => {
+    setInputValue(query);
+    setSearchQuery(query.trim());
+    setShowSuggestions(false);
+  };
+
+  // Type-ahead: cheap in-memory suggestions while typing, debounced
+  const { data: suggestData } = useQuery<{ suggestions: string[] }>({
+    queryKey: ['suggest', typed],
+    queryFn: async () => {
+      const res = await fetch(`${API_BASE_URL}/api/auth/suggest/?q=${encodeURIComponent(typed)}`, {
+        headers: getAuthHeaders(),
+      });
+      if (!res.ok) throw new Error('Failed to fetch suggestions');
+      return res.json();
+    },
+    enabled: showSuggestions && !!typed,
+    staleTime: 60 * 1000,
+  });
+  const suggestionList = showSuggestions && typed ? suggestData?.suggestions ?? [] : [];
+
   // Recent searches
   const { data: recentData, refetch: refetchRecent } = useQuery({
     queryKey: ['recent-search'],
@@ -79,19 +116,45 @@ const Search = () => {
     },
   });
 
-  // Unified search (songs + playlists)
-  const { data: searchData, isLoading, error, refetch } = useQuery<{ songs: Song[]; playlists: Playlist[] }>({
-    queryKey: ['search', searchQuery],
-    queryFn: async () => {
-      const url = `${API_BASE_URL}/api/auth/search/?q=${encodeURIComponent(searchQuery)}`;
-      const res = await fetch(url, {
-        headers: getAuthHeaders(),
-      });
-      if (!res.ok) throw new Error('Failed to fetch search results');
-      return res.json();
-    },
+  // Unified search (songs + playlists), run when a query is submitted. The server
+  // pages songs and playlists side by side, each with its own cursor links, so each
+  // section loads more by following its own link. Pages are cached by URL, so the
+  // first page is fetched once and shared by both sections.
+  const fetchSearchPage = ({ pageParam: url }: { pageParam: string | null }) => {
+    const pageUrl = url ?? `${API_BASE_URL}/api/auth/search/?q=${encodeURIComponent(searchQuery)}`;
+    return queryClient.fetchQuery<SearchPage>({
+      queryKey: ['search-page', pageUrl],
+      queryFn: async () => {
+        const res = await fetch(pageUrl, {
+          headers: getAuthHeaders(),
+        });
+        if (!res.ok) throw new Error('Failed to fetch search results');
+        return res.json();
+      },
+    });
+  };
+  const {
+    data: songPages, isLoading, error, refetch,
+    fetchNextPage: fetchMoreSongs, hasNextPage: hasMoreSongs, isFetchingNextPage: isFetchingMoreSongs,
+  } = useInfiniteQuery({
+    queryKey: ['search-songs', searchQuery],
+    queryFn: fetchSearchPage,
+    initialPageParam: null as string | null,
+    getNextPageParam: (lastPage: SearchPage) => lastPage.songs_next,
+    enabled: !!searchQuery,
+  });
+  const {
+    data: playlistPages,
+    fetchNextPage: fetchMorePlaylists, hasNextPage: hasMorePlaylists, isFetchingNextPage: isFetchingMorePlaylists,
+  } = useInfiniteQuery({
+    queryKey: ['search-playlists', searchQuery],
+    queryFn: fetchSearchPage,
+    initialPageParam: null as string | null,
+    getNextPageParam: (lastPage: SearchPage) => lastPage.playlists_next,
     enabled: !!searchQuery,
   });
+  const songs = songPages?.pages.flatMap(page => page.songs ?? []);
+  const playlists = playlistPages?.pages.flatMap(page => page.playlists ?? []);
 
   const playTrack = (song: Song) => {
     setCurrentTrack({
@@ -123,15 +186,40 @@ const Search = () => {
       {/* Search Input */}
       <motion.div className="mb-8" initial={{ opacity: 0 }} animate={{ opacity: 1 }} transition={{ delay: 0.2 }}>
         <div className="relative max-w-md">
-          <SearchIcon className="absolute left-3 top-1/2 transform -translate-y-1/2 text-neutral-400" size={20} />
-          <motion.input
-            type="text"
-            value={searchQuery}
-            onChange={(e) => { setSearchQuery(e.target.value); }}
-            placeholder="What do you want to listen to?"
-            className="w-full bg-neutral-800 text-white placeholder-neutral-400 pl-10 pr-4 py-3 rounded-md text-sm focus:outline-none focus:ring-2 focus:ring-spotify-green focus:bg-neutral-700"
-            whileFocus={{ scale: 1.02, boxShadow: '0 0 0 2px #1DB954' }}
-          />
+          <form onSubmit={(e) => { e.preventDefault(); submitSearch(inputValue); }}>
+            <SearchIcon className="absolute left-3 top-1/2 transform -translate-y-1/2 text-neutral-400" size={20} />
+            <motion.input
+              type="text"
+              value={inputValue}
+              onChange={(e) => {
+                setInputValue(e.target.value);
+                setShowSuggestions(true);
+                if (!e.target.value.trim()) setSearchQuery('');
+              }}
+              onFocus={() => setShowSuggestions(true)}
+              onBlur={() => setShowSuggestions(false)}
+              onKeyDown={(e) => { if (e.key === 'Escape') setShowSuggestions(false); }}
+              placeholder="What do you want to listen to?"
+              className="w-full bg-neutral-800 text-white placeholder-neutral-400 pl-10 pr-4 py-3 rounded-md text-sm focus:outline-none focus:ring-2 focus:ring-spotify-green focus:bg-neutral-700"
+              whileFocus={{ scale: 1.02, boxShadow: '0 0 0 2px #1DB954' }}
+            />
+          </form>
+          {suggestionList.length > 0 && (
+            <ul className="absolute z-10 mt-1 w-full bg-neutral-800 rounded-md shadow-lg overflow-hidden">
+              {suggestionList.map((suggestion) => (
+                <li key={suggestion}>
+                  <button
+                    type="button"
+                    className="w-full text-left px-4 py-2 text-sm text-white hover:bg-neutral-700"
+                    onMouseDown={(e) => e.preventDefault()} // keep focus, so onBlur does not hide the list first
+                    onClick={() => submitSearch(suggestion)}
+                  >
+                    {suggestion}
+                  </button>
+                </li>
+              ))}
+            </ul>
+          )}
         </div>
       </motion.div>
 
@@ -150,7 +238,7 @@ const Search = () => {
               <motion.button
                 key={item.id}
                 className="px-4 py-2 bg-neutral-800 text-white rounded-full hover:bg-spotify-green hover:text-black transition"
-                onClick={() => setSearchQuery(item.query)}
+                onClick={() => submitSearch(item.query)}
                 whileTap={{ scale: 0.97 }}
               >
                 {item.query}
@@ -179,7 +267,7 @@ const Search = () => {
         </div>
       )}
 
-      {searchQuery && searchData && (
+      {searchQuery && songs && (
         <>
           {/* Songs Section */}
           <motion.div className="mb-8" initial={{ opacity: 0 }} animate={{ opacity: 1 }} transition={{ delay: 0.3 }}>
@@ -191,7 +279,7 @@ const Search = () => {
                 className="px-2 py-1 rounded bg-neutral-800 text-white placeholder:text-neutral-400 focus:outline-none focus:ring-2 focus:ring-spotify-green text-xs"
                 placeholder="Filter by artist"
                 value={artistFilter}
-                onChange={e => { setArtistFilter(e.target.value); setSongPage(1); }}
+                onChange={e => setArtistFilter(e.target.value)}
                 style={{ minWidth: 120 }}
               />
               <input
@@ -199,67 +287,62 @@ const Search = () => {
                 className="px-2 py-1 rounded bg-neutral-800 text-white placeholder:text-neutral-400 focus:outline-none focus:ring-2 focus:ring-spotify-green text-xs"
                 placeholder="Filter by album"
                 value={albumFilter}
-                onChange={e => { setAlbumFilter(e.target.value); setSongPage(1); }}
+                onChange={e => setAlbumFilter(e.target.value)}
                 style={{ minWidth: 120 }}
               />
             </div>
-            {(searchData.songs as Song[]) && (searchData.songs as Song[]).length > 0 ? (() => {
-              // Filter and paginate songs
-              const filtered: Song[] = (searchData.songs as Song[]).filter((song: Song) =>
+            {songs.length > 0 ? (() => {
+              // Filters narrow the songs loaded so far; "Load more" fetches the next ranked page
+              const filtered: Song[] = songs.filter((song: Song) =>
                 (!artistFilter || song.artist.toLowerCase().includes(artistFilter.toLowerCase())) &&
                 (!albumFilter || (song.album || '').toLowerCase().includes(albumFilter.toLowerCase()))
               );
-              const totalPages = Math.ceil(filtered.length / SONGS_PER_PAGE);
-              const startIdx = (songPage - 1) * SONGS_PER_PAGE;
-              const pageSongs = filtered.slice(startIdx, startIdx + SONGS_PER_PAGE);
-              return filtered.length > 0 ? (
+              return (
                 <>
-                  <div className="space-y-2">
-                    {pageSongs.map((song: Song, index: number) => (
-                      <motion.div
-                        key={song.id}
-                        className={`flex items-center space-x-4 p-2 rounded-md cursor-pointer group transition ${currentTrack && String(song.id) === currentTrack.id ? 'bg-neutral-800 ring-2 ring-spotify-green' : 'hover:bg-neutral-800'}`}
-                        onClick={() => playTrack(song)}
-                        whileHover={{ scale: 1.01 }}
-                        whileTap={{ scale: 0.98 }}
-                      >
-                        <div className="w-4 text-neutral-400 text-sm">{startIdx + index + 1}</div>
-                        <img src={getFullUrl(song.cover_image)} alt={song.title} className="w-10 h-10 rounded-md object-cover" />
-                        <div className="flex-1 min-w-0">
-                          <p className="font-medium text-white truncate">{song.title}</p>
-                          <p className="text-sm text-neutral-400 truncate">{song.artist}</p>
-                        </div>
-                        <div className="text-sm text-neutral-400">{song.duration ? `${Math.floor(song.duration / 60)}:${('0' + Math.floor(song.duration % 60)).slice(-2)}` : ''}</div>
-                        <motion.button
-                          className={`w-8 h-8 rounded-full flex items-center justify-center transition-all ${currentTrack && String(song.id) === currentTrack.id ? 'bg-spotify-green' : 'bg-neutral-700 group-hover:bg-spotify-green'}`}
-                          onClick={e => { e.stopPropagation(); playTrack(song); }}
-                          whileTap={{ scale: 0.95 }}
+                  {filtered.length > 0 ? (
+                    <div className="space-y-2">
+                      {filtered.map((song: Song, index: number) => (
+                        <motion.div
+                          key={song.id}
+                          className={`flex items-center space-x-4 p-2 rounded-md cursor-pointer group transition ${currentTrack && String(song.id) === currentTrack.id ? 'bg-neutral-800 ring-2 ring-spotify-green' : 'hover:bg-neutral-800'}`}
+                          onClick={() => playTrack(song)}
+                          whileHover={{ scale: 1.01 }}
+                          whileTap={{ scale: 0.98 }}
                         >
-                          {currentTrack && String(song.id) === currentTrack.id && isPlaying ? (
-                            <Pause size={16} fill="white" className="text-white ml-0.5" />
-                          ) : (
-                            <Play size={16} fill="white" className="text-white ml-0.5" />
-                          )}
-                        </motion.button>
-                      </motion.div>
-                    ))}
-                  </div>
-                  <div className="flex justify-center items-center gap-4 mt-6">
-                    <button
-                      className="px-4 py-2 rounded bg-neutral-800 text-white disabled:opacity-50"
-                      onClick={() => setSongPage(p => Math.max(1, p - 1))}
-                      disabled={songPage === 1}
-                    >Previous</button>
-                    <span className="text-neutral-400">Page {songPage} / {totalPages}</span>
-                    <button
-                      className="px-4 py-2 rounded bg-neutral-800 text-white disabled:opacity-50"
-                      onClick={() => setSongPage(p => Math.min(totalPages, p + 1))}
-                      disabled={songPage === totalPages}
-                    >Next</button>
-                  </div>
+                          <div className="w-4 text-neutral-400 text-sm">{index + 1}</div>
+                          <img src={getFullUrl(song.cover_image)} alt={song.title} className="w-10 h-10 rounded-md object-cover" />
+                          <div className="flex-1 min-w-0">
+                            <p className="font-medium text-white truncate">{song.title}</p>
+                            <p className="text-sm text-neutral-400 truncate">{song.artist}</p>
+                          </div>
+                          <div className="text-sm text-neutral-400">{song.duration ? `${Math.floor(song.duration / 60)}:${('0' + Math.floor(song.duration % 60)).slice(-2)}` : ''}</div>
+                          <motion.button
+                            className={`w-8 h-8 rounded-full flex items-center justify-center transition-all ${currentTrack && String(song.id) === currentTrack.id ? 'bg-spotify-green' : 'bg-neutral-700 group-hover:bg-spotify-green'}`}
+                            onClick={e => { e.stopPropagation(); playTrack(song); }}
+                            whileTap={{ scale: 0.95 }}
+                          >
+                            {currentTrack && String(song.id) === currentTrack.id && isPlaying ? (
+                              <Pause size={16} fill="white" className="text-white ml-0.5" />
+                            ) : (
+                              <Play size={16} fill="white" className="text-white ml-0.5" />
+                            )}
+                          </motion.button>
+                        </motion.div>
+                      ))}
+                    </div>
+                  ) : (
+                    <div className="text-neutral-400 px-4 py-6">No loaded songs match the filters.</div>
+                  )}
+                  {hasMoreSongs && (
+                    <div className="flex justify-center mt-6">
+                      <button
+                        className="px-4 py-2 rounded bg-neutral-800 text-white disabled:opacity-50"
+                        onClick={() => fetchMoreSongs()}
+                        disabled={isFetchingMoreSongs}
+                      >Load more</button>
+                    </div>
+                  )}
                 </>
-              ) : (
-                <div className="text-neutral-400 px-4 py-6">No songs found.</div>
               );
             })() : (
               <div className="text-neutral-400 px-4 py-6">No songs found.</div>
@@ -271,27 +354,38 @@ const Search = () => {
               <ListMusic className="text-spotify-green mr-2" size={20} />
               <span className="text-white font-semibold text-lg">Playlists</span>
             </div>
-            {searchData.playlists && searchData.playlists.length > 0 ? (
-              <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-3 xl:grid-cols-4 gap-6">
-                {searchData.playlists.map((playlist: Playlist) => (
-                  <motion.div
-                    key={playlist.id}
-                    className="bg-neutral-900 bg-opacity-50 hover:bg-opacity-70 p-4 rounded-lg transition-all cursor-pointer group transform hover:scale-105"
-                    whileHover={{ scale: 1.04 }}
-                    whileTap={{ scale: 0.98 }}
-                  >
-                    <div className="relative mb-4">
-                      <img
-                        src={playlist.cover_image ? getFullUrl(playlist.cover_image) : '/placeholder.svg'}
-                        alt={playlist.name}
-                        className="w-full aspect-square object-cover rounded-md"
-                      />
-                    </div>
-                    <h3 className="font-semibold text-white mb-1 truncate">{playlist.name}</h3>
-                    <p className="text-sm text-neutral-400 truncate">{playlist.songs?.length || 0} songs</p>
-                  </motion.div>
-                ))}
-              </div>
+            {playlists && playlists.length > 0 ? (
+              <>
+                <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-3 xl:grid-cols-4 gap-6">
+                  {playlists.map((playlist: Playlist) => (
+                    <motion.div
+                      key={playlist.id}
+                      className="bg-neutral-900 bg-opacity-50 hover:bg-opacity-70 p-4 rounded-lg transition-all cursor-pointer group transform hover:scale-105"
+                      whileHover={{ scale: 1.04 }}
+                      whileTap={{ scale: 0.98 }}
+                    >
+                      <div className="relative mb-4">
+                        <img
+                          src={playlist.cover_image ? getFullUrl(playlist.cover_image) : '/placeholder.svg'}
+                          alt={playlist.name}
+                          className="w-full aspect-square object-cover rounded-md"
+                        />
+                      </div>
+                      <h3 className="font-semibold text-white mb-1 truncate">{playlist.name}</h3>
+                      <p className="text-sm text-neutral-400 truncate">{playlist.song_count || 0} songs</p>
+                    </motion.div>
+                  ))}
+                </div>
+                {hasMorePlaylists && (
+                  <div className="flex justify-center mt-6">
+                    <button
+                      className="px-4 py-2 rounded bg-neutral-800 text-white disabled:opacity-50"
+                      onClick={() => fetchMorePlaylists()}
+                      disabled={isFetchingMorePlaylists}
+                    >Load more</button>
+                  </div>
+                )}
+              </>
             ) : (
               <div className="text-neutral-400 px-4 py-6">No playlists found.</div>
             )}
@@ -300,7 +394,7 @@ const Search = () => {
       )}
 
       {!searchQuery && (!recentData || recentData.length === 0) && (
-        <div className="text-neutral-400 px-4 py-6">Type to search for songs, artists, or playlists.</div>
+        <div className="text-neutral-400 px-4 py-6">Search for songs, artists, or playlists and press Enter.</div>
       )}
     </motion.div>
   );
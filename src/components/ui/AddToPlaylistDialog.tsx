@@ -12,7 +12,7 @@ interface Playlist {
   id: number;
   name: string;
   cover_image?: string;
-  songs?: { id: number }[];
+  has_song?: boolean;
 }
 
 const getAuthHeaders = () => {
@@ -31,9 +31,10 @@ const AddToPlaylistDialog = ({ open, songId, onClose }: AddToPlaylistDialogProps
   const [newPlaylistName, setNewPlaylistName] = useState('');
   const [creating, setCreating] = useState(false);
   const { data: playlists, refetch } = useQuery({
-    queryKey: ['playlists'],
+    queryKey: ['playlists', songId],
     queryFn: async () => {
-      const res = await fetch(`${API_BASE_URL}/api/auth/playlists/`, {
+      // ?song= marks the playlists that already hold the song (has_song)
+      const res = await fetch(`${API_BASE_URL}/api/auth/playlists/?song=${songId}`, {
         headers: getAuthHeaders(),
       });
       if (!res.ok) throw new Error('Failed to fetch playlists');
@@ -114,7 +115,7 @@ const AddToPlaylistDialog = ({ open, songId, onClose }: AddToPlaylistDialogProps
           {playlists && playlists.length > 0 ? (
             <ul className="space-y-2">
               {playlists.map((playlist: Playlist) => {
-                const inPlaylist = playlist.songs && playlist.songs.some(s => s.id === songId);
+                const inPlaylist = !!playlist.has_song;
                 return (
                   <li key={playlist.id} className="flex items-center gap-2">
                     <img